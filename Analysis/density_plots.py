@@ -0,0 +1,138 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Density Grids - Classifier Output #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+def widen_range(value_range:tuple) -> tuple:
+    ''' Widen a zero width (min, max) range by 0.5 on both sides like np.histogram, histogramdd needs increasing bin edges '''
+    low, high = float(value_range[0]), float(value_range[1])
+    if low == high:
+        return low - 0.5, high + 0.5
+    return low, high
+
+
+def calculate_density_grids(data:pd.DataFrame, x:str, y:str, hue:str = "CP Status", bins:int = 100, x_range:tuple = None, y_range:tuple = None) -> dict:
+    '''
+    Aggregate points into one 2D histogram per hue level on shared bin edges
+
+    Args:
+        data (pd.DataFrame): Dataframe containing one row per route (e.g. info_df of the classifier output)
+        x (str): Column on the x-axis
+        y (str): Column on the y-axis
+        hue (str): Column used to split the points into separate grids
+        bins (int): Number of bins per axis
+        x_range (tuple): Optional (min, max) of the x-axis, defaults to the data range
+        y_range (tuple): Optional (min, max) of the y-axis, defaults to the data range
+    Returns:
+        dict: "x_edges", "y_edges" and "grids" (hue level -> counts of shape (bins, bins))
+    '''
+    x_values = data[x].to_numpy(dtype=float)
+    y_values = data[y].to_numpy(dtype=float)
+
+    if x_range is None:
+        x_range = (np.nanmin(x_values), np.nanmax(x_values))
+    if y_range is None:
+        y_range = (np.nanmin(y_values), np.nanmax(y_values))
+
+    # A constant column (e.g. a single customer number) has no range
+    x_range = widen_range(x_range)
+    y_range = widen_range(y_range)
+
+    x_edges = np.linspace(x_range[0], x_range[1], bins + 1)
+    y_edges = np.linspace(y_range[0], y_range[1], bins + 1)
+
+    # Encode hue levels once and count all points in a single histogram over (level, x, y)
+    codes, levels = pd.factorize(data[hue], sort=True)
+    counts, _ = np.histogramdd((codes, x_values, y_values),
+                               bins=(np.arange(len(levels) + 1) - 0.5, x_edges, y_edges))
+
+    return {
+        "x_edges": x_edges,
+        "y_edges": y_edges,
+        "grids": {str(level): counts[i] for i, level in enumerate(levels)}
+    }
+
+
+def load_or_calculate_density_grids(data:pd.DataFrame, x:str, y:str, cache_file:str, hue:str = "CP Status", bins:int = 100, x_range:tuple = None, y_range:tuple = None) -> dict:
+    '''
+    Load density grids from a .npz cache file or calculate and store them
+    The cache is keyed by the plotted columns, the binning and a hash of the plotted data, so changed inputs are recalculated
+
+    Args:
+        data (pd.DataFrame): Dataframe containing one row per route
+        x (str): Column on the x-axis
+        y (str): Column on the y-axis
+        cache_file (str): Path of the .npz cache file
+        hue (str): Column used to split the points into separate grids
+        bins (int): Number of bins per axis
+        x_range (tuple): Optional (min, max) of the x-axis
+        y_range (tuple): Optional (min, max) of the y-axis
+    Returns:
+        dict: "x_edges", "y_edges" and "grids" as returned by calculate_density_grids
+    '''
+    data_hash = int(pd.util.hash_pandas_object(data[[x, y, hue]], index=False).sum())
+    cache_key = f"{x}|{y}|{hue}|{bins}|{x_range}|{y_range}|{data_hash}"
+
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as cached:
+            if str(cached["cache_key"]) == cache_key:
+                levels = [str(level) for level in cached["levels"]]
+                return {
+                    "x_edges": cached["x_edges"],
+                    "y_edges": cached["y_edges"],
+                    "grids": {level: cached["grids"][i] for i, level in enumerate(levels)}
+                }
+
+    density = calculate_density_grids(data, x, y, hue=hue, bins=bins, x_range=x_range, y_range=y_range)
+
+    levels = list(density["grids"].keys())
+    np.savez_compressed(cache_file,
+                        cache_key=np.array(cache_key),
+                        levels=np.array(levels),
+                        x_edges=density["x_edges"],
+                        y_edges=density["y_edges"],
+                        grids=np.stack([density["grids"][level] for level in levels]))
+    return density
+
+
+def plot_density_grids(density:dict, x_label:str, y_label:str, title:str = None, save_path:str = None) -> None:
+    '''
+    Plot one density panel per hue level from precomputed grids
+    Rendering cost and file size only depend on the number of bins, not on the number of routes
+
+    Args:
+        density (dict): Output of calculate_density_grids or load_or_calculate_density_grids
+        x_label (str): Label of the x-axis
+        y_label (str): Label of the y-axis
+        title (str): Optional global title
+        save_path (str): Optional path to save the figure (dpi=300)
+    '''
+    grids = density["grids"]
+    vmax = max(max(grid.max() for grid in grids.values()), 1)
+
+    fig, axes = plt.subplots(nrows=1, ncols=len(grids), figsize=(5 * len(grids), 4.5), sharex=True, sharey=True, squeeze=False)
+
+    for ax, (level, grid) in zip(axes[0], grids.items()):
+        # Empty bins are masked so they stay white on the log scale
+        mesh = ax.pcolormesh(density["x_edges"], density["y_edges"], np.ma.masked_equal(grid.T, 0),
+                             norm=LogNorm(vmin=1, vmax=vmax), cmap="Blues", rasterized=True)
+        ax.set_title(f"{level} (n={int(grid.sum())})")
+        ax.set_xlabel(x_label)
+        ax.grid(True, linestyle="--", alpha=0.3)
+
+    axes[0][0].set_ylabel(y_label)
+    fig.colorbar(mesh, ax=axes[0].tolist(), label="Routes per bin")
+
+    if title is not None:
+        plt.suptitle(title)
+    if save_path is not None:
+        plt.savefig(save_path, dpi=300)
+    plt.show()
@@ -2,6 +2,22 @@ import os
 import pandas as pd
 import numpy as np
 
+# Axle parameters of the VEHICLE section (file key -> column name), missing parameters stay 0
+VEHICLE_AXLE_PARAMETERS = {
+    "Wheelbase": "Wheelbase",
+    "Max_Mass_FrontAxle": "Max Mass Front Axle",
+    "Max_Mass_RearAxle": "Max Mass Rear Axle",
+    "Max_Mass_TrailerAxle": "Max Mass Trailer Axle",
+    "Distance_FrontAxle_CargoSpace": "Distance Front Axle Cargo Space",
+    "Distance_Kingpin_RearAxle": "Distance Kingpin Rear Axle",
+    "Distance_Kingpin_TrailerAxle": "Distance Kingpin Trailer Axle",
+    "Distance_CargoSpace_TrailerAxle": "Distance Cargo Space Trailer Axle",
+    "Distance_Mass_Tractor_RearAxle": "Distance Mass Tractor Rear Axle",
+    "Distance_Mass_Trailer_TrailerAxle": "Distance Mass Trailer Trailer Axle",
+    "Mass_Tractor": "Mass Tractor",
+    "Mass_Trailer": "Mass Trailer"
+}
+
 class Item: 
 
     def __init__(self, folder_name:str, instance_name:str, type:str, length:float, width:float, height:float, mass:float, fragility:int):
@@ -153,6 +169,7 @@ class Instance:
         self.cargoSpace_Length = 0
         self.cargoSpace_Width = 0
         self.cargoSpace_Height = 0
+        self.axle_parameters = {key: 0 for key in VEHICLE_AXLE_PARAMETERS}
 
         #Create emptly lists to store items and demands
         self.items = []  
@@ -238,6 +255,12 @@ class Instance:
                             self.cargoSpace_Width = int(parts[1])/self.divider
                         elif "CargoSpace_Height" in line:
                             self.cargoSpace_Height = int(parts[1])/self.divider
+                        elif parts[0] in VEHICLE_AXLE_PARAMETERS:
+                            # Distances share the units of the cargo space, masses do not
+                            if parts[0] == "Wheelbase" or parts[0].startswith("Distance"):
+                                self.axle_parameters[parts[0]] = float(parts[1])/self.divider
+                            else:
+                                self.axle_parameters[parts[0]] = float(parts[1])
 
                     elif section == "CUSTOMERS":
                         # Extract customer details
@@ -310,7 +333,7 @@ class Instance:
         #Calculate the exact lower bounds and coverages
         self.vehicle_lower_bound_volume = self.vehicle_lower_bound_volume / self.cargo_volume
         self.vehicle_lower_bound_mass = self.vehicle_lower_bound_mass / self.vehicle_capacity
-        self.vehicle_coverage_mass = self.vehicle_lower_bound_volume / self.num_vehicles
+        self.vehicle_coverage_mass = self.vehicle_lower_bound_mass / self.num_vehicles
         self.vehicle_coverage_volume = self.vehicle_lower_bound_volume / self.num_vehicles
 
     def standardize_data(self):
@@ -338,5 +361,6 @@ class Instance:
             "Vehicle LB Volume": round(self.vehicle_lower_bound_volume,2),
             "Vehicle LB Mass": round(self.vehicle_lower_bound_mass,2),
             "Vehicle Coverage Mass": round(self.vehicle_coverage_mass,2),
-            "Vehicle Coverage Volume": round(self.vehicle_coverage_volume,2)
+            "Vehicle Coverage Volume": round(self.vehicle_coverage_volume,2),
+            **{column: self.axle_parameters[key] for key, column in VEHICLE_AXLE_PARAMETERS.items()}
         }
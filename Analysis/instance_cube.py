@@ -0,0 +1,246 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from helper_classes import Instance
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Instance Cube - Precomputed Statistics #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Metrics summarized per instance and per instance combination, grouped by the dataframe they come from
+CUBE_METRICS = {
+    "aggregated_demands": ["Agg Volume Ratio", "Agg Mass Ratio", "Agg Quantity"],
+    "items": ["Length", "Width", "Height"]
+}
+
+INSTANCE_KEYS = ["Folder Name", "Instance Name", "Instance Combination", "Number of Customers", "Number of Items", "Number of Item Types"]
+COMBINATION_KEYS = ["Instance Combination", "Number of Customers", "Number of Items", "Number of Item Types"]
+
+MANIFEST_FILE = "manifest.json"
+INSTANCE_CUBE_FILE = "instance_cube.csv"
+COMBINATION_CUBE_FILE = "combination_cube.csv"
+VALUES_FOLDER = "values"
+
+
+def summarize_values(values:np.ndarray) -> dict:
+    '''
+    Summarize one metric by count, mean, standard deviation and quantiles
+    Args:
+        values (np.ndarray): Raw values of the metric
+    Returns:
+        dict: Summary statistics
+    '''
+    if len(values) == 0:
+        return {"count": 0, "mean": np.nan, "std": np.nan, "min": np.nan, "q25": np.nan, "q50": np.nan, "q75": np.nan, "max": np.nan}
+
+    q25, q50, q75 = np.quantile(values, [0.25, 0.5, 0.75])
+    return {
+        "count": len(values),
+        "mean": values.mean(),
+        "std": values.std(ddof=1) if len(values) > 1 else np.nan,
+        "min": values.min(),
+        "q25": q25,
+        "q50": q50,
+        "q75": q75,
+        "max": values.max()
+    }
+
+
+def get_instance_keys(instance:Instance) -> dict:
+    ''' Key columns of an instance in the cube, matching the "Instance Combination" of analyze_one_source '''
+    return {
+        "Folder Name": instance.folder_name,
+        "Instance Name": instance.name,
+        "Instance Combination": str(instance.num_customers) + " - " + str(instance.num_item_types) + " - " + str(instance.num_items),
+        "Number of Customers": instance.num_customers,
+        "Number of Items": instance.num_items,
+        "Number of Item Types": instance.num_item_types
+    }
+
+
+def get_source_signature(file_path:str) -> dict:
+    ''' Modification time and size used to detect changed source files '''
+    stat = os.stat(file_path)
+    return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def get_source_key(folder_path:str, file_name:str) -> str:
+    ''' Key of a source file in the manifest and the "Source File" column, relative to Data/ so it does not depend on the working directory '''
+    return f"{os.path.basename(os.path.normpath(folder_path))}/{file_name}"
+
+
+def get_values_path(cube_dir:str, source_key:str) -> str:
+    ''' Path of the stored raw metric values of one source file '''
+    folder_name = os.path.basename(os.path.dirname(source_key))
+    file_name = os.path.splitext(os.path.basename(source_key))[0]
+    return os.path.join(cube_dir, VALUES_FOLDER, f"{folder_name}__{file_name}.npz")
+
+
+def build_instance_rows(instance:Instance) -> tuple:
+    '''
+    Build the cube rows and raw metric values of one instance
+    Args:
+        instance (Instance): Parsed instance
+    Returns:
+        tuple: List of cube rows (one per metric) and dict of raw metric values
+    '''
+    keys = get_instance_keys(instance)
+    rows = []
+    values = {}
+    for frame_name, metrics in CUBE_METRICS.items():
+        frame = getattr(instance, frame_name)
+        for metric in metrics:
+            metric_values = frame[metric].to_numpy(dtype=float) if metric in frame.columns else np.empty(0)
+            values[metric] = metric_values
+            rows.append({**keys, "Metric": metric, **summarize_values(metric_values)})
+    return rows, values
+
+
+def build_combination_rows(instance_cube:pd.DataFrame, combinations:list, cube_dir:str) -> list:
+    '''
+    Build the cube rows of instance combinations from the stored raw values of their instances
+    Args:
+        instance_cube (pd.DataFrame): Instance cube including the "Source File" column
+        combinations (list): Instance combinations to build
+        cube_dir (str): Directory of the cube
+    Returns:
+        list: List of cube rows (one per combination and metric)
+    '''
+    rows = []
+    metrics = [metric for frame_metrics in CUBE_METRICS.values() for metric in frame_metrics]
+    for combination in combinations:
+        members = instance_cube[instance_cube["Instance Combination"] == combination]
+        source_files = members["Source File"].unique()
+        stored = []
+        for source_file in source_files:
+            with np.load(get_values_path(cube_dir, source_file)) as data:
+                stored.append({metric: data[metric] for metric in metrics})
+        keys = members[COMBINATION_KEYS].iloc[0].to_dict()
+        for metric in metrics:
+            metric_values = np.concatenate([values[metric] for values in stored]) if stored else np.empty(0)
+            rows.append({**keys, "Metric": metric, "Number of Instances": len(source_files), **summarize_values(metric_values)})
+    return rows
+
+
+def refresh_instance_cube(folder_paths:list, cube_dir:str) -> tuple:
+    '''
+    Refresh the instance cube on disk, only source files that were added, changed or removed are processed
+    Args:
+        folder_paths (list): Folders containing the instance files
+        cube_dir (str): Directory of the cube
+    Returns:
+        tuple: Instance cube and combination cube
+    '''
+    os.makedirs(os.path.join(cube_dir, VALUES_FOLDER), exist_ok=True)
+
+    manifest_path = os.path.join(cube_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    instance_cube = pd.DataFrame()
+    combination_cube = pd.DataFrame()
+    if os.path.exists(os.path.join(cube_dir, INSTANCE_CUBE_FILE)):
+        instance_cube, combination_cube = load_instance_cube(cube_dir)
+
+    # Detect changed sources, entries of manifests keyed on other paths count as removed and are rebuilt
+    sources = {}
+    source_paths = {}
+    for folder_path in folder_paths:
+        for file_name in os.listdir(folder_path):
+            if file_name.endswith(".txt"):
+                if file_name != "Overview.txt":
+                    source_key = get_source_key(folder_path, file_name)
+                    source_paths[source_key] = os.path.join(folder_path, file_name)
+                    sources[source_key] = get_source_signature(source_paths[source_key])
+
+    changed = [source_key for source_key, signature in sources.items() if manifest.get(source_key) != signature]
+    removed = [source_key for source_key in manifest if source_key not in sources]
+
+    if not changed and not removed:
+        return instance_cube, combination_cube
+
+    affected_combinations = set()
+    if not instance_cube.empty:
+        outdated = instance_cube["Source File"].isin(changed + removed)
+        affected_combinations.update(instance_cube.loc[outdated, "Instance Combination"])
+        instance_cube = instance_cube[~outdated]
+
+    for source_key in removed:
+        values_path = get_values_path(cube_dir, source_key)
+        if os.path.exists(values_path):
+            os.remove(values_path)
+        del manifest[source_key]
+
+    new_rows = []
+    for source_key in changed:
+        instance = Instance(source_paths[source_key], standardize = False, analyze_one_source = False)
+        rows, values = build_instance_rows(instance)
+        for row in rows:
+            row["Source File"] = source_key
+        new_rows.extend(rows)
+        np.savez(get_values_path(cube_dir, source_key), **values)
+        manifest[source_key] = sources[source_key]
+        affected_combinations.add(rows[0]["Instance Combination"])
+
+    instance_cube = pd.concat([instance_cube, pd.DataFrame(new_rows)], ignore_index=True)
+    instance_cube = instance_cube.sort_values(by=["Number of Customers", "Number of Items", "Number of Item Types", "Instance Name"], ignore_index=True)
+
+    # Rebuild only the combinations whose member instances changed
+    if not combination_cube.empty:
+        combination_cube = combination_cube[~combination_cube["Instance Combination"].isin(affected_combinations)]
+    remaining = [combination for combination in affected_combinations if combination in set(instance_cube["Instance Combination"])]
+    combination_cube = pd.concat([combination_cube, pd.DataFrame(build_combination_rows(instance_cube, remaining, cube_dir))], ignore_index=True)
+    combination_cube = combination_cube.sort_values(by=["Number of Customers", "Number of Items", "Number of Item Types"], ignore_index=True)
+
+    instance_cube.to_csv(os.path.join(cube_dir, INSTANCE_CUBE_FILE), index=False)
+    combination_cube.to_csv(os.path.join(cube_dir, COMBINATION_CUBE_FILE), index=False)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+    return instance_cube, combination_cube
+
+
+def load_instance_cube(cube_dir:str) -> tuple:
+    '''
+    Load the precomputed instance cube without touching the raw instance files
+    Args:
+        cube_dir (str): Directory of the cube
+    Returns:
+        tuple: Instance cube and combination cube, "Instance Combination" is an ordered categorical
+    '''
+    instance_cube = pd.read_csv(os.path.join(cube_dir, INSTANCE_CUBE_FILE))
+    combination_cube = pd.read_csv(os.path.join(cube_dir, COMBINATION_CUBE_FILE))
+
+    # Ensure "Instance Combination" is categorical & ordered like in the analysis notebook
+    categories = combination_cube["Instance Combination"].drop_duplicates().tolist()
+    for cube in [instance_cube, combination_cube]:
+        cube["Instance Combination"] = pd.Categorical(cube["Instance Combination"], categories=categories, ordered=True)
+
+    return instance_cube, combination_cube
+
+
+def pivot_cube(cube:pd.DataFrame, statistic:str = "mean") -> pd.DataFrame:
+    '''
+    Pivot a cube to one row per instance (or combination) and one column per metric
+    e.g. pivot_cube(instance_cube) replaces groupby(["Instance Name", "Instance Combination"]).mean()
+    Args:
+        cube (pd.DataFrame): Instance or combination cube
+        statistic (str): Statistic column to pivot
+    Returns:
+        pd.DataFrame: Wide dataframe
+    '''
+    keys = [key for key in INSTANCE_KEYS if key in cube.columns]
+    return cube.pivot_table(index=keys, columns="Metric", values=statistic, observed=True).reset_index().rename_axis(columns=None)
+
+
+if __name__ == "__main__":
+    print("Refreshing instance cube...")
+    refresh_instance_cube(["../Data/Gendreau_et_al_2006"], "Instance_Cube")
+    print("Finished.")
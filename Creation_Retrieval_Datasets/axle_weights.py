@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from packing_bounds import get_item_tables
+from route_screens import RouteScreen
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Axle Weights - Bound check on the total mass of routes #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Folders whose instances are solved with axle weight constraints
+AXLE_WEIGHT_FOLDERS = ["Krebs_Ehmke_Koch_2021", "Pollaris_et_al_2016", "Pollaris_et_al_2017", "Semi-Trailer_Truck_2021"]
+
+
+def get_axle_constraints(filtered_instance:pd.DataFrame) -> dict:
+    '''
+    Axle loads as linear functions of the cargo mass M and its center of gravity x along the cargo space:
+        load_i = constant_i + mass_i * M + moment_i * M * x <= limit_i
+    Rigid trucks (front axle at x = 0, rear axle at x = Wheelbase) only carry the cargo.
+    Semi-trailer trucks (kingpin at x = 0) add the empty masses of tractor and trailer, the kingpin load is split
+    between the tractor axles.
+
+    Args:
+        filtered_instance (pd.DataFrame): Filtered instance dataset
+    Returns:
+        dict: Arrays "constant", "mass", "moment", "limit" (one entry per axle) and the range "x_min", "x_max" of x
+    '''
+    vehicle = filtered_instance.iloc[0]
+    cargo_length = float(vehicle["Cargo Length"])
+    wheelbase = float(vehicle["Wheelbase"])
+
+    if vehicle["Max Mass Trailer Axle"] > 0:
+        kingpin_trailer_axle = float(vehicle["Distance Kingpin Trailer Axle"])
+        kingpin_rear_axle = float(vehicle["Distance Kingpin Rear Axle"])
+        trailer_mass = float(vehicle["Mass Trailer"])
+        trailer_mass_distance = float(vehicle["Distance Mass Trailer Trailer Axle"])
+        tractor_mass = float(vehicle["Mass Tractor"])
+        tractor_mass_distance = float(vehicle["Distance Mass Tractor Rear Axle"])
+
+        # Kingpin load = kingpin_constant + M - M * x / kingpin_trailer_axle
+        kingpin_constant = trailer_mass * trailer_mass_distance / kingpin_trailer_axle
+        front_share = kingpin_rear_axle / wheelbase
+        rear_share = (wheelbase - kingpin_rear_axle) / wheelbase
+
+        x_min = kingpin_trailer_axle - float(vehicle["Distance Cargo Space Trailer Axle"])
+        return {
+            "constant": np.array([
+                kingpin_constant * front_share + tractor_mass * tractor_mass_distance / wheelbase,
+                kingpin_constant * rear_share + tractor_mass * (wheelbase - tractor_mass_distance) / wheelbase,
+                trailer_mass * (kingpin_trailer_axle - trailer_mass_distance) / kingpin_trailer_axle
+            ]),
+            "mass": np.array([front_share, rear_share, 0.0]),
+            "moment": np.array([-front_share / kingpin_trailer_axle, -rear_share / kingpin_trailer_axle, 1 / kingpin_trailer_axle]),
+            "limit": np.array([vehicle["Max Mass Front Axle"], vehicle["Max Mass Rear Axle"], vehicle["Max Mass Trailer Axle"]], dtype=float),
+            "x_min": x_min,
+            "x_max": x_min + cargo_length
+        }
+
+    x_min = float(vehicle["Distance Front Axle Cargo Space"])
+    return {
+        "constant": np.zeros(2),
+        "mass": np.array([1.0, 0.0]),
+        "moment": np.array([-1 / wheelbase, 1 / wheelbase]),
+        "limit": np.array([vehicle["Max Mass Front Axle"], vehicle["Max Mass Rear Axle"]], dtype=float),
+        "x_min": x_min,
+        "x_max": x_min + cargo_length
+    }
+
+
+def calculate_center_of_gravity_range(item_tables:dict, route_quantities:np.ndarray, cross_section:float, x_min:float, x_max:float) -> tuple:
+    '''
+    Range of the load's center of gravity over all placements, from a continuous relaxation: the cargo space holds at most
+    cross_section volume per unit length, so the most forward center of gravity packs the densest items first from the front
+    (and the most rearward one from the back)
+    Args:
+        item_tables (dict): Output of packing_bounds.get_item_tables
+        route_quantities (np.ndarray): Demanded quantity per type, shape (number of routes, number of types)
+        cross_section (float): Cargo width times cargo height
+        x_min (float): Front end of the cargo space
+        x_max (float): Rear end of the cargo space
+    Returns:
+        tuple: Lowest and highest center of gravity per route
+    '''
+    # Types densest first
+    order = item_tables["density_order"]
+    masses = route_quantities[:, order] * item_tables["mass"][order]
+    lengths = route_quantities[:, order] * item_tables["volume"][order] / cross_section
+    ends = np.cumsum(lengths, axis=1)
+
+    total_masses = masses.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(total_masses > 0, (masses * (ends - lengths / 2)).sum(axis=1) / total_masses, 0.0)
+
+    return x_min + offset, x_max - offset
+
+
+def check_axle_weights(constraints:dict, total_masses:np.ndarray, cog_min:np.ndarray = None, cog_max:np.ndarray = None) -> np.ndarray:
+    '''
+    Check for many routes at once whether their total mass can be placed without exceeding an axle limit.
+    Each axle limits the center of gravity to a half-line; a route is provably axle infeasible if their intersection
+    with the reachable range of the center of gravity is empty.
+
+    Args:
+        constraints (dict): Output of get_axle_constraints
+        total_masses (np.ndarray): Total cargo mass per route
+        cog_min (np.ndarray): Optional lowest reachable center of gravity per route, defaults to the front of the cargo space
+        cog_max (np.ndarray): Optional highest reachable center of gravity per route, defaults to the rear of the cargo space
+    Returns:
+        np.ndarray: Boolean mask of routes which pass the bound
+    '''
+    masses = np.atleast_1d(np.asarray(total_masses, dtype=float))[:, None]
+    slack = constraints["limit"] - constraints["constant"] - masses * constraints["mass"]
+    moment = masses * constraints["moment"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = slack / moment
+    lower = np.where(moment < 0, bound, -np.inf).max(axis=1, initial=-np.inf)
+    upper = np.where(moment > 0, bound, np.inf).min(axis=1, initial=np.inf)
+
+    # Axles without a moment (M = 0 or no lever) must hold on their own
+    independent = np.where(moment == 0, slack >= 0, True).all(axis=1)
+
+    cog_min = constraints["x_min"] if cog_min is None else cog_min
+    cog_max = constraints["x_max"] if cog_max is None else cog_max
+    return independent & (np.maximum(lower, cog_min) <= np.minimum(upper, cog_max))
+
+
+class AxleWeightScreen(RouteScreen):
+
+    name = "Axle weights"
+
+    def __init__(self, folders:list = None):
+        """ Rejects routes whose load cannot be distributed within the axle limits under any load placement
+            The center of gravity is bounded by get_axle_constraints and calculate_center_of_gravity_range.
+            Only instances of the given folders (default AXLE_WEIGHT_FOLDERS) are screened.
+        """
+        super().__init__()
+        self.folders = AXLE_WEIGHT_FOLDERS if folders is None else folders
+        self.constraints = {}
+        self.item_tables = {}
+        self.cross_sections = {}
+
+    def filter_routes(self, instance:str, filtered_data:dict, routes) -> np.ndarray:
+        '''
+        Check a batch of routes of one instance
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            routes: Customer sequences without depot, all with the same number of customers
+        Returns:
+            np.ndarray: Boolean mask of routes which pass the bound (all True for instances that are not screened)
+        '''
+        routes = np.atleast_2d(np.asarray(routes, dtype=int))
+        if filtered_data["instance"]["Folder Name"].values[0] not in self.folders:
+            return np.ones(routes.shape[0], dtype=bool)
+
+        if instance not in self.constraints:
+            filtered_instance = filtered_data["instance"]
+            self.constraints[instance] = get_axle_constraints(filtered_instance)
+            self.item_tables[instance] = get_item_tables(filtered_data)
+            self.cross_sections[instance] = float(filtered_instance["Cargo Width"].values[0] * filtered_instance["Cargo Height"].values[0])
+
+        constraints = self.constraints[instance]
+        item_tables = self.item_tables[instance]
+        route_quantities = item_tables["quantities"][routes].sum(axis=1)
+        total_masses = route_quantities @ item_tables["mass"]
+        cog_min, cog_max = calculate_center_of_gravity_range(item_tables, route_quantities, self.cross_sections[instance], constraints["x_min"], constraints["x_max"])
+
+        return self.count(instance, check_axle_weights(constraints, total_masses, cog_min, cog_max))
@@ -1,43 +1,195 @@
-from helper_classes import Instance 
+from helper_classes import Instance
 import pandas as pd
 import os
+import json
+import shutil
 
+from table_io import get_file_format, write_table, read_table
 
-#Alternative create csv for dataframes to avoid loading all instances every time
-def main(): 
-    instances_data = []
-    items = pd.DataFrame()
-    single_demands = pd.DataFrame()
-    aggregate_demands = pd.DataFrame()
-    customers = pd.DataFrame()
-    for folder_path in ["Data/Gendreau_et_al_2006"]:
-        for file_name in os.listdir(folder_path):
+
+# Tables written per instance partition, same content as the former monolithic CSVs
+TABLES = ["instance_data", "agg_demand", "single_demands", "items", "customers"]
+
+# Key columns of the tables and the instance columns kept in the manifest for filtering (see export_partitions),
+# pinned to their dtypes in Instance so CSV partitions read back the same, e.g. numeric looking names, types and demand Customer IDs stay strings
+KEY_DTYPES = {"Folder Name": str, "Instance Name": str}
+FILTER_DTYPES = {"Number of Customers": "int64", "Number of Items": "int64", "Number of Item Types": "int64", "Time Windows": "int64"}
+CSV_DTYPES = {
+    "instance_data": {**KEY_DTYPES, **FILTER_DTYPES},
+    "agg_demand": {**KEY_DTYPES, "Customer ID": str},
+    "single_demands": {**KEY_DTYPES, "Customer ID": str, "Type": str},
+    "items": {**KEY_DTYPES, "Type": str},
+    "customers": {**KEY_DTYPES, "Customer ID": "int64"}
+}
+
+MANIFEST_FILE = "manifest.json"
+
+
+def get_data_folders(data_path:str = "Data") -> list:
+    ''' All dataset folders containing instance text files (RandomSet_krebs only holds route JSONs) '''
+    return [os.path.join(data_path, folder_name) for folder_name in sorted(os.listdir(data_path))
+            if os.path.isdir(os.path.join(data_path, folder_name))
+            and any(file_name.endswith(".txt") and file_name != "Overview.txt" for file_name in os.listdir(os.path.join(data_path, folder_name)))]
+
+
+def get_partition_path(output_path:str, folder_name:str, file_name:str) -> str:
+    ''' Directory of one instance partition: <output_path>/<folder>/<instance file> '''
+    return os.path.join(output_path, folder_name, os.path.splitext(file_name)[0])
+
+
+def load_manifest(output_path:str) -> dict:
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {"partitions": {}}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_partitions(folder_paths:list, output_path:str, file_format:str = "csv") -> tuple:
+    '''
+    Export every instance to its own partition with one file per table
+    Only partitions whose source file changed (modification time or size) since the last export are rewritten,
+    partitions of the exported folders whose source file no longer exists are removed
+
+    Args:
+        folder_paths (list): Dataset folders to export
+        output_path (str): Root directory of the partitioned export
+        file_format (str): "csv" or "parquet" (needs pyarrow or fastparquet, CSV otherwise)
+    Returns:
+        tuple: Number of written, unchanged and removed partitions
+    '''
+    file_format = get_file_format(file_format)
+    os.makedirs(output_path, exist_ok=True)
+    manifest = load_manifest(output_path)
+    partitions = manifest["partitions"]
+
+    written = 0
+    unchanged = 0
+    removed = 0
+    for folder_path in folder_paths:
+        folder_name = os.path.basename(os.path.normpath(folder_path))
+
+        # Partitions of deleted or renamed source files would still be returned by read_partitions
+        source_keys = {f"{folder_name}/{os.path.splitext(file_name)[0]}" for file_name in os.listdir(folder_path)
+                       if file_name.endswith(".txt") and file_name != "Overview.txt"}
+        for partition_key in [partition_key for partition_key, entry in partitions.items() if entry["Folder Name"] == folder_name and partition_key not in source_keys]:
+            shutil.rmtree(os.path.join(output_path, *partition_key.split("/")), ignore_errors=True)
+            del partitions[partition_key]
+            removed += 1
+
+        for file_name in sorted(os.listdir(folder_path)):
             if file_name.endswith(".txt"):
                 if file_name != "Overview.txt":
                     file_path = os.path.join(folder_path, file_name)
+                    partition_key = f"{folder_name}/{os.path.splitext(file_name)[0]}"
+                    stat = os.stat(file_path)
+                    signature = {"mtime": stat.st_mtime, "size": stat.st_size}
+
+                    entry = partitions.get(partition_key)
+                    if entry is not None and entry["Source"] == signature and entry["Format"] == file_format:
+                        unchanged += 1
+                        continue
+
                     instance = Instance(file_path, standardize = False, analyze_one_source=False)
-                    instances_data.append(instance.to_dict())
-                    items = pd.concat([items,instance.items])
-                    single_demands = pd.concat([single_demands,instance.demands])
-                    aggregate_demands = pd.concat([aggregate_demands,instance.aggregated_demands])
-                    customers = pd.concat([customers,instance.customers])
+                    instance_data = instance.to_dict()
+                    tables = {
+                        "instance_data": pd.DataFrame([instance_data]),
+                        "agg_demand": instance.aggregated_demands,
+                        "single_demands": instance.demands,
+                        "items": instance.items,
+                        "customers": instance.customers
+                    }
+
+                    # Tables of an earlier export in another format are removed with the partition
+                    partition_path = get_partition_path(output_path, folder_name, file_name)
+                    shutil.rmtree(partition_path, ignore_errors=True)
+                    os.makedirs(partition_path)
+                    for table_name, table in tables.items():
+                        write_table(table, os.path.join(partition_path, f"{table_name}.{file_format}"), file_format)
+
+                    # Keep the instance columns used for filtering in the manifest, so reads can skip partitions
+                    partitions[partition_key] = {
+                        "Source": signature,
+                        "Format": file_format,
+                        "Folder Name": folder_name,
+                        "Instance Name": instance_data["Instance Name"],
+                        "Number of Customers": instance_data["Number of Customers"],
+                        "Number of Items": instance_data["Number of Items"],
+                        "Number of Item Types": instance_data["Number of Item Types"],
+                        "Time Windows": instance_data["Time Windows"]
+                    }
+                    written += 1
+
+        # Persist after every folder so an interrupted run can resume
+        with open(os.path.join(output_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+
+    return written, unchanged, removed
+
+
+def read_partitions(output_path:str,
+                    tables:list = None,
+                    folders:list = None,
+                    instances:list = None,
+                    min_customers:int = None,
+                    max_customers:int = None) -> dict:
+    '''
+    Load a filtered subset of the partitioned export, partitions are selected on the manifest and others are never opened
+
+    Args:
+        output_path (str): Root directory of the partitioned export
+        tables (list): Tables to load, defaults to all TABLES
+        folders (list): Dataset folder names to keep, e.g. ["Krebs_Ehmke_Koch_2021"]
+        instances (list): Instance names to keep
+        min_customers (int): Minimum number of customers (inclusive)
+        max_customers (int): Maximum number of customers (inclusive)
+    Returns:
+        dict: Table name -> concatenated DataFrame, in the layout of the former monolithic CSVs
+    '''
+    tables = TABLES if tables is None else tables
+    partitions = load_manifest(output_path)["partitions"]
 
-    # Convert list to DataFrame
-    df = pd.DataFrame(instances_data)
-    prefix ="gendreau"
+    selected = []
+    for partition_key, entry in sorted(partitions.items()):
+        if folders is not None and entry["Folder Name"] not in folders:
+            continue
+        if instances is not None and entry["Instance Name"] not in instances:
+            continue
+        if min_customers is not None and entry["Number of Customers"] < min_customers:
+            continue
+        if max_customers is not None and entry["Number of Customers"] > max_customers:
+            continue
+        selected.append((partition_key, entry["Format"]))
 
+    result = {}
+    for table_name in tables:
+        frames = [read_table(os.path.join(output_path, *partition_key.split("/"), f"{table_name}.{file_format}"), file_format, CSV_DTYPES.get(table_name))
+                  for partition_key, file_format in selected]
+        result[table_name] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return result
 
-    file_path = r"H:\Data\CSV_Datasets_Route_Completion"
 
-    df.to_csv(os.path.join(file_path, f"{prefix}_instance_data.csv"), index=False)
-    aggregate_demands.to_csv(os.path.join(file_path, f"{prefix}_agg_demand.csv"), index=False)
-    single_demands.to_csv(os.path.join(file_path, f"{prefix}_single_demands.csv"), index=False)
-    items.to_csv(os.path.join(file_path, f"{prefix}_items.csv"), index=False)
-    customers.to_csv(os.path.join(file_path, f"{prefix}_customers.csv"), index=False)
-    
+def write_combined_csvs(tables:dict, file_path:str, prefix:str) -> None:
+    ''' Write loaded tables as the former monolithic CSVs, e.g. "gendreau_instance_data.csv" '''
+    for table_name, table in tables.items():
+        table.to_csv(os.path.join(file_path, f"{prefix}_{table_name}.csv"), index=False)
+
+
+#Alternative create csv for dataframes to avoid loading all instances every time
+def main():
+
+    output_path = r"H:\Data\CSV_Datasets_Route_Completion\partitions"
+    FILE_FORMAT = "csv" # or "parquet" with pyarrow installed (smaller and faster to read)
+
+    written, unchanged, removed = export_partitions(get_data_folders("Data"), output_path, FILE_FORMAT)
+    print(f"Written partitions: {written} - Unchanged partitions: {unchanged} - Removed partitions: {removed}")
+
+    # Former single-folder export, now read from the partitions
+    tables = read_partitions(output_path, folders=["Gendreau_et_al_2006"])
+    write_combined_csvs(tables, r"H:\Data\CSV_Datasets_Route_Completion", prefix="gendreau")
+
 
 if __name__ == "__main__":
     print("Creating instances...")
     main()
     print("Finished.")
-
@@ -1,11 +1,26 @@
 from helper_classes import Instance 
 from helper_functions import get_filtered_data, get_vehicle_dataframe
+from shared_corpus import publish_corpus, init_worker
+from route_registry import RouteRegistry, route_key
+from route_costs import DistanceMatrixCache, calculate_route_lengths
+from time_windows import TimeWindowScreen
+from route_samplers import ENUMERATION_PERMUTATIONS, create_sampler
+from axle_weights import AxleWeightScreen
+from packing_bounds import PackingBoundScreen
+from fit_check import RouteFitCheck, get_precheck_path, write_label_file
+from route_features import RouteFeatureTable
+from solution_split import generate_solution_instances
+from sharding import parse_shard, get_task_key, select_shard_tasks, get_file_signatures, collect_task_files, write_shard_manifest
+import shared_corpus
 import pandas as pd
+import numpy as np
 import os
 import random
 import time
 import json
-from itertools import product, chain
+import argparse
+from itertools import product
+from multiprocessing import Pool
 
 def extract_customer_information(filtered_customers:pd.DataFrame, customer:int) -> dict:
 
@@ -23,16 +38,8 @@ def extract_customer_information(filtered_customers:pd.DataFrame, customer:int)
     return nodes
 
 
-def write_json_file(instance:str,
-                    num_customers:int,
-                    j:int,
-                    perm:list[int],
-                    filtered_data,
-                    file_path) -> None:
-     
-    filename = f"{file_path}/{instance}_{num_customers}_{j}.json"
-
-    vehicles_json = get_vehicle_dataframe(filtered_data["instance"])
+def build_nodes_json(perm:list[int], filtered_data) -> list:
+    ''' Build the node entries (customer information and demanded items) of a route '''
 
     nodes_json = []
     for customer in perm:
@@ -63,6 +70,26 @@ def write_json_file(instance:str,
         node.update({"Items": node_items})
         nodes_json.append(node)
 
+    return nodes_json
+
+
+def write_json_file(instance:str,
+                    num_customers:int,
+                    j:int,
+                    perm:list[int],
+                    filtered_data,
+                    file_path,
+                    nodes_json:list = None,
+                    route_length:float = None) -> None:
+     
+    filename = f"{file_path}/{instance}_{num_customers}_{j}.json"
+
+    vehicles_json = get_vehicle_dataframe(filtered_data["instance"])
+
+    # Nodes can be passed in when the same route is written to several folders
+    if nodes_json is None:
+        nodes_json = build_nodes_json(perm, filtered_data)
+
     name_in_file = filename.split("/")[-1].split(".")[0]
     data = {
         "Name": name_in_file,
@@ -70,10 +97,48 @@ def write_json_file(instance:str,
         "Nodes": nodes_json
     }
 
+    if route_length is not None:
+        data["RouteLength"] = float(route_length)
+
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
 
 
+def screen_route(instance:str, filtered_data:dict, perm:list[int], screens:list) -> bool:
+    '''
+        Check a route against the screens in order, the first rejecting screen decides
+    Args:
+        instance (str): Name of the instance
+        filtered_data (dict): Filtered datasets of the instance
+        perm (list[int]): Customer sequence without depot
+        screens (list): Screens with an is_feasible method
+    Returns:
+        bool: True if no screen rejects the route
+    '''
+    return all(screen.is_feasible(instance, filtered_data, perm) for screen in screens)
+
+
+def evaluate_route(instance:str, filtered_data:dict, perm:list[int], distance_matrix:np.ndarray = None, fit_check:RouteFitCheck = None) -> dict:
+    '''
+        Tour length, pre-check result and node entries of a written route, evaluated once for all output folders
+    Args:
+        instance (str): Name of the instance
+        filtered_data (dict): Filtered datasets of the instance
+        perm (list[int]): Customer sequence without depot
+        distance_matrix (np.ndarray): Optional distance matrix of the instance for the tour length
+        fit_check (RouteFitCheck): Optional geometric pre-check
+    Returns:
+        dict: "Route Length" (None without distance matrix), "Precheck" (reason and number of items) and "Nodes"
+              (None for routes proven infeasible)
+    '''
+    precheck = (None, None) if fit_check is None else fit_check.check_route(instance, filtered_data, perm)
+    return {
+        "Route Length": None if distance_matrix is None else calculate_route_lengths(distance_matrix, [perm])[0],
+        "Precheck": precheck,
+        "Nodes": build_nodes_json([0] + perm, filtered_data) if precheck[0] is None else None
+    }
+
+
 def generate_instances(instance:str,
                        df:pd.DataFrame,
                        aggregate_demands:pd.DataFrame,
@@ -84,7 +149,17 @@ def generate_instances(instance:str,
                        multiplierCustomerNumber:int = 2,
                        attemptLimit:int = 40, 
                        succesfulInstancesThreshold: int = 40,
-                       cap:float = 1.0) -> int:
+                       cap:float = 1.0,
+                       filtered_data:dict = None,
+                       registry:RouteRegistry = None,
+                       distance_matrices:DistanceMatrixCache = None,
+                       screens:list = None,
+                       sampling:str = "random",
+                       fit_check:RouteFitCheck = None,
+                       route_features:RouteFeatureTable = None,
+                       enumeration_threshold:int = None,
+                       enumeration_max_routes:int = None,
+                       sampler_options:dict = None) -> int:
     '''
         Generate train instances with specific customer routes and demands
     Args:       
@@ -93,16 +168,84 @@ def generate_instances(instance:str,
         aggregate_demands (pd.DataFrame): Aggregate demands dataset
         single_demands (pd.DataFrame): Single demands dataset
         items (pd.DataFrame): Items dataset
+        filtered_data (dict): Optional already filtered datasets (e.g. from a SharedCorpus), the full datasets may then be None
+        registry (RouteRegistry): Optional registry of routes emitted in earlier runs, known routes are skipped like duplicates
+        distance_matrices (DistanceMatrixCache): Optional distance matrices, adds the tour length as "RouteLength" to the route files
+        screens (list): Optional route screens (route_screens.RouteScreen, e.g. PackingBoundScreen, AxleWeightScreen or TimeWindowScreen),
+                        applied in order to routes within the caps, rejected routes count like capacity infeasible ones
+        sampling (str): Sampling mode of the customer sequences, see route_samplers.SAMPLERS
+        fit_check (RouteFitCheck): Optional geometric pre-check, routes proven infeasible are labeled in the precheck folder instead of written as route files
+        route_features (RouteFeatureTable): Optional feature table of the written routes, stored in the features folder next to the route files
+        enumeration_threshold (int): Optional, route lengths with at most this many permutations are enumerated instead of sampled
+        enumeration_max_routes (int): Optional, only this many enumerated routes per route length are used (a deterministic subsample for a fixed seed)
+        sampler_options (dict): Optional keyword arguments of the sampler, e.g. {"quotas": 50, "volume_edges": [0, 0.5, 0.8, 1]} for "stratified"
     Returns:
         int: Number of instances created
     '''
+    # A sweep over a single cap is the plain generation loop
+    return generate_instances_multi_cap(instance, df, aggregate_demands, single_demands, items, customers, {cap: file_path},
+                                        multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold, filtered_data,
+                                        registry, distance_matrices, screens, sampling, fit_check, route_features,
+                                        enumeration_threshold, enumeration_max_routes, sampler_options)[cap]
+
+
+def generate_instances_multi_cap(instance:str,
+                                 df:pd.DataFrame,
+                                 aggregate_demands:pd.DataFrame,
+                                 single_demands:pd.DataFrame,
+                                 items:pd.DataFrame,
+                                 customers:pd.DataFrame,
+                                 file_paths:dict,
+                                 multiplierCustomerNumber:int = 2,
+                                 attemptLimit:int = 40, 
+                                 succesfulInstancesThreshold: int = 40,
+                                 filtered_data:dict = None,
+                                 registry:RouteRegistry = None,
+                                 distance_matrices:DistanceMatrixCache = None,
+                                 screens:list = None,
+                                 sampling:str = "random",
+                                 fit_check:RouteFitCheck = None,
+                                 route_features:RouteFeatureTable = None,
+                                 enumeration_threshold:int = None,
+                                 enumeration_max_routes:int = None,
+                                 sampler_options:dict = None) -> dict:
+    '''
+        Generate train instances for several caps in one pass
+        Candidate routes are sampled and their volume and mass summed once, every candidate is offered to all caps that
+        still need routes of its length. Each cap draws its own volume and weight cap for the candidate and keeps its own
+        counters (route slots, attempts, breakups, duplicates), so every output folder follows the loop of generate_instances
+        on the shared candidate stream. A candidate written to several folders is screened, pre-checked and converted to
+        nodes once. The sampler and the registry are shared: stratified quotas count routes written to any folder and only
+        routes of earlier runs are skipped as known. With more than one cap the folders differ from separate runs.
+    Args:       
+        instance (str): Name of the instance
+        df (pd.DataFrame): Instance dataset
+        aggregate_demands (pd.DataFrame): Aggregate demands dataset
+        single_demands (pd.DataFrame): Single demands dataset
+        items (pd.DataFrame): Items dataset
+        file_paths (dict): Output folder per cap
+        filtered_data (dict): Optional already filtered datasets (e.g. from a SharedCorpus), the full datasets may then be None
+        registry (RouteRegistry): Optional registry of routes emitted in earlier runs, known routes are skipped like duplicates
+        distance_matrices (DistanceMatrixCache): Optional distance matrices, adds the tour length as "RouteLength" to the route files
+        screens (list): Optional route screens (route_screens.RouteScreen, e.g. PackingBoundScreen, AxleWeightScreen or TimeWindowScreen),
+                        applied in order to routes within the caps, rejected routes count like capacity infeasible ones
+        sampling (str): Sampling mode of the customer sequences, see route_samplers.SAMPLERS
+        fit_check (RouteFitCheck): Optional geometric pre-check, routes proven infeasible are labeled in the precheck folder instead of written as route files
+        route_features (RouteFeatureTable): Optional feature table of the written routes, stored in the features folder next to the route files
+        enumeration_threshold (int): Optional, route lengths with at most this many permutations are enumerated instead of sampled
+        enumeration_max_routes (int): Optional, only this many enumerated routes per route length are used (a deterministic subsample for a fixed seed)
+        sampler_options (dict): Optional keyword arguments of the sampler, e.g. {"quotas": 50, "volume_edges": [0, 0.5, 0.8, 1]} for "stratified"
+    Returns:
+        dict: Number of instances created and duplicates avoided per cap
+    '''
     #maximum value
     MAX = 1.0
     # seed random new
     random.seed(42 + multiplierCustomerNumber + attemptLimit + succesfulInstancesThreshold)
-    
-    # Create dict with filtered dataframes
-    filtered_data = get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers)
+
+    # Create dict with filtered dataframes once for all caps
+    if filtered_data is None:
+        filtered_data = get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers)
 
     # Retrieve max customers
     max_customers = filtered_data["instance"]["Number of Customers"].values[0]
@@ -114,98 +257,162 @@ def generate_instances(instance:str,
     max_weight = filtered_data["instance"]["Vehicle Capacity"].values[0]
     max_volume = filtered_data["instance"]["Cargo Length"].values[0] * filtered_data["instance"]["Cargo Width"].values[0] * filtered_data["instance"]["Cargo Height"].values[0] 
 
-    #Counter for created instances
-    total_created = 0
-    total_duplicates = 0
+    # Sampler of candidate customer sequences, shared by all caps
+    sampler = create_sampler(sampling, instance, filtered_data, numbers, distance_matrices, enumeration_threshold, enumeration_max_routes, sampler_options)
+
+    screens = [] if screens is None else screens
+
+    # Distance matrix resolved once, written routes only look up their tour length
+    distance_matrix = None if distance_matrices is None else distance_matrices.get(instance, filtered_data["customers"])
+
+    #Counter for created instances per cap
+    total_created = dict.fromkeys(file_paths, 0)
+    total_duplicates = dict.fromkeys(file_paths, 0)
     # Cache dicts for aggregated demand to avoid repeated lookups
     agg_volume_dict = dict(zip(filtered_data["agg_demands"]["Customer ID"].astype(int),
                            filtered_data["agg_demands"]["Agg Volume"]))
     agg_mass_dict = dict(zip(filtered_data["agg_demands"]["Customer ID"].astype(int),
                          filtered_data["agg_demands"]["Agg Mass"]))
-    
-    #Create instances with random number of customers
-    exit_outer_loop = False
+
+    # Caps which have not given up on longer routes yet
+    running_caps = list(file_paths)
 
     for num_customers in numbers[1:]:
 
-        if exit_outer_loop: break
+        if not running_caps: break
         checked_routes_set = {(0,0)}
-
-        exit_outer_loop_counter = 0
-
-        for j in range(num_customers * multiplierCustomerNumber):
-
-            succesful_instances = 0
-            attempts = 0
-            breakup = 0
-            found_succesful_tour = False
-
-            while(succesful_instances < succesfulInstancesThreshold):
-
-                perm = random.sample(numbers, num_customers)
-                if tuple(perm) in checked_routes_set: 
-                    total_duplicates += 1
-                    breakup += 1
-                else:
-
-                    checked_routes_set.add(tuple(perm))
+        number_of_slots = num_customers * multiplierCustomerNumber
+
+        # Loop state per cap: route slot j of the route length and the counters of the current slot
+        states = {cap: {"j": 0, "exit_outer_loop_counter": 0, "succesful_instances": 0, "attempts": 0, "breakup": 0, "found_succesful_tour": False}
+                  for cap in running_caps}
+        active_caps = [cap for cap in running_caps if number_of_slots > 0 and succesfulInstancesThreshold > 0]
+
+        while active_caps:
+
+            perm = sampler.sample(num_customers)
+            outcomes = {}
+            if perm is None:
+                # Sampler could not construct a route of this length
+                outcomes = dict.fromkeys(active_caps, "attempt")
+            elif tuple(perm) in checked_routes_set or (registry is not None and registry.contains(instance, route_key(perm))):
+                checked_routes_set.add(tuple(perm))
+                outcomes = dict.fromkeys(active_caps, "duplicate")
+            else:
+                checked_routes_set.add(tuple(perm))
+                total_volume = sum(agg_volume_dict.get(c, 0) for c in perm)
+                total_weight = sum(agg_mass_dict.get(c, 0) for c in perm)
+
+                # Screened once, when the first cap accepts the totals
+                feasible = None
+                defined_caps = {}
+                for cap in active_caps:
                     defined_vol_cap = round(random.uniform(cap,MAX),2)
                     defined_weight_cap = round(random.uniform(cap,MAX),2)
 
-                    total_volume = sum(agg_volume_dict.get(c, 0) for c in perm)
-                    total_weight = sum(agg_mass_dict.get(c, 0) for c in perm)
-
                     if total_volume > (max_volume * defined_vol_cap) or total_weight > (max_weight * defined_weight_cap):
-                        attempts += 1
+                        outcomes[cap] = "attempt"
+                        continue
+                    if feasible is None:
+                        feasible = screen_route(instance, filtered_data, perm, screens)
+                    outcomes[cap] = "success" if feasible else "attempt"
+                    defined_caps[cap] = (defined_vol_cap, defined_weight_cap)
+
+            writing_caps = [cap for cap in active_caps if outcomes[cap] == "success"]
+            if writing_caps:
+                if registry is not None:
+                    registry.add(instance, route_key(perm))
+                sampler.register(perm)
+
+                evaluation = evaluate_route(instance, filtered_data, perm, distance_matrix, fit_check)
+                precheck_reason, number_of_items = evaluation["Precheck"]
+
+                for cap in writing_caps:
+                    state = states[cap]
+                    route_number = state["j"] * succesfulInstancesThreshold + state["succesful_instances"]
+                    if route_features is not None:
+                        route_features.add(instance, filtered_data, file_paths[cap], f"{instance}_{num_customers}_{route_number}", perm, *defined_caps[cap], precheck_reason)
+
+                    if precheck_reason is None:
+                        write_json_file(instance, num_customers, route_number, [0] + perm, filtered_data, file_paths[cap], evaluation["Nodes"], evaluation["Route Length"])
                     else:
+                        # Proven infeasible, labeled without a solver call
+                        write_label_file(get_precheck_path(file_paths[cap]), f"{instance}_{num_customers}_{route_number}", number_of_items, precheck_reason)
+
+            for cap in active_caps:
+                state = states[cap]
+                if outcomes[cap] == "success":
+                    state["succesful_instances"] += 1
+                    total_created[cap] += 1
+                    state["attempts"] = 0
+                    state["breakup"] = 0
+                    state["found_succesful_tour"] = True
+                    slot_finished = state["succesful_instances"] >= succesfulInstancesThreshold
+                else:
+                    if outcomes[cap] == "duplicate":
+                        total_duplicates[cap] += 1
+                        state["breakup"] += 1
+                    else:
+                        state["attempts"] += 1
 
-                        perm.insert(0, 0) #Add depot at the beginning, if feasible
-
-                        write_json_file(instance,num_customers, j * succesfulInstancesThreshold + succesful_instances, perm, filtered_data, file_path)
-
-                        succesful_instances += 1
-                        total_created += 1
-                        attempts = 0
-                        breakup = 0
-                        found_succesful_tour = True
-                        continue
+                    if(state["attempts"] >= attemptLimit):
+                        state["attempts"] = 0
+                        state["breakup"] += 1
 
-                if(attempts >= attemptLimit):
-                    attempts = 0
-                    breakup += 1
+                    slot_finished = state["breakup"] >= succesfulInstancesThreshold
+                    if slot_finished and not state["found_succesful_tour"]:
+                        state["exit_outer_loop_counter"] += 1
 
-                if(breakup >= succesfulInstancesThreshold):
-                    if(not found_succesful_tour):
-                        exit_outer_loop_counter += 1
-                        #print(f"Current j: {j} - Exit outer loop: {exit_outer_loop_counter} with current breakups {breakup}")
-                    break
+                if slot_finished:
+                    state.update({"j": state["j"] + 1, "succesful_instances": 0, "attempts": 0, "breakup": 0, "found_succesful_tour": False})
 
-        if exit_outer_loop_counter >= num_customers * multiplierCustomerNumber: 
-            exit_outer_loop = True
+            # Caps are done with the route length once all its slots are finished
+            active_caps = [cap for cap in active_caps if states[cap]["j"] < number_of_slots]
 
-    return total_created, total_duplicates
+        running_caps = [cap for cap in running_caps if states[cap]["exit_outer_loop_counter"] < number_of_slots]
 
-#Alternative create csv for dataframes to avoid loading all instances every time
-def main(): 
+    if registry is not None:
+        registry.merge(instance)
 
-    DATASET = "Krebs" # or DATASET = "Gendreau"
+    if route_features is not None:
+        for file_path in file_paths.values():
+            route_features.write(instance, file_path)
 
+    return {cap: (total_created[cap], total_duplicates[cap]) for cap in file_paths}
 
-    if DATASET == "Krebs": 
-        data_path = "Data/Krebs_Ehmke_Koch_2021"
-        save_file_path_base = r"H:\Data\Random_Data\Krebs"
-    elif DATASET == "Gendreau":
-        data_path = "Data/Gendreau_et_al_2006"
-        save_file_path_base = r"H:\Data\Random_Data\Gendreau"
-    else: 
-        raise NameError("Dataset not specified!")
 
+def generate_instances_worker(task:tuple):
+    '''
+        Run a generation function in a pool worker on the shared corpus attached by init_worker
+    Args:
+        task (tuple): Generation function (generate_instances or generate_instances_multi_cap), instance name and keyword arguments
+    Returns:
+        Result of the generation function
+    '''
+    generate, selected_instance, kwargs = task
+    return generate(instance = selected_instance,
+                    df = None,
+                    aggregate_demands = None,
+                    single_demands = None,
+                    items = None,
+                    customers = None,
+                    filtered_data = shared_corpus.worker_corpus.get_filtered_data(selected_instance),
+                    **kwargs)
+
+def load_corpus(folder_paths:list) -> tuple:
+    '''
+        Parse all instance files of the data folders
+    Args:
+        folder_paths (list): Data folders, e.g. ["Data/Krebs_Ehmke_Koch_2021"]
+    Returns:
+        tuple: Instance, aggregate demands, single demands, items and customers datasets
+    '''
     instances_data = []
     items = pd.DataFrame()
     single_demands = pd.DataFrame()
     aggregate_demands = pd.DataFrame()
     customers = pd.DataFrame()
-    for folder_path in [data_path]:
+    for folder_path in folder_paths:
         for file_name in os.listdir(folder_path):
             if file_name.endswith(".txt"):
                 if file_name != "Overview.txt":
@@ -218,7 +425,76 @@ def main():
                     customers = pd.concat([customers,instance.customers])
 
     # Convert list to DataFrame
-    df = pd.DataFrame(instances_data)   
+    df = pd.DataFrame(instances_data)
+    return df, aggregate_demands, single_demands, items, customers
+
+
+def create_output_folders(save_file_path_base:str,
+                          multiplierCustomerNumber:int,
+                          attemptLimit:int,
+                          succesfulInstancesThreshold:int,
+                          caps:list) -> tuple:
+    '''
+        Create the input and output folders of a configuration per cap
+    Args:
+        save_file_path_base (str): Base folder of the generated data
+        caps (list): Caps of the configuration
+    Returns:
+        tuple: Sub folder name and input folder (route files) per cap
+    '''
+    sub_folder_names = {}
+    file_paths = {}
+    for cap in caps:
+        folder_add = int(cap * 10)
+        sub_folder_name = f"RandomData_{multiplierCustomerNumber}_{attemptLimit}_{succesfulInstancesThreshold}_{folder_add}"
+        os.makedirs(os.path.join(save_file_path_base,sub_folder_name),exist_ok=True)
+        output_file_path = os.path.join(save_file_path_base,sub_folder_name,"input")
+        os.makedirs(output_file_path,exist_ok=True)
+        os.makedirs(os.path.join(save_file_path_base,sub_folder_name,"output"),exist_ok=True)
+        sub_folder_names[cap] = sub_folder_name
+        file_paths[cap] = output_file_path
+    return sub_folder_names, file_paths
+
+
+#Alternative create csv for dataframes to avoid loading all instances every time
+def main(): 
+
+    ap = argparse.ArgumentParser(description="Generate random route instances.")
+    ap.add_argument("--shard", default=None, help="Run only the tasks of shard i of N nodes, e.g. 0/4 (see sharding.py for the merge step)")
+    ap.add_argument("--manifest", action="store_true", help="Write the manifest without --shard, e.g. of a single node reference run (shard 0/1)")
+    args = ap.parse_args()
+    shard_index, number_of_shards = parse_shard(args.shard)
+    # The manifest hashes every written file, only sharded runs and requested reference runs pay for it
+    write_manifest = args.shard is not None or args.manifest
+
+    DATASET = "Krebs" # or DATASET = "Gendreau"
+    WORKERS = 1 # > 1 publishes the corpus once as memory-mapped files shared by all workers
+    SWEEP_CAPS = False # generate all caps of a configuration on one candidate stream (sampled, summed and evaluated once), the folders then differ from separate runs
+    USE_REGISTRY = False # skip routes emitted by any earlier run (registry stored next to the output folders)
+    INCLUDE_ROUTE_LENGTH = False # add the tour length of each route as "RouteLength" to the route files
+    SCREEN_TIME_WINDOWS = False # reject routes violating the time windows of VRPTW instances before writing
+    SAMPLING = "random" # or "time_windows" to construct time window feasible routes directly, "growth" to extend routes of the previous length,
+                        # "stratified" to fill quotas per relative volume / mass bin (route_samplers.STRATIFIED_QUOTA), "clustered" for spatially compact routes
+    SAMPLER_OPTIONS = None # e.g. {"quotas": 50, "volume_edges": [0, 0.5, 0.8, 1], "mass_edges": [0, 0.5, 0.8, 1]} for the stratified bins
+    SCREEN_AXLE_WEIGHTS = False # reject routes whose load violates the axle limits under any load placement
+    SCREEN_PACKING_BOUNDS = False # reject routes whose items provably need more than one vehicle (bin packing lower bounds)
+    FIT_CHECK = False # label geometrically infeasible routes in a precheck folder instead of sending them to the solver
+    WRITE_ROUTE_FEATURES = False # store a feature table of the written routes per instance in a features folder
+    ENUMERATION_THRESHOLD = ENUMERATION_PERMUTATIONS # enumerate route lengths with at most this many permutations instead of sampling them, None samples every length
+    ENUMERATION_MAX_ROUTES = None # e.g. 500: use only this many enumerated routes per route length
+    SOLUTION_TOURS = 0 # > 0 also writes complete fleet solutions split from this many giant tours per instance (Solutions folder)
+
+
+    if DATASET == "Krebs": 
+        data_path = "Data/Krebs_Ehmke_Koch_2021"
+        save_file_path_base = r"H:\Data\Random_Data\Krebs"
+    elif DATASET == "Gendreau":
+        data_path = "Data/Gendreau_et_al_2006"
+        save_file_path_base = r"H:\Data\Random_Data\Gendreau"
+    else: 
+        raise NameError("Dataset not specified!")
+
+    df, aggregate_demands, single_demands, items, customers = load_corpus([data_path])
 
     # Select instance names
     if DATASET == "Krebs": 
@@ -232,36 +508,137 @@ def main():
     attemptLimits = [1]
     succesfulInstancesThresholds = [1]
     caps = [0.6,0.8]
-    for multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold, cap in chain(product(multiplierCustomerNumbers, attemptLimits, succesfulInstancesThresholds,caps)):
+
+    # Tasks are (instance, configuration) pairs, every generate call seeds itself from its configuration, so the
+    # outputs do not depend on which shard runs a task
+    configurations = [(multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold, cap_group)
+                      for multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold in product(multiplierCustomerNumbers, attemptLimits, succesfulInstancesThresholds)
+                      for cap_group in ([caps] if SWEEP_CAPS else [[cap] for cap in caps])]
+    configuration_names = {i: "_".join(f"RandomData_{m}_{a}_{t}_{int(cap * 10)}" for cap in cap_group) for i, (m, a, t, cap_group) in enumerate(configurations)}
+    if SOLUTION_TOURS > 0:
+        configuration_names["Solutions"] = f"Solutions_{SOLUTION_TOURS}"
+    all_tasks = [get_task_key(selected_instance, configuration_name) for configuration_name in configuration_names.values() for selected_instance in instances]
+    shard_tasks = {}
+    if USE_REGISTRY and number_of_shards > 1:
+        raise ValueError("The route registry depends on the order of all runs and cannot be sharded")
+
+    registry = RouteRegistry(os.path.join(save_file_path_base, "route_registry")) if USE_REGISTRY else None
+    distance_matrices = DistanceMatrixCache(os.path.join(save_file_path_base, "distance_matrices")) if INCLUDE_ROUTE_LENGTH else None
+    # Screens in order of their cost
+    screens = []
+    if SCREEN_PACKING_BOUNDS:
+        screens.append(PackingBoundScreen())
+    if SCREEN_AXLE_WEIGHTS:
+        screens.append(AxleWeightScreen())
+    if SCREEN_TIME_WINDOWS:
+        screens.append(TimeWindowScreen(distance_matrices))
+    fit_check = RouteFitCheck() if FIT_CHECK else None
+    route_features = RouteFeatureTable() if WRITE_ROUTE_FEATURES else None
+
+    # Publish the corpus once, workers attach to it instead of receiving pickled frames
+    pool = None
+    if WORKERS > 1:
+        corpus_path = os.path.join(save_file_path_base, "corpus")
+        publish_corpus(corpus_path, df, aggregate_demands, single_demands, items, customers)
+        pool = Pool(WORKERS, initializer=init_worker, initargs=(corpus_path,))
+
+    # With SWEEP_CAPS all caps of a configuration share one pass over the candidate routes
+    for i, (multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold, cap_group) in enumerate(configurations):
         start_time = time.time()
-        folder_add = int(cap * 10)
-        sub_folder_name = f"RandomData_{multiplierCustomerNumber}_{attemptLimit}_{succesfulInstancesThreshold}_{folder_add}"
-        os.makedirs(os.path.join(save_file_path_base,sub_folder_name),exist_ok=True)
-        output_file_path = os.path.join(save_file_path_base,sub_folder_name,"input")
-        os.makedirs(output_file_path,exist_ok=True)
-        os.makedirs(os.path.join(save_file_path_base,sub_folder_name,"output"),exist_ok=True)
+        selected_instances = select_shard_tasks(list(instances), configuration_names[i], shard_index, number_of_shards)
+
+        sub_folder_names, file_paths = create_output_folders(save_file_path_base, multiplierCustomerNumber, attemptLimit, succesfulInstancesThreshold, cap_group)
+        # Files of earlier runs in the output folders are not part of the manifest
+        output_folders = [os.path.join(sub_folder_names[cap], "input") for cap in cap_group]
+        file_signatures = get_file_signatures(save_file_path_base, output_folders) if write_manifest else None
+
+        kwargs = {"multiplierCustomerNumber": multiplierCustomerNumber,
+                  "attemptLimit": attemptLimit,
+                  "succesfulInstancesThreshold": succesfulInstancesThreshold,
+                  "registry": registry,
+                  "distance_matrices": distance_matrices,
+                  "screens": screens,
+                  "sampling": SAMPLING,
+                  "fit_check": fit_check,
+                  "route_features": route_features,
+                  "enumeration_threshold": ENUMERATION_THRESHOLD,
+                  "enumeration_max_routes": ENUMERATION_MAX_ROUTES,
+                  "sampler_options": SAMPLER_OPTIONS}
+        if SWEEP_CAPS:
+            generate = generate_instances_multi_cap
+            kwargs["file_paths"] = file_paths
+        else:
+            generate = generate_instances
+            kwargs["file_path"] = file_paths[cap_group[0]]
+            kwargs["cap"] = cap_group[0]
+
+        if pool is None:
+            results = [generate(instance = selected_instance,
+                                df = df,
+                                aggregate_demands = aggregate_demands,
+                                single_demands = single_demands,
+                                items = items,
+                                customers = customers,
+                                **kwargs) for selected_instance in selected_instances]
+        else:
+            results = pool.map(generate_instances_worker, [(generate, selected_instance, kwargs) for selected_instance in selected_instances])
+
+        if not SWEEP_CAPS:
+            results = [{cap_group[0]: result} for result in results]
 
-        total_instances = 0
-        total_duplicates = 0
-        for selected_instance in instances:
-            success, duplicated = generate_instances(instance = selected_instance,
-                                                    df = df,
-                                                    aggregate_demands = aggregate_demands,
-                                                    single_demands = single_demands,
-                                                    items = items,
-                                                    customers = customers,
-                                                    file_path = output_file_path,
-                                                    multiplierCustomerNumber = multiplierCustomerNumber,
-                                                    attemptLimit = attemptLimit, 
-                                                    succesfulInstancesThreshold = succesfulInstancesThreshold,
-                                                    cap = cap)
-            
-            total_instances += success
-            total_duplicates += duplicated
-            #print(f"{sub_folder_name} - Instance: {selected_instance} - Instances generated: {success} - Duplicates avoided: {duplicated}")
         end_time = time.time()
         worktime = round(end_time-start_time,2)
-        print(f"{sub_folder_name} - Created instances: {total_instances} and avoided {total_duplicates} duplicates in {worktime} s")
+
+        for cap in cap_group:
+            total_instances = 0
+            total_duplicates = 0
+            for selected_instance, result in zip(selected_instances, results):
+                success, duplicated = result[cap]
+                total_instances += success
+                total_duplicates += duplicated
+                #print(f"{sub_folder_names[cap]} - Instance: {selected_instance} - Instances generated: {success} - Duplicates avoided: {duplicated}")
+            print(f"{sub_folder_names[cap]} - Created instances: {total_instances} and avoided {total_duplicates} duplicates in {worktime} s")
+
+        if write_manifest:
+            task_files = collect_task_files(save_file_path_base, output_folders, selected_instances, file_signatures)
+            shard_tasks.update({get_task_key(selected_instance, configuration_names[i]): task_files[selected_instance] for selected_instance in selected_instances})
+
+        if registry is not None and pool is None:
+            registry_statistics = registry.statistics()
+            print(f"Route registry - Lookups: {registry_statistics['Lookups'].sum()} - Hits: {registry_statistics['Hits'].sum()}")
+
+        if pool is None:
+            for screen in screens:
+                screen_statistics = screen.statistics()
+                if not screen_statistics.empty:
+                    print(f"{screen.name} - Checked routes: {screen_statistics['Checked Routes'].sum()} - Filtered routes: {screen_statistics['Rejected Routes'].sum()}")
+
+        if fit_check is not None and pool is None:
+            fit_check_statistics = fit_check.statistics()
+            if not fit_check_statistics.empty:
+                print(f"Fit check - Checked routes: {fit_check_statistics['Checked Routes'].sum()} - Labeled routes: {fit_check_statistics['Labeled Routes'].sum()}")
+
+    if SOLUTION_TOURS > 0:
+        start_time = time.time()
+        solution_path = os.path.join(save_file_path_base, "Solutions")
+        os.makedirs(solution_path, exist_ok=True)
+        file_signatures = get_file_signatures(save_file_path_base, ["Solutions"]) if write_manifest else None
+        selected_instances = select_shard_tasks(list(instances), configuration_names["Solutions"], shard_index, number_of_shards)
+        total_solutions = sum(generate_solution_instances(selected_instance, df, aggregate_demands, single_demands, items, customers,
+                                                          solution_path, SOLUTION_TOURS, distance_matrices=distance_matrices)
+                              for selected_instance in selected_instances)
+        print(f"Solutions - Created solutions: {total_solutions} in {round(time.time()-start_time,2)} s")
+        if write_manifest:
+            task_files = collect_task_files(save_file_path_base, ["Solutions"], selected_instances, file_signatures)
+            shard_tasks.update({get_task_key(selected_instance, configuration_names["Solutions"]): task_files[selected_instance] for selected_instance in selected_instances})
+
+    if write_manifest:
+        manifest_path = write_shard_manifest(save_file_path_base, shard_index, number_of_shards, shard_tasks, all_tasks)
+        print(f"Shard {shard_index}/{number_of_shards} - Tasks: {len(shard_tasks)} of {len(all_tasks)} - Manifest: {manifest_path}")
+
+    if pool is not None:
+        pool.close()
+        pool.join()
 
 if __name__ == "__main__":
     print("Creating instances...")
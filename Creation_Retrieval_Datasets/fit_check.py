@@ -0,0 +1,176 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from packing_bounds import EPSILON, get_cargo_dimensions, get_item_tables, calculate_lower_bounds
+from route_screens import RouteScreen
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Fit Check - Geometric pre-check of routes before solver submission #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Checks in the order they are reported, the first failing check labels a route
+# There is no fragility check: the fragility rule (no non-fragile item on top of a fragile one) does not change which items
+# can share a floor point, a fragile and a non-fragile item stack with the non-fragile one below whenever their heights fit.
+# Every column can be reordered that way, so a stacking bound over fragile and non-fragile items (e.g. the floor area of the
+# fragile items plus the non-fragile items too tall to fit below them) is never above the "Column Height" bound.
+FIT_CHECKS = ["Orientation", "Floor Area", "Column Height", "Lower Bound"]
+
+# Folder next to the input folder of the route files for labels of routes that are not sent to the solver
+PRECHECK_FOLDER = "precheck"
+
+
+def calculate_column_heights(footprints:np.ndarray, heights:np.ndarray, cargo_height:float, route_quantities:np.ndarray) -> np.ndarray:
+    '''
+    Floor area needed by the items of many routes, from the height of the columns above every floor point.
+    For a threshold p the items are split into J1 = heights > H - p, J2 = H / 2 < heights <= H - p and
+    J3 = p <= heights <= H / 2. Items of J1 and J2 cannot share a column with each other and J1 cannot share one with J3,
+    J3 can only use the headroom above and below J2:
+        area(p) = A(J1) + A(J2) + max(0, (V(J3) - (A(J2) * H - V(J2))) / H)
+    p = 0 is the plain floor area of the items taller than H / 2 plus the volume bound of the others.
+
+    Args:
+        footprints (np.ndarray): Base area of every item type
+        heights (np.ndarray): Height of every item type
+        cargo_height (float): Height of the cargo space
+        route_quantities (np.ndarray): Quantity per type, shape (number of routes, number of types)
+    Returns:
+        np.ndarray: Needed floor area per route (maximum over all thresholds)
+    '''
+    half = cargo_height / 2
+    thresholds = np.unique(np.concatenate([[0.0], heights[heights <= half + EPSILON]]))[:, None]
+
+    # Thresholds x types
+    j1 = heights > cargo_height - thresholds + EPSILON
+    j2 = (heights > half + EPSILON) & ~j1
+    j3 = (heights >= thresholds - EPSILON) & (heights <= half + EPSILON)
+
+    # Routes x thresholds
+    area_j1 = route_quantities @ (j1 * footprints).T
+    area_j2 = route_quantities @ (j2 * footprints).T
+    volume_j2 = route_quantities @ (j2 * footprints * heights).T
+    volume_j3 = route_quantities @ (j3 * footprints * heights).T
+
+    remaining = np.maximum(volume_j3 - (area_j2 * cargo_height - volume_j2), 0) / cargo_height
+    return (area_j1 + area_j2 + remaining).max(axis=1)
+
+
+def check_route_fit(item_tables:dict, route_quantities:np.ndarray, cargo_dimensions:np.ndarray, vehicle_capacity:float) -> dict:
+    '''
+    Run all checks of FIT_CHECKS for many routes at once, items only rotate around the vertical axis
+    Args:
+        item_tables (dict): Output of packing_bounds.get_item_tables
+        route_quantities (np.ndarray): Quantity per type, shape (number of routes, number of types)
+        cargo_dimensions (np.ndarray): Length, width and height of the cargo space
+        vehicle_capacity (float): Vehicle capacity
+    Returns:
+        dict: Boolean mask per check, True where the check proves the route infeasible
+    '''
+    route_quantities = np.atleast_2d(route_quantities)
+    fits = np.isfinite(item_tables["min_extents"]).all(axis=1)
+    footprints = item_tables["dimensions"][:, 0] * item_tables["dimensions"][:, 1]
+    heights = item_tables["dimensions"][:, 2]
+    floor_area = cargo_dimensions[0] * cargo_dimensions[1]
+
+    # Items that do not fit are reported by the orientation check only
+    fitting_quantities = np.where(fits, route_quantities, 0)
+
+    return {
+        "Orientation": route_quantities[:, ~fits].sum(axis=1) > 0,
+        "Floor Area": fitting_quantities @ (footprints * (heights > cargo_dimensions[2] / 2 + EPSILON)) > floor_area + EPSILON,
+        "Column Height": calculate_column_heights(footprints, heights, cargo_dimensions[2], fitting_quantities) > floor_area + EPSILON,
+        "Lower Bound": calculate_lower_bounds(item_tables, route_quantities, cargo_dimensions, vehicle_capacity)["Vehicles"] > 1
+    }
+
+
+def get_precheck_path(file_path:str) -> str:
+    ''' Label folder of an input folder of route files, created if missing '''
+    precheck_path = os.path.join(os.path.dirname(os.path.normpath(file_path)), PRECHECK_FOLDER)
+    os.makedirs(precheck_path, exist_ok=True)
+    return precheck_path
+
+
+def write_label_file(precheck_path:str, name:str, number_of_items:int, reason:str) -> None:
+    ''' Label of a route proven infeasible by the fit check, with the keys of the solver output files '''
+    data = {
+        "Name": name,
+        "NoItems": int(number_of_items),
+        "CP Status": "Infeasible",
+        "CP Time": 0,
+        "Precheck": reason
+    }
+    with open(os.path.join(precheck_path, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+class RouteFitCheck(RouteScreen):
+
+    name = "Fit check"
+
+    def __init__(self):
+        """ Geometric pre-check of routes (orientation, floor area, column heights and packing lower bounds)
+            Routes proven infeasible are labeled "Infeasible" without a solver call (rejected routes of the RouteScreen
+            statistics), filter_routes and is_feasible treat labeled routes as rejected.
+            Fragility is not checked, a fragility stacking bound cannot exceed the column heights (see FIT_CHECKS).
+        """
+        super().__init__()
+        self.item_tables = {}
+        self.vehicles = {}
+
+        # Labeled routes per check and instance
+        self.labeled = {check: {} for check in FIT_CHECKS}
+
+    def check_routes(self, instance:str, filtered_data:dict, routes) -> tuple:
+        '''
+        Check a batch of routes of one instance
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            routes: Customer sequences without depot, all with the same number of customers
+        Returns:
+            tuple: Reason per route (first failing check of FIT_CHECKS, None if no check fails) and number of items per route
+        '''
+        routes = np.atleast_2d(np.asarray(routes, dtype=int))
+
+        if instance not in self.item_tables:
+            filtered_instance = filtered_data["instance"]
+            self.item_tables[instance] = get_item_tables(filtered_data)
+            self.vehicles[instance] = (get_cargo_dimensions(filtered_instance), float(filtered_instance["Vehicle Capacity"].values[0]))
+            for check in FIT_CHECKS:
+                self.labeled[check][instance] = 0
+
+        route_quantities = self.item_tables[instance]["quantities"][routes].sum(axis=1)
+        results = check_route_fit(self.item_tables[instance], route_quantities, *self.vehicles[instance])
+
+        reasons = np.full(routes.shape[0], None, dtype=object)
+        for check in reversed(FIT_CHECKS):
+            reasons[results[check]] = check
+
+        self.count(instance, np.equal(reasons, None))
+        for check in FIT_CHECKS:
+            self.labeled[check][instance] += int((reasons == check).sum())
+        return reasons, route_quantities.sum(axis=1)
+
+    def filter_routes(self, instance:str, filtered_data:dict, routes) -> np.ndarray:
+        ''' Boolean mask of the routes not proven infeasible '''
+        return np.equal(self.check_routes(instance, filtered_data, routes)[0], None)
+
+    def check_route(self, instance:str, filtered_data:dict, perm:list[int]) -> tuple:
+        ''' Check a single route (customer sequence without depot), returns the reason (None if not proven infeasible) and its number of items '''
+        reasons, number_of_items = self.check_routes(instance, filtered_data, [perm])
+        return reasons[0], number_of_items[0]
+
+    def statistics(self) -> pd.DataFrame:
+        ''' Checked routes and labeled routes per check and instance '''
+        return pd.DataFrame([
+            {
+                "Instance Name": instance,
+                "Checked Routes": self.checked[instance],
+                **{f"Labeled {check}": self.labeled[check][instance] for check in FIT_CHECKS},
+                "Labeled Routes": self.rejected[instance]
+            } for instance in self.checked
+        ])
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from multiprocessing import Pool
+
+from shared_corpus import publish_corpus, init_worker
+from create_route_instances import (generate_instances, generate_instances_multi_cap, generate_instances_worker,
+                                    load_corpus, create_output_folders)
+from transformInstancesToJson import transform_instances
+from time_windows import TimeWindowScreen
+from axle_weights import AxleWeightScreen
+from packing_bounds import PackingBoundScreen
+from fit_check import RouteFitCheck
+from route_features import RouteFeatureTable
+from route_samplers import SAMPLERS, ENUMERATION_PERMUTATIONS
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Generation Service - Resident corpus serving generation requests #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Optional request flags and the route screen they add to the screens of the generators, in this order
+SERVICE_SCREENS = {
+    "screen_packing_bounds": PackingBoundScreen,
+    "screen_axle_weights": AxleWeightScreen,
+    "screen_time_windows": TimeWindowScreen
+}
+
+# Optional request flags and the generator argument they switch on
+SERVICE_OPTIONS = {
+    "fit_check": ("fit_check", RouteFitCheck),
+    "write_route_features": ("route_features", RouteFeatureTable)
+}
+
+# Request keys passed unchanged to the generators, with their defaults
+GENERATION_SETTINGS = {
+    "multiplierCustomerNumber": 1,
+    "attemptLimit": 1,
+    "succesfulInstancesThreshold": 1,
+    "sampling": "random",
+    "enumeration_threshold": ENUMERATION_PERMUTATIONS,
+    "enumeration_max_routes": None,
+    "sampler_options": None
+}
+
+
+class GenerationService:
+
+    def __init__(self, folder_paths:list, corpus_path:str, workers:int = 4):
+        """ Parses the data folders once, publishes them as a shared corpus and keeps a worker pool attached to it
+            Requests only send the instance names and settings to the workers, so they start without any parsing.
+            Requests of several clients run concurrently on the same pool.
+        """
+        start_time = time.time()
+        df, aggregate_demands, single_demands, items, customers = load_corpus(folder_paths)
+        publish_corpus(corpus_path, df, aggregate_demands, single_demands, items, customers)
+        self.instances = df["Instance Name"].tolist()
+        self.pool = Pool(workers, initializer=init_worker, initargs=(corpus_path,))
+        self.startup_time = round(time.time() - start_time, 2)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def get_instances(self, request:dict) -> list:
+        ''' Instances of a request, all instances of the corpus if none are given '''
+        instances = request.get("instances", self.instances)
+        if isinstance(instances, str):
+            instances = [instances]
+        unknown = [instance for instance in instances if instance not in self.instances]
+        if unknown:
+            raise ValueError(f"Unknown instances: {unknown}")
+        return instances
+
+    def run(self, function, instances:list, kwargs:dict) -> list:
+        ''' Run a generation or transformation function for all instances on the pool '''
+        with self.lock:
+            self.requests += 1
+        return self.pool.map_async(generate_instances_worker, [(function, instance, kwargs) for instance in instances]).get()
+
+    def generate(self, request:dict) -> dict:
+        '''
+        Generate route files, one run per cap or with "sweep_caps" all caps of the request on one candidate stream (generate_instances_multi_cap)
+        Args:
+            request (dict): "file_path" (base folder, route files go to RandomData_*/input as in create_route_instances.main),
+                            "caps" (or "cap"), "instances" and optionally "sweep_caps" and the keys of GENERATION_SETTINGS,
+                            SERVICE_SCREENS and SERVICE_OPTIONS
+        Returns:
+            dict: Created routes and avoided duplicates per instance and cap
+        '''
+        instances = self.get_instances(request)
+        caps = request.get("caps", [request.get("cap", 1.0)])
+        settings = {key: request.get(key, default) for key, default in GENERATION_SETTINGS.items()}
+        # Checked here, errors inside the workers only reach the client as a server error
+        if settings["sampling"] not in SAMPLERS:
+            raise ValueError(f"Unknown sampling {settings['sampling']}, expected one of {list(SAMPLERS)}")
+        _, file_paths = create_output_folders(request["file_path"], settings["multiplierCustomerNumber"], settings["attemptLimit"],
+                                              settings["succesfulInstancesThreshold"], caps)
+
+        kwargs = dict(settings)
+        kwargs["screens"] = [screen() for option, screen in SERVICE_SCREENS.items() if request.get(option, False)]
+        for option, (argument, option_class) in SERVICE_OPTIONS.items():
+            if request.get(option, False):
+                kwargs[argument] = option_class()
+        if request.get("sweep_caps", False):
+            results = self.run(generate_instances_multi_cap, instances, {**kwargs, "file_paths": file_paths})
+        else:
+            cap_results = {cap: self.run(generate_instances, instances, {**kwargs, "file_path": file_paths[cap], "cap": cap}) for cap in caps}
+            results = [{cap: cap_results[cap][i] for cap in caps} for i in range(len(instances))]
+
+        return {
+            "Results": {instance: {str(cap): list(result[cap]) for cap in caps} for instance, result in zip(instances, results)},
+            "Folders": {str(cap): file_path for cap, file_path in file_paths.items()}
+        }
+
+    def transform(self, request:dict) -> dict:
+        '''
+        Write the full customer route of instances (transformInstancesToJson.transform_instances)
+        Args:
+            request (dict): "file_path" (folder of the route files) and "instances"
+        Returns:
+            dict: Transformed instances
+        '''
+        instances = self.get_instances(request)
+        os.makedirs(request["file_path"], exist_ok=True)
+        self.run(transform_instances, instances, {"file_path": request["file_path"]})
+        return {"Results": instances, "Folders": [request["file_path"]]}
+
+    def status(self) -> dict:
+        return {"Instances": len(self.instances), "Startup Time": self.startup_time, "Requests": self.requests}
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    """ JSON endpoints: GET /status, GET /instances, POST /generate, POST /transform """
+
+    service = None
+
+    def send_json(self, status:int, data:dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(200, self.service.status())
+        elif self.path == "/instances":
+            self.send_json(200, {"Instances": self.service.instances})
+        else:
+            self.send_json(404, {"Error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        endpoints = {"/generate": self.service.generate, "/transform": self.service.transform}
+        if self.path not in endpoints:
+            self.send_json(404, {"Error": f"Unknown endpoint {self.path}"})
+            return
+
+        start_time = time.time()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            response = endpoints[self.path](request)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json(400, {"Error": repr(error)})
+            return
+        except Exception as error:
+            # Failures of the workers (e.g. OSError while writing), the client still gets a JSON answer
+            self.send_json(500, {"Error": repr(error)})
+            return
+        response["Time"] = round(time.time() - start_time, 3)
+        self.send_json(200, response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def send_request(endpoint:str, request:dict = None, host:str = "127.0.0.1", port:int = 8765) -> dict:
+    '''
+    Client for scripts: send a request to a running generation service
+    Args:
+        endpoint (str): e.g. "generate", "transform", "status" or "instances"
+        request (dict): Request body, None for GET endpoints
+        host (str): Host of the service
+        port (int): Port of the service
+    Returns:
+        dict: Response of the service
+    '''
+    url = f"http://{host}:{port}/{endpoint}"
+    data = None if request is None else json.dumps(request).encode("utf-8")
+    http_request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(http_request) as response:
+        return json.loads(response.read())
+
+
+def main():
+
+    FOLDER_PATHS = ["Data/Krebs_Ehmke_Koch_2021", "Data/Gendreau_et_al_2006"]
+    CORPUS_PATH = r"H:\Data\Random_Data\service_corpus"
+    WORKERS = 4
+    HOST = "127.0.0.1" # local only
+    PORT = 8765
+
+    service = GenerationService(FOLDER_PATHS, CORPUS_PATH, WORKERS)
+    GenerationRequestHandler.service = service
+    server = ThreadingHTTPServer((HOST, PORT), GenerationRequestHandler)
+    print(f"Serving {len(service.instances)} instances on http://{HOST}:{PORT} (startup {service.startup_time} s)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
+# Plotting lives in helper_plots, matplotlib and seaborn are only imported when a plot is drawn
+from helper_plots import plot_boxplot
+
 
 ####################################################################################################################################################################
 ####################################################################################################################################################################
@@ -79,94 +80,37 @@ def get_vehicle_dataframe(filtered_instance:pd.DataFrame) -> dict:
 ####################################################################################################################################################################
 ####################################################################################################################################################################
 
-def plot_boxplot(data:pd.DataFrame, column:str, order: list) -> None: 
+def calculate_box_statistics(data:pd.DataFrame, column:str, order:list, whis:float = 1.5) -> pd.DataFrame:
     '''
-    Create a boxplot consisting of three subplots for each level of the first order element [Number of Customers or Item Types !!!]
+    Calculate box statistics (quartiles, whiskers and fliers) for every combination of the order columns in one groupby pass.
+    Whiskers follow the matplotlib convention: furthest data point within whis * IQR of the box.
 
-    Args: 
+    Args:
         data (pd.DataFrame): Dataframe containing the data
-        column (str): Column to be plotted
-        order (list): List of order of the elements
-        title (str): Title of the plot
+        column (str): Column to be summarized
+        order (list): List of the grouping columns
+        whis (float): Whisker length as multiple of the interquartile range
+    Returns:
+        pd.DataFrame: One row per group with the order columns and "q1", "med", "q3", "whislo", "whishi", "fliers"
     '''
-    # Set global style for scientific look
-    plt.rcParams["font.family"] = "serif"
-    plt.rcParams["axes.labelsize"] = 12
-    plt.rcParams["axes.titlesize"] = 14
-    plt.rcParams["xtick.labelsize"] = 10
-    plt.rcParams["ytick.labelsize"] = 10
-    plt.rcParams["grid.alpha"] = 0.3
-
-    max_volume = 60*25*30
-
-    first_unique_list = sorted(list(data[order[0]].unique()))
-    second_unique_list = sorted(list(data[order[1]].unique()))
-    third_unique_list = sorted(list(data[order[2]].unique()))
-
-    # Use blue-green shades for a professional look
-    blue_palette = sns.color_palette("Blues", len(second_unique_list) + len(first_unique_list))
-    colors = blue_palette
-
-    # Create figure and subplots (3 rows for different item types)
-    fig, axes = plt.subplots(nrows=3, ncols=1, figsize=(12, 7), sharey=True)
-    plt.subplots_adjust(hspace=0.4)  # Adjust spacing
-
-    # Loop through each item type level (m)
-    for i, m in enumerate(first_unique_list):
-        ax = axes[i]  # Select subplot for this row
-        box_data = []
-        box_labels = []
-        box_colors = []
-
-        for n_idx, n in enumerate(second_unique_list):
-            for k_idx, k in enumerate(third_unique_list):
-                # Filter data
-                filtered_data = data[
-                    (data[order[0]] == m) &
-                    (data[order[1]] == n) &
-                    (data[order[2]] == k)
-                ]
-
-                if not filtered_data.empty:
-                    if column == "Volume":
-                        box_data.append(filtered_data[column].values/ max_volume)
-                    else: 
-                        box_data.append(filtered_data[column].values)
-                    box_colors.append(colors[n_idx * len(third_unique_list) + k_idx])  # Assign color
-                    #box_colors.append(colors[0])  # Assign color
-                    box_labels.append(f"$n={n}$\n$k={k}$")  # Newline for better formatting
-
-        # Plot boxplot for the current m level
-        boxplot = ax.boxplot(
-            box_data, patch_artist=True, labels=box_labels if i == len(first_unique_list) - 1 else None,
-            medianprops={"color": "black", "linewidth": 2}
-        )
-
-        # Apply colors to each box
-        for patch, color in zip(boxplot["boxes"], box_colors):
-            patch.set_facecolor(color)
-            patch.set_alpha(0.8)  # Add slight transparency
-            patch.set_edgecolor("black")  # Add black borders
-
-        # Grid and aesthetics
-        ax.yaxis.grid(True, linestyle="--", alpha=0.3)
-        ax.set_title(f"{order[0].split(' ')[-1]}: $m={m}$", fontsize=13)
-
-        # Remove x labels for the first two rows
-        if i < len(first_unique_list) - 1:
-            ax.set_xticklabels([])  # Hide labels
-            ax.set_xticks([])  # Remove ticks completely
-        else:
-            ax.tick_params(axis="x", rotation=0, labelsize=10)
-
-    # Global title and layout
-    if column == "Volume": 
-    
-        plt.suptitle(f"Rel. {column} over instance types", fontsize=16)
-        fig.text(0.07, 0.5, f"Rel. {column}", va="center", rotation="vertical", fontsize=14)
-
-    else:
-        plt.suptitle(f"{column} over instance types", fontsize=15)
-        fig.text(0.06, 0.5, f"{column}", va="center", rotation="vertical", fontsize=14)
-    # Show plot
-    plt.show()
\ No newline at end of file
+    values = data[order + [column]].dropna(subset=[column])
+    grouped = values.groupby(order, sort=True)[column]
+
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "med", "q3"]
+
+    # Broadcast whisker limits back to the rows to split inliers and fliers
+    iqr = stats["q3"] - stats["q1"]
+    limits = pd.DataFrame({"lower": stats["q1"] - whis * iqr, "upper": stats["q3"] + whis * iqr})
+    limits = values[order].join(limits, on=order)
+    inside = (values[column] >= limits["lower"]) & (values[column] <= limits["upper"])
+
+    stats["whislo"] = values[inside].groupby(order, sort=True)[column].min()
+    stats["whishi"] = values[inside].groupby(order, sort=True)[column].max()
+    stats["whislo"] = stats["whislo"].fillna(stats["q1"])
+    stats["whishi"] = stats["whishi"].fillna(stats["q3"])
+
+    fliers = values[~inside].groupby(order, sort=True)[column].agg(list)
+    stats["fliers"] = [fliers.get(key, []) for key in stats.index]
+
+    return stats.reset_index()
@@ -0,0 +1,102 @@
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## helper Plots - Plots of instance statistics, plotting backends are imported on first use ###########################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+def plot_boxplot(data:pd.DataFrame, column:str, order: list, stats:pd.DataFrame = None) -> None: 
+    '''
+    Create a boxplot consisting of three subplots for each level of the first order element [Number of Customers or Item Types !!!]
+
+    Args: 
+        data (pd.DataFrame): Dataframe containing the data, may be None if stats is given
+        column (str): Column to be plotted
+        order (list): List of order of the elements
+        stats (pd.DataFrame): Optional precomputed statistics table from calculate_box_statistics
+    '''
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Set global style for scientific look
+    plt.rcParams["font.family"] = "serif"
+    plt.rcParams["axes.labelsize"] = 12
+    plt.rcParams["axes.titlesize"] = 14
+    plt.rcParams["xtick.labelsize"] = 10
+    plt.rcParams["ytick.labelsize"] = 10
+    plt.rcParams["grid.alpha"] = 0.3
+
+    max_volume = 60*25*30
+
+    if stats is None:
+        from helper_functions import calculate_box_statistics
+        stats = calculate_box_statistics(data, column, order)
+
+    first_unique_list = sorted(list(stats[order[0]].unique()))
+    second_unique_list = sorted(list(stats[order[1]].unique()))
+    third_unique_list = sorted(list(stats[order[2]].unique()))
+    second_index = {n: n_idx for n_idx, n in enumerate(second_unique_list)}
+    third_index = {k: k_idx for k_idx, k in enumerate(third_unique_list)}
+
+    # Volume is shown relative to the vehicle volume, all statistics scale linearly
+    scale = max_volume if column == "Volume" else 1
+
+    # Use blue-green shades for a professional look
+    blue_palette = sns.color_palette("Blues", len(second_unique_list) + len(first_unique_list))
+    colors = blue_palette
+
+    # Create figure and subplots (3 rows for different item types)
+    fig, axes = plt.subplots(nrows=3, ncols=1, figsize=(12, 7), sharey=True)
+    plt.subplots_adjust(hspace=0.4)  # Adjust spacing
+
+    # Loop through each item type level (m), groups are already sorted by (m, n, k)
+    for i, (m, m_stats) in enumerate(stats.groupby(order[0], sort=True)):
+        ax = axes[i]  # Select subplot for this row
+        box_data = []
+        box_colors = []
+
+        for _, row in m_stats.iterrows():
+            n, k = row[order[1]], row[order[2]]
+            box = {key: row[key] / scale for key in ["q1", "med", "q3", "whislo", "whishi"]}
+            box["fliers"] = [flier / scale for flier in row["fliers"]]
+            if i == len(first_unique_list) - 1:
+                box["label"] = f"$n={n}$\n$k={k}$"  # Newline for better formatting
+            box_data.append(box)
+            box_colors.append(colors[second_index[n] * len(third_unique_list) + third_index[k]])  # Assign color
+
+        # Plot boxplot for the current m level
+        boxplot = ax.bxp(
+            box_data, patch_artist=True,
+            medianprops={"color": "black", "linewidth": 2}
+        )
+
+        # Apply colors to each box
+        for patch, color in zip(boxplot["boxes"], box_colors):
+            patch.set_facecolor(color)
+            patch.set_alpha(0.8)  # Add slight transparency
+            patch.set_edgecolor("black")  # Add black borders
+
+        # Grid and aesthetics
+        ax.yaxis.grid(True, linestyle="--", alpha=0.3)
+        ax.set_title(f"{order[0].split(' ')[-1]}: $m={m}$", fontsize=13)
+
+        # Remove x labels for the first two rows
+        if i < len(first_unique_list) - 1:
+            ax.set_xticklabels([])  # Hide labels
+            ax.set_xticks([])  # Remove ticks completely
+        else:
+            ax.tick_params(axis="x", rotation=0, labelsize=10)
+
+    # Global title and layout
+    if column == "Volume": 
+    
+        plt.suptitle(f"Rel. {column} over instance types", fontsize=16)
+        fig.text(0.07, 0.5, f"Rel. {column}", va="center", rotation="vertical", fontsize=14)
+
+    else:
+        plt.suptitle(f"{column} over instance types", fontsize=15)
+        fig.text(0.06, 0.5, f"{column}", va="center", rotation="vertical", fontsize=14)
+    # Show plot
+    plt.show()
\ No newline at end of file
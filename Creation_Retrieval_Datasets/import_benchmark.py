@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Import Benchmark - Startup cost of the generation path #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Modules imported by the generation scripts and their worker processes
+GENERATION_MODULES = ["helper_functions", "shared_corpus", "create_route_instances", "transformInstancesToJson", "generation_service"]
+
+# Packages that must not be loaded on the generation path
+PLOTTING_MODULES = ["matplotlib", "seaborn", "plotly"]
+
+# Run in a fresh interpreter, so every measurement starts without cached modules
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+import_time = time.perf_counter() - start
+plotting = sorted({{name.split(".")[0] for name in sys.modules}} & set({plotting}))
+print(json.dumps({{"Import Time": import_time, "Modules": len(sys.modules), "Plotting Modules": plotting}}))
+"""
+
+
+def measure_import(module:str, repeats:int = 5, cwd:str = None) -> dict:
+    '''
+    Import time of a module in fresh interpreters
+    Args:
+        module (str): Module name
+        repeats (int): Number of interpreters, the median is reported
+        cwd (str): Working directory of the interpreters (folder of the module)
+    Returns:
+        dict: Median and minimum import time in s, number of loaded modules and loaded plotting packages
+    '''
+    measurements = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(module=module, plotting=PLOTTING_MODULES)],
+                                cwd=cwd, capture_output=True, text=True, check=True).stdout
+        measurements.append(json.loads(output.strip().splitlines()[-1]))
+
+    import_times = [measurement["Import Time"] for measurement in measurements]
+    return {
+        "Module": module,
+        "Median Import Time": float(np.median(import_times)),
+        "Min Import Time": float(np.min(import_times)),
+        "Loaded Modules": measurements[-1]["Modules"],
+        "Plotting Modules": ", ".join(measurements[-1]["Plotting Modules"])
+    }
+
+
+def run_import_benchmark(modules:list = GENERATION_MODULES, repeats:int = 5, cwd:str = None) -> pd.DataFrame:
+    ''' Import benchmark of all modules, one row per module '''
+    if cwd is None:
+        cwd = os.path.dirname(os.path.abspath(__file__))
+    return pd.DataFrame([measure_import(module, repeats, cwd) for module in modules])
+
+
+def main():
+
+    REPEATS = 5
+    HISTORY_FILE = "import_benchmark.csv" # results of every run are appended, to track the startup cost over time
+
+    results = run_import_benchmark(repeats=REPEATS)
+    results.insert(0, "Date", time.strftime("%Y-%m-%d %H:%M:%S"))
+    print(results.drop(columns="Date").round(3).to_string(index=False))
+
+    results.to_csv(HISTORY_FILE, mode="a", header=not os.path.exists(HISTORY_FILE), index=False)
+
+    # Fail if a plotting package is loaded on the generation path
+    if (results["Plotting Modules"] != "").any():
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
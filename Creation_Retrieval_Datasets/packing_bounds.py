@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from helper_functions import get_filtered_data
+from route_screens import RouteScreen
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Packing Bounds - Lower bounds on the number of vehicles #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Tolerance for rounding up bounds computed from float dimensions
+EPSILON = 1e-9
+
+
+def get_cargo_dimensions(filtered_instance:pd.DataFrame) -> np.ndarray:
+    ''' Length, width and height of the cargo space '''
+    return filtered_instance[["Cargo Length", "Cargo Width", "Cargo Height"]].to_numpy(dtype=float)[0]
+
+
+def get_item_tables(filtered_data:dict, enable_horizontal_rotation:bool = True) -> dict:
+    '''
+    Item types of an instance as arrays and the demanded quantity of every type per customer,
+    so that the item multiset of many routes is one matrix sum (shared by all route screens and the fit check)
+    Args:
+        filtered_data (dict): Filtered datasets of the instance
+        enable_horizontal_rotation (bool): Whether items may be rotated by 90 degrees around the vertical axis (as in the route files)
+    Returns:
+        dict: "type", "mass", "volume", "fragility", "dimensions" (types x 3), "min_extents" (types x 3, smallest extent along
+              length, width and height over all orientations fitting into the cargo space, inf if none fits), "density_order"
+              (type positions by mass per volume, densest first) and "quantities" of shape (max Customer ID + 1, number of types)
+    '''
+    items = filtered_data["items"].drop_duplicates(subset="Type")
+    type_index = {item_type: i for i, item_type in enumerate(items["Type"])}
+    dimensions = items[["Length", "Width", "Height"]].to_numpy(dtype=float)
+
+    # Orientations x types x axes
+    orientations = [dimensions]
+    if enable_horizontal_rotation:
+        orientations.append(dimensions[:, [1, 0, 2]])
+    orientations = np.stack(orientations)
+    fits = (orientations <= get_cargo_dimensions(filtered_data["instance"]) + EPSILON).all(axis=2)
+    min_extents = np.where(fits[:, :, None], orientations, np.inf).min(axis=0)
+
+    single_demands = filtered_data["single_demands"]
+    customer_ids = single_demands["Customer ID"].astype(int).to_numpy()
+    type_positions = single_demands["Type"].map(type_index)
+    known = type_positions.notna().to_numpy()
+
+    quantities = np.zeros((int(filtered_data["customers"]["Customer ID"].max()) + 1, len(items)))
+    np.add.at(quantities, (customer_ids[known], type_positions[known].to_numpy(dtype=int)), single_demands["Quantity"].to_numpy(dtype=float)[known])
+
+    mass = items["Mass"].to_numpy(dtype=float)
+    volume = items["Volume"].to_numpy(dtype=float)
+
+    return {
+        "type": items["Type"].to_numpy(),
+        "mass": mass,
+        "volume": volume,
+        "fragility": items["Fragility"].to_numpy(dtype=int),
+        "dimensions": dimensions,
+        "min_extents": min_extents,
+        "density_order": np.argsort(-(mass / volume), kind="stable"),
+        "quantities": quantities
+    }
+
+
+def calculate_axis_bounds(sizes:np.ndarray, members:np.ndarray, capacity:float, quantities:np.ndarray) -> np.ndarray:
+    '''
+    Martello-Toth L2 bound of the one-dimensional bin packing of the member items, vectorized over routes and all
+    thresholds p (0 and every member size up to capacity / 2):
+        L2(p) = |J1| + |J2| + max(0, ceil((S(J3) - (|J2| * capacity - S(J2))) / capacity))
+    with J1 = sizes > capacity - p, J2 = capacity / 2 < sizes <= capacity - p and J3 = p <= sizes <= capacity / 2.
+    L2(0) includes the continuous bound ceil(S / capacity).
+
+    Args:
+        sizes (np.ndarray): Size of every item type
+        members (np.ndarray): Boolean mask of the item types taking part in the bin packing
+        capacity (float): Bin size
+        quantities (np.ndarray): Quantity per type, shape (number of routes, number of types)
+    Returns:
+        np.ndarray: Lower bound per route
+    '''
+    sizes = np.where(members, sizes, 0.0)
+    half = capacity / 2
+    thresholds = np.unique(np.concatenate([[0.0], sizes[members & (sizes <= half + EPSILON)]]))[:, None]
+
+    # Thresholds x types
+    j1 = members & (sizes > capacity - thresholds + EPSILON)
+    j2 = members & (sizes > half + EPSILON) & ~j1
+    j3 = members & (sizes >= thresholds - EPSILON) & (sizes <= half + EPSILON)
+
+    # Routes x thresholds
+    n1 = quantities @ j1.T
+    n2 = quantities @ j2.T
+    s2 = quantities @ (j2 * sizes).T
+    s3 = quantities @ (j3 * sizes).T
+
+    remaining = np.ceil((s3 - (n2 * capacity - s2)) / capacity - EPSILON)
+    return (n1 + n2 + np.maximum(remaining, 0)).max(axis=1)
+
+
+def calculate_lower_bounds(item_tables:dict, route_quantities:np.ndarray, cargo_dimensions:np.ndarray, vehicle_capacity:float) -> dict:
+    '''
+    Lower bounds on the number of vehicles for many item multisets (routes or whole instances) at once
+    Volume and mass give the continuous bounds. Along every axis of the cargo space the items that exceed half of the
+    other two dimensions in all fitting orientations can neither stand side by side nor be stacked, they form a
+    one-dimensional bin packing along that axis (bounded by calculate_axis_bounds).
+    Multisets with an item that fits into the cargo space in no orientation get an infinite bound.
+
+    Args:
+        item_tables (dict): Output of get_item_tables
+        route_quantities (np.ndarray): Quantity per type, shape (number of routes, number of types)
+        cargo_dimensions (np.ndarray): Length, width and height of the cargo space
+        vehicle_capacity (float): Vehicle capacity
+    Returns:
+        dict: Bound arrays "Volume", "Mass", "Length", "Width", "Height" and their maximum "Vehicles"
+    '''
+    route_quantities = np.atleast_2d(route_quantities)
+    min_extents = item_tables["min_extents"]
+    fits = np.isfinite(min_extents).all(axis=1)
+
+    bounds = {
+        "Volume": np.ceil(route_quantities @ item_tables["volume"] / cargo_dimensions.prod() - EPSILON),
+        "Mass": np.ceil(route_quantities @ item_tables["mass"] / vehicle_capacity - EPSILON)
+    }
+
+    for axis, name in enumerate(["Length", "Width", "Height"]):
+        other_axes = [other for other in range(3) if other != axis]
+        members = fits & (min_extents[:, other_axes] > cargo_dimensions[other_axes] / 2 + EPSILON).all(axis=1)
+        bounds[name] = calculate_axis_bounds(np.where(fits, min_extents[:, axis], 0.0), members, cargo_dimensions[axis], route_quantities)
+
+    vehicles = np.maximum.reduce([bounds[name] for name in bounds])
+    bounds["Vehicles"] = np.where(route_quantities[:, ~fits].sum(axis=1) > 0, np.inf, vehicles)
+    return bounds
+
+
+def calculate_instance_lower_bounds(filtered_data:dict) -> dict:
+    '''
+    Lower bounds on the number of vehicles of a whole instance
+    Args:
+        filtered_data (dict): Filtered datasets of the instance
+    Returns:
+        dict: Instance name and one "LB <bound>" entry per bound of calculate_lower_bounds
+    '''
+    item_tables = get_item_tables(filtered_data)
+    filtered_instance = filtered_data["instance"]
+    bounds = calculate_lower_bounds(item_tables,
+                                    item_tables["quantities"].sum(axis=0),
+                                    get_cargo_dimensions(filtered_instance),
+                                    float(filtered_instance["Vehicle Capacity"].values[0]))
+
+    return {"Instance Name": filtered_instance["Instance Name"].values[0],
+            **{f"LB {name}": float(values[0]) for name, values in bounds.items()}}
+
+
+def get_lower_bounds_table(instances:list, df:pd.DataFrame, aggregate_demands:pd.DataFrame, single_demands:pd.DataFrame, items:pd.DataFrame, customers:pd.DataFrame) -> pd.DataFrame:
+    ''' Lower bounds of calculate_instance_lower_bounds for all given instances, one row per instance '''
+    return pd.DataFrame([
+        calculate_instance_lower_bounds(get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers))
+        for instance in instances
+    ])
+
+
+class PackingBoundScreen(RouteScreen):
+
+    name = "Packing bounds"
+
+    def __init__(self):
+        """ Rejects routes whose items provably do not fit into one vehicle (lower bound of calculate_lower_bounds > 1)
+            before they are sent to the packing solver
+        """
+        super().__init__()
+        self.item_tables = {}
+        self.vehicles = {}
+
+    def filter_routes(self, instance:str, filtered_data:dict, routes) -> np.ndarray:
+        '''
+        Check a batch of routes of one instance
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            routes: Customer sequences without depot, all with the same number of customers
+        Returns:
+            np.ndarray: Boolean mask of routes which may fit into one vehicle
+        '''
+        routes = np.atleast_2d(np.asarray(routes, dtype=int))
+
+        if instance not in self.item_tables:
+            filtered_instance = filtered_data["instance"]
+            self.item_tables[instance] = get_item_tables(filtered_data)
+            self.vehicles[instance] = (get_cargo_dimensions(filtered_instance), float(filtered_instance["Vehicle Capacity"].values[0]))
+
+        item_tables = self.item_tables[instance]
+        cargo_dimensions, vehicle_capacity = self.vehicles[instance]
+        bounds = calculate_lower_bounds(item_tables, item_tables["quantities"][routes].sum(axis=1), cargo_dimensions, vehicle_capacity)
+        return self.count(instance, bounds["Vehicles"] <= 1)
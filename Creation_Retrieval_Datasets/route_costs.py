@@ -0,0 +1,123 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Costs - Distance matrices and tour lengths #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+def calculate_distance_matrix(filtered_customers:pd.DataFrame) -> np.ndarray:
+    '''
+    Euclidean distance matrix between all nodes of an instance (depot 0 included), indexed by Customer ID
+    Args:
+        filtered_customers (pd.DataFrame): Customers of one instance with "Customer ID", "x" and "y"
+    Returns:
+        np.ndarray: Matrix of shape (max Customer ID + 1, max Customer ID + 1)
+    '''
+    customer_ids = filtered_customers["Customer ID"].to_numpy(dtype=int)
+    coordinates = np.zeros((customer_ids.max() + 1, 2))
+    coordinates[customer_ids] = filtered_customers[["x", "y"]].to_numpy(dtype=float)
+
+    differences = coordinates[:, None, :] - coordinates[None, :, :]
+    return np.sqrt((differences ** 2).sum(axis=2))
+
+
+def calculate_route_lengths(distance_matrix:np.ndarray, routes:np.ndarray) -> np.ndarray:
+    '''
+    Tour lengths of many routes at once, every route starts and ends at the depot
+    Args:
+        distance_matrix (np.ndarray): Distance matrix of the instance
+        routes (np.ndarray): Customer sequences without depot, shape (number of routes, route length)
+    Returns:
+        np.ndarray: Tour length per route
+    '''
+    routes = np.atleast_2d(np.asarray(routes, dtype=int))
+    depot = np.zeros((routes.shape[0], 1), dtype=int)
+    tours = np.hstack([depot, routes, depot])
+    return distance_matrix[tours[:, :-1], tours[:, 1:]].sum(axis=1)
+
+
+def calculate_route_lengths_mixed(distance_matrix:np.ndarray, routes:list) -> np.ndarray:
+    '''
+    Tour lengths of routes with different numbers of customers, evaluated batched per route length
+    Args:
+        distance_matrix (np.ndarray): Distance matrix of the instance
+        routes (list): Customer sequences without depot
+    Returns:
+        np.ndarray: Tour length per route, in the order of routes
+    '''
+    lengths = np.zeros(len(routes))
+    route_sizes = np.array([len(route) for route in routes])
+    for route_size in np.unique(route_sizes):
+        positions = np.flatnonzero(route_sizes == route_size)
+        lengths[positions] = calculate_route_lengths(distance_matrix, np.array([routes[position] for position in positions]))
+    return lengths
+
+
+# Customer columns a distance matrix depends on
+COORDINATE_COLUMNS = ["Customer ID", "x", "y"]
+
+
+def get_coordinates_key(filtered_customers:pd.DataFrame, columns:list = COORDINATE_COLUMNS) -> str:
+    ''' Hash of the Customer IDs and coordinates of an instance (or other numeric columns), changes whenever its distance matrix changes '''
+    digest = hashlib.blake2b(digest_size=8)
+    for column in columns:
+        digest.update(filtered_customers[column].to_numpy(dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+class DistanceMatrixCache:
+
+    def __init__(self, cache_path:str = None, mmap_min_customers:int = 100):
+        """ Distance matrices per instance, computed once
+            Matrices are keyed by the instance name and a hash of its coordinates (get_coordinates_key), so an edited
+            instance file or another instance of the same name never gets a stale matrix.
+            With a cache_path the matrices are stored as .npy files and reused by later runs; instances with at least
+            mmap_min_customers customers (e.g. Pollaris et al. 2017) are then memory-mapped instead of loaded.
+        """
+        self.cache_path = cache_path
+        self.mmap_min_customers = mmap_min_customers
+        self.matrices = {}
+        if cache_path is not None:
+            os.makedirs(cache_path, exist_ok=True)
+
+    def __getstate__(self):
+        """ Only the settings are sent to worker processes, matrices are rebuilt or loaded there """
+        return {"cache_path": self.cache_path, "mmap_min_customers": self.mmap_min_customers}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_path"], state["mmap_min_customers"])
+
+    def get(self, instance:str, filtered_customers:pd.DataFrame) -> np.ndarray:
+        '''
+        Distance matrix of an instance
+        Args:
+            instance (str): Name of the instance
+            filtered_customers (pd.DataFrame): Customers of the instance
+        Returns:
+            np.ndarray: Distance matrix
+        '''
+        key = (instance, get_coordinates_key(filtered_customers))
+        if key in self.matrices:
+            return self.matrices[key]
+
+        matrix = None
+        if self.cache_path is not None:
+            matrix_path = os.path.join(self.cache_path, f"{instance}.{key[1]}.distances.npy")
+            if not os.path.exists(matrix_path):
+                np.save(matrix_path, calculate_distance_matrix(filtered_customers))
+            mmap_mode = "r" if len(filtered_customers) - 1 >= self.mmap_min_customers else None
+            matrix = np.load(matrix_path, mmap_mode=mmap_mode)
+        else:
+            matrix = calculate_distance_matrix(filtered_customers)
+
+        self.matrices[key] = matrix
+        return matrix
+
+    def route_lengths(self, instance:str, filtered_customers:pd.DataFrame, routes) -> np.ndarray:
+        ''' Tour lengths of routes (customer sequences without depot) of an instance '''
+        return calculate_route_lengths_mixed(self.get(instance, filtered_customers), list(routes))
@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pd
+
+from packing_bounds import get_cargo_dimensions, get_item_tables
+from table_io import get_file_format, write_table, read_table
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Features - Feature table written next to the route files #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Folder next to the input folder of the route files with one feature table per instance
+FEATURES_FOLDER = "features"
+
+
+def get_features_path(file_path:str) -> str:
+    ''' Feature folder of an input folder of route files, created if missing '''
+    features_path = os.path.join(os.path.dirname(os.path.normpath(file_path)), FEATURES_FOLDER)
+    os.makedirs(features_path, exist_ok=True)
+    return features_path
+
+
+def calculate_route_features(item_tables:dict, routes:list, cargo_volume:float, vehicle_capacity:float) -> dict:
+    '''
+    Load features of many routes at once from the demanded quantities per customer
+    Routes of different lengths are padded with the depot, which has no demand.
+
+    Args:
+        item_tables (dict): Output of packing_bounds.get_item_tables
+        routes (list): Customer sequences without depot
+        cargo_volume (float): Volume of the cargo space
+        vehicle_capacity (float): Vehicle capacity
+    Returns:
+        dict: Feature arrays, one entry per route
+    '''
+    padded = np.zeros((len(routes), max(len(route) for route in routes)), dtype=int)
+    for row, route in enumerate(routes):
+        padded[row, :len(route)] = route
+
+    route_quantities = item_tables["quantities"][padded].sum(axis=1)
+    total_volume = route_quantities @ item_tables["volume"]
+    total_mass = route_quantities @ item_tables["mass"]
+    number_of_items = route_quantities.sum(axis=1)
+
+    return {
+        "Total Volume": total_volume,
+        "Relative Volume": total_volume / cargo_volume,
+        "Total Mass": total_mass,
+        "Relative Mass": total_mass / vehicle_capacity,
+        "Number of Items": number_of_items.astype(int),
+        "Number of Item Types": (route_quantities > 0).sum(axis=1),
+        "Fragility Share": np.divide(route_quantities @ item_tables["fragility"], number_of_items, out=np.zeros(len(routes)), where=number_of_items > 0)
+    }
+
+
+class RouteFeatureTable:
+
+    def __init__(self, file_format:str = "csv"):
+        """ Collects the routes written by generate_instances and stores their features as one table per instance and
+            output folder (<output folder>/features/<instance>.<file_format>), so training data never needs the route files
+            Parquet tables need pyarrow or fastparquet, CSV is written otherwise (table_io.get_file_format).
+        """
+        self.file_format = get_file_format(file_format)
+        self.item_tables = {}
+        self.vehicles = {}
+
+        # Routes not written yet per (instance, input folder)
+        self.rows = {}
+
+    def __getstate__(self):
+        """ Only the settings are sent to worker processes """
+        return {"file_format": self.file_format}
+
+    def __setstate__(self, state):
+        self.__init__(state["file_format"])
+
+    def add(self, instance:str, filtered_data:dict, file_path:str, route_id:str, perm:list[int], volume_cap:float, weight_cap:float, precheck:str = None) -> None:
+        '''
+        Register a written route
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            file_path (str): Input folder the route was written to
+            route_id (str): Name of the route file
+            perm (list[int]): Customer sequence without depot
+            volume_cap (float): Sampled volume cap of the route
+            weight_cap (float): Sampled weight cap of the route
+            precheck (str): Check of fit_check.FIT_CHECKS which labeled the route, None if written as route file
+        '''
+        if instance not in self.item_tables:
+            filtered_instance = filtered_data["instance"]
+            self.item_tables[instance] = get_item_tables(filtered_data)
+            self.vehicles[instance] = (float(get_cargo_dimensions(filtered_instance).prod()), float(filtered_instance["Vehicle Capacity"].values[0]))
+
+        self.rows.setdefault((instance, file_path), []).append((route_id, list(perm), volume_cap, weight_cap, precheck))
+
+    def write(self, instance:str, file_path:str) -> str:
+        '''
+        Write the feature table of the routes of an instance in an input folder
+        Args:
+            instance (str): Name of the instance
+            file_path (str): Input folder of the route files
+        Returns:
+            str: Path of the feature table, None if no route was registered
+        '''
+        rows = self.rows.pop((instance, file_path), [])
+        if not rows:
+            return None
+
+        route_ids, routes, volume_caps, weight_caps, prechecks = zip(*rows)
+        table = pd.DataFrame({
+            "Route ID": route_ids,
+            "Instance Name": instance,
+            "Number of Customers": [len(route) for route in routes],
+            "Volume Cap": volume_caps,
+            "Weight Cap": weight_caps,
+            **calculate_route_features(self.item_tables[instance], routes, *self.vehicles[instance]),
+            "Precheck": prechecks
+        })
+
+        features_path = os.path.join(get_features_path(file_path), f"{instance}.{self.file_format}")
+        write_table(table, features_path, self.file_format)
+        return features_path
+
+
+def read_route_features(file_path:str, file_format:str = "csv") -> pd.DataFrame:
+    ''' All feature tables of an input folder of route files '''
+    features_path = os.path.join(os.path.dirname(os.path.normpath(file_path)), FEATURES_FOLDER)
+    tables = [read_table(os.path.join(features_path, file_name), file_format)
+              for file_name in sorted(os.listdir(features_path)) if file_name.endswith(f".{file_format}")]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
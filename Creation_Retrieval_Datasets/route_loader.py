@@ -0,0 +1,210 @@
+import os
+import json
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Loader - Padded numeric batches of route files #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Arrays of a batch, per route and item entry (padded) except "vehicles" and "names"
+BATCH_ARRAYS = ["dimensions", "weights", "quantities", "fragility", "nodes", "mask", "vehicles", "names"]
+
+CACHE_MANIFEST_FILE = "manifest.json"
+
+
+def get_route_files(sources) -> list:
+    '''
+    Route files of folders (all .json files, sorted) and single files
+    Args:
+        sources: Folder or file path, or a list of them (e.g. the shards of a generation run)
+    Returns:
+        list: Paths of the route files
+    '''
+    if isinstance(sources, str):
+        sources = [sources]
+
+    route_files = []
+    for source in sources:
+        if os.path.isdir(source):
+            route_files += [os.path.join(source, file_name) for file_name in sorted(os.listdir(source)) if file_name.endswith(".json")]
+        else:
+            route_files.append(source)
+    return route_files
+
+
+def decode_route_file(file_path:str) -> dict:
+    '''
+    Numeric arrays of one route file, one entry per item entry of the nodes (item type and quantity of a customer)
+    Args:
+        file_path (str): Path of the route file
+    Returns:
+        dict: "dimensions" (entries x 3), "weights", "quantities", "fragility", "nodes" (position of the customer in the route),
+              "vehicle" (length, width, height, capacity of the first vehicle) and "name"
+    '''
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries = [(position, item) for position, node in enumerate(data["Nodes"]) for item in node["Items"]]
+    vehicle = data["Vehicles"][0]
+
+    return {
+        "dimensions": np.array([[item["Length"], item["Width"], item["Height"]] for _, item in entries], dtype=np.float32).reshape(-1, 3),
+        "weights": np.array([item["Weight"] for _, item in entries], dtype=np.float32),
+        "quantities": np.array([item["Quantity"] for _, item in entries], dtype=np.int32),
+        "fragility": np.array([item["Fragility"] == "Fragile" for _, item in entries], dtype=bool),
+        "nodes": np.array([position for position, _ in entries], dtype=np.int32),
+        "vehicle": np.array([vehicle["Length"], vehicle["Width"], vehicle["Height"], vehicle["Capacity"]], dtype=np.float32),
+        "name": data["Name"]
+    }
+
+
+def collate_routes(routes:list, max_items:int = None) -> dict:
+    '''
+    Pad decoded routes to one batch
+    Args:
+        routes (list): Outputs of decode_route_file
+        max_items (int): Fixed number of item entries per route, None pads to the longest route of the batch
+    Returns:
+        dict: Arrays of BATCH_ARRAYS, "mask" marks the real item entries
+    '''
+    lengths = [len(route["weights"]) for route in routes]
+    width = max(lengths) if max_items is None else max_items
+    if max(lengths) > width:
+        raise ValueError(f"Route with {max(lengths)} item entries exceeds max_items = {max_items}")
+
+    batch = {
+        "dimensions": np.zeros((len(routes), width, 3), dtype=np.float32),
+        "weights": np.zeros((len(routes), width), dtype=np.float32),
+        "quantities": np.zeros((len(routes), width), dtype=np.int32),
+        "fragility": np.zeros((len(routes), width), dtype=bool),
+        "nodes": np.zeros((len(routes), width), dtype=np.int32),
+        "mask": np.zeros((len(routes), width), dtype=bool)
+    }
+    for row, (route, length) in enumerate(zip(routes, lengths)):
+        for key in ["dimensions", "weights", "quantities", "fragility", "nodes"]:
+            batch[key][row, :length] = route[key]
+        batch["mask"][row, :length] = True
+
+    batch["vehicles"] = np.stack([route["vehicle"] for route in routes])
+    batch["names"] = np.array([route["name"] for route in routes])
+    return batch
+
+
+class RouteBatchLoader:
+
+    def __init__(self,
+                 sources,
+                 batch_size:int = 64,
+                 max_items:int = None,
+                 shuffle:bool = False,
+                 seed:int = 42,
+                 prefetch:int = 4,
+                 threads:int = 2,
+                 cache_path:str = None):
+        """ Iterates over route files in padded numeric batches (see collate_routes)
+            Batches are decoded on background threads, up to prefetch batches ahead of the consumer.
+            With a cache_path every decoded batch is stored as .npy files and memory-mapped in later epochs; the batches
+            are then fixed and shuffle only permutes their order.
+        """
+        self.route_files = get_route_files(sources)
+        self.batch_size = batch_size
+        self.max_items = max_items
+        self.shuffle = shuffle
+        self.seed = seed
+        self.prefetch = prefetch
+        self.threads = threads
+        self.cache_path = cache_path
+        self.epoch = 0
+
+        if cache_path is not None:
+            self.prepare_cache()
+
+    def __len__(self) -> int:
+        return (len(self.route_files) + self.batch_size - 1) // self.batch_size
+
+    def prepare_cache(self) -> None:
+        '''
+        Start a new cache if the route files or the batch layout changed, drop the cached batches of route files that
+        were modified since (modification time or size)
+        '''
+        os.makedirs(self.cache_path, exist_ok=True)
+        signatures = [[os.stat(route_file).st_mtime_ns, os.stat(route_file).st_size] for route_file in self.route_files]
+        manifest = {"route_files": self.route_files, "batch_size": self.batch_size, "max_items": self.max_items, "signatures": signatures}
+        manifest_path = os.path.join(self.cache_path, CACHE_MANIFEST_FILE)
+
+        old_manifest = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                old_manifest = json.load(f)
+        if old_manifest == manifest:
+            return
+
+        if old_manifest is not None and all(old_manifest.get(key) == manifest[key] for key in ["route_files", "batch_size", "max_items"]) and "signatures" in old_manifest:
+            changed = np.flatnonzero([old != new for old, new in zip(old_manifest["signatures"], signatures)])
+            batch_numbers = set((changed // self.batch_size).tolist())
+            stale_files = [self.get_cache_file(batch_number, key) for batch_number in batch_numbers for key in BATCH_ARRAYS]
+        else:
+            stale_files = [os.path.join(self.cache_path, file_name) for file_name in os.listdir(self.cache_path) if file_name.endswith(".npy")]
+
+        # Names are removed first, so an interrupted run never reads a partly stale batch
+        for stale_file in sorted(stale_files, key=lambda file_name: not file_name.endswith(f".{BATCH_ARRAYS[-1]}.npy")):
+            if os.path.exists(stale_file):
+                os.remove(stale_file)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    def get_batch_indices(self, epoch:int) -> list:
+        ''' Route file indices per batch of an epoch '''
+        order = np.arange(len(self.route_files))
+        if self.shuffle and self.cache_path is None:
+            order = np.random.default_rng(self.seed + epoch).permutation(order)
+
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+        if self.shuffle and self.cache_path is not None:
+            batches = [batches[i] for i in np.random.default_rng(self.seed + epoch).permutation(len(batches))]
+        return batches
+
+    def get_cache_file(self, batch_number:int, key:str) -> str:
+        return os.path.join(self.cache_path, f"batch_{batch_number:06d}.{key}.npy")
+
+    def load_batch(self, indices:np.ndarray) -> dict:
+        '''
+        Decode (or read from the cache) the batch of the given route file indices
+        Args:
+            indices (np.ndarray): Route file indices of the batch
+        Returns:
+            dict: Arrays of BATCH_ARRAYS
+        '''
+        if self.cache_path is None:
+            return collate_routes([decode_route_file(self.route_files[index]) for index in indices], self.max_items)
+
+        # Cached batches are the consecutive blocks of the route files
+        batch_number = int(indices[0]) // self.batch_size
+        if os.path.exists(self.get_cache_file(batch_number, BATCH_ARRAYS[-1])):
+            return {key: np.load(self.get_cache_file(batch_number, key), mmap_mode="r") for key in BATCH_ARRAYS}
+
+        batch = collate_routes([decode_route_file(self.route_files[index]) for index in indices], self.max_items)
+        for key in BATCH_ARRAYS:
+            # Names last: a batch counts as cached once its names exist
+            temporary_file = self.get_cache_file(batch_number, key) + ".tmp.npy"
+            np.save(temporary_file, batch[key])
+            os.replace(temporary_file, self.get_cache_file(batch_number, key))
+        return batch
+
+    def __iter__(self):
+        batches = self.get_batch_indices(self.epoch)
+        self.epoch += 1
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            pending = deque()
+            for indices in batches:
+                pending.append(executor.submit(self.load_batch, indices))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
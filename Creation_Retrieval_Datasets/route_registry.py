@@ -0,0 +1,156 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Registry - Routes emitted across runs #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+def route_key(perm:list[int]) -> int:
+    '''
+    Stable 64-bit key of a customer sequence (without depot), identical across runs and processes
+    Args:
+        perm (list[int]): Customer sequence
+    Returns:
+        int: Route key
+    '''
+    digest = hashlib.blake2b(np.asarray(perm, dtype=np.int32).tobytes(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class RouteRegistry:
+
+    def __init__(self, registry_path:str, merge_threshold:int = 100000):
+        """ Registry of all routes ever emitted per instance
+            Per instance a sorted key file (<instance>.keys.npy, memory-mapped) and an append-only log (<instance>.log)
+            of keys added since the last merge are kept. The log is merged into the sorted keys on merge() or when it
+            exceeds merge_threshold keys.
+        """
+        self.registry_path = registry_path
+        self.merge_threshold = merge_threshold
+        os.makedirs(registry_path, exist_ok=True)
+
+        # Lazily opened per instance: sorted keys, pending keys of the log and open log file
+        self.keys = {}
+        self.pending = {}
+        self.logs = {}
+
+        # Hit statistics per instance
+        self.lookups = {}
+        self.hits = {}
+        self.additions = {}
+
+    def __getstate__(self):
+        """ Only the location is sent to worker processes, each worker opens the files it needs """
+        return {"registry_path": self.registry_path, "merge_threshold": self.merge_threshold}
+
+    def __setstate__(self, state):
+        self.__init__(state["registry_path"], state["merge_threshold"])
+
+    def get_keys_path(self, instance:str) -> str:
+        return os.path.join(self.registry_path, f"{instance}.keys.npy")
+
+    def get_log_path(self, instance:str) -> str:
+        return os.path.join(self.registry_path, f"{instance}.log")
+
+    def open_instance(self, instance:str) -> None:
+        ''' Load the sorted keys (memory-mapped) and replay the log of an instance '''
+        if instance in self.keys:
+            return
+
+        keys_path = self.get_keys_path(instance)
+        self.keys[instance] = np.load(keys_path, mmap_mode="r") if os.path.exists(keys_path) else np.empty(0, dtype=np.uint64)
+
+        log_path = self.get_log_path(instance)
+        self.pending[instance] = set(np.fromfile(log_path, dtype="<u8").tolist()) if os.path.exists(log_path) else set()
+
+        self.lookups.setdefault(instance, 0)
+        self.hits.setdefault(instance, 0)
+        self.additions.setdefault(instance, 0)
+
+    def contains(self, instance:str, key:int) -> bool:
+        '''
+        Check whether a route key was ever emitted for an instance
+        Args:
+            instance (str): Name of the instance
+            key (int): Route key from route_key
+        Returns:
+            bool: True if the route is known
+        '''
+        self.open_instance(instance)
+        self.lookups[instance] += 1
+
+        keys = self.keys[instance]
+        found = key in self.pending[instance]
+        if not found and len(keys) > 0:
+            position = np.searchsorted(keys, np.uint64(key))
+            found = position < len(keys) and keys[position] == key
+
+        if found:
+            self.hits[instance] += 1
+        return bool(found)
+
+    def add(self, instance:str, key:int) -> None:
+        '''
+        Register an emitted route, the key is appended to the log immediately
+        Args:
+            instance (str): Name of the instance
+            key (int): Route key from route_key
+        '''
+        self.open_instance(instance)
+        if key in self.pending[instance]:
+            return
+
+        if instance not in self.logs:
+            self.logs[instance] = open(self.get_log_path(instance), "ab")
+        self.logs[instance].write(np.array([key], dtype="<u8").tobytes())
+        self.pending[instance].add(key)
+        self.additions[instance] += 1
+
+        if len(self.pending[instance]) >= self.merge_threshold:
+            self.merge(instance)
+
+    def merge(self, instance:str = None) -> None:
+        '''
+        Merge the log of an instance (or of all open instances) into its sorted key file
+        Args:
+            instance (str): Name of the instance, None merges all open instances
+        '''
+        instances = list(self.keys.keys()) if instance is None else [instance]
+        for name in instances:
+            if name not in self.keys:
+                continue
+            if name in self.logs:
+                self.logs.pop(name).close()
+            if not self.pending[name]:
+                continue
+
+            merged = np.union1d(np.asarray(self.keys[name]), np.fromiter(self.pending[name], dtype=np.uint64))
+
+            # Write next to the old file and swap, so readers never see a partial file
+            keys_path = self.get_keys_path(name)
+            temporary_path = keys_path + ".tmp.npy"
+            np.save(temporary_path, merged)
+            self.keys[name] = None
+            os.replace(temporary_path, keys_path)
+            os.remove(self.get_log_path(name))
+
+            self.keys[name] = np.load(keys_path, mmap_mode="r")
+            self.pending[name] = set()
+
+    def statistics(self) -> pd.DataFrame:
+        ''' Lookups, hits and additions per instance of this registry object '''
+        return pd.DataFrame([
+            {
+                "Instance Name": instance,
+                "Lookups": self.lookups[instance],
+                "Hits": self.hits[instance],
+                "Hit Rate": self.hits[instance] / self.lookups[instance] if self.lookups[instance] else 0.0,
+                "Added Routes": self.additions[instance],
+                "Known Routes": len(self.keys[instance]) + len(self.pending[instance])
+            } for instance in self.lookups
+        ])
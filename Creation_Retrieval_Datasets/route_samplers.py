@@ -0,0 +1,552 @@
+import math
+import random
+import numpy as np
+
+from route_costs import DistanceMatrixCache
+from time_windows import get_time_window_arrays
+from spatial_index import KDTree
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Samplers - Candidate customer sequences for generate_instances #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+class RouteSampler:
+    """ Base class of the samplers of generate_instances
+        Samplers of SAMPLERS are created with (instance, filtered_data, numbers, distance_matrices, **sampler_options) and return
+        customer sequences from sample(num_customers), None if they find no route of that length.
+    """
+
+    def sample(self, num_customers:int) -> list[int]:
+        raise NotImplementedError
+
+    def register(self, perm:list[int]) -> None:
+        ''' Called by generate_instances for every written route '''
+        pass
+
+    def add_routes(self, routes:list) -> None:
+        ''' Called by EnumerationSampler with all routes of an enumerated length, which the sampler never sampled itself '''
+        pass
+
+
+class RandomSampler(RouteSampler):
+
+    def __init__(self, instance:str, filtered_data:dict, numbers:list[int], distance_matrices:DistanceMatrixCache = None):
+        """ Uniform random customer sequences, the original sampling of generate_instances """
+        self.numbers = numbers
+
+    def sample(self, num_customers:int) -> list[int]:
+        return random.sample(self.numbers, num_customers)
+
+
+class TimeWindowSampler(RouteSampler):
+
+    def __init__(self, instance:str, filtered_data:dict, numbers:list[int], distance_matrices:DistanceMatrixCache = None, max_restarts:int = 10):
+        """ Constructs time window feasible customer sequences
+            A partial route is only extended with customers whose service can still start before their DueDate
+            (with waiting until the ReadyTime) and who can still return to the depot in time.
+            Static reachability sets (successors that can be reached at all, even from the earliest possible departure)
+            keep every extension step small.
+        """
+        self.max_restarts = max_restarts
+        self.travel_times = (DistanceMatrixCache() if distance_matrices is None else distance_matrices).get(instance, filtered_data["customers"])
+        time_windows = get_time_window_arrays(filtered_data["customers"])
+        self.ready, self.due, self.service = time_windows["ready"], time_windows["due"], time_windows["service"]
+
+        customers = np.asarray(numbers, dtype=int)
+
+        # Earliest possible service start and departure per customer (visited directly from the depot)
+        depot_departure = self.ready[0] + self.service[0]
+        earliest_start = np.maximum(depot_departure + self.travel_times[0], self.ready)
+        earliest_departure = earliest_start + self.service
+        returnable = earliest_departure + self.travel_times[:, 0] <= self.due[0]
+        reachable = earliest_departure[:, None] + self.travel_times <= self.due[None, :]
+
+        candidates = customers[(earliest_start[customers] <= self.due[customers]) & returnable[customers]]
+        self.successors = {0: candidates}
+        for customer in customers:
+            successors = candidates[reachable[customer, candidates]]
+            self.successors[customer] = successors[successors != customer]
+
+        self.num_nodes = len(self.ready)
+
+    def construct(self, num_customers:int) -> list[int]:
+        ''' One construction attempt, None if the partial route cannot be extended anymore '''
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        route = []
+        current = 0
+        time = self.ready[0] + self.service[0]
+
+        for _ in range(num_customers):
+            candidates = self.successors[current]
+            candidates = candidates[~visited[candidates]]
+            start = np.maximum(time + self.travel_times[current, candidates], self.ready[candidates])
+            feasible = (start <= self.due[candidates]) & (start + self.service[candidates] + self.travel_times[candidates, 0] <= self.due[0])
+
+            if not feasible.any():
+                return None
+
+            choice = random.randrange(int(feasible.sum()))
+            current = int(candidates[feasible][choice])
+            time = start[feasible][choice] + self.service[current]
+            visited[current] = True
+            route.append(current)
+
+        return route
+
+    def sample(self, num_customers:int) -> list[int]:
+        '''
+        Sample a time window feasible customer sequence
+        Args:
+            num_customers (int): Number of customers of the route
+        Returns:
+            list[int]: Customer sequence without depot, None if no route was found within max_restarts attempts
+        '''
+        for _ in range(self.max_restarts):
+            route = self.construct(num_customers)
+            if route is not None:
+                return route
+        return None
+
+
+def get_demand_arrays(filtered_data:dict) -> dict:
+    '''
+    Aggregated volume and mass per customer as arrays indexed by Customer ID (depot and customers without demand stay 0)
+    and the vehicle limits
+    Args:
+        filtered_data (dict): Filtered datasets of the instance
+    Returns:
+        dict: "volume" and "mass" arrays, "max_volume" and "max_mass"
+    '''
+    filtered_instance = filtered_data["instance"]
+    customer_ids = filtered_data["agg_demands"]["Customer ID"].astype(int).to_numpy()
+    size = int(filtered_instance["Number of Customers"].values[0]) + 1
+
+    volume = np.zeros(size)
+    mass = np.zeros(size)
+    volume[customer_ids] = filtered_data["agg_demands"]["Agg Volume"].to_numpy()
+    mass[customer_ids] = filtered_data["agg_demands"]["Agg Mass"].to_numpy()
+
+    return {
+        "volume": volume,
+        "mass": mass,
+        "max_volume": float(filtered_instance["Cargo Length"].values[0] * filtered_instance["Cargo Width"].values[0] * filtered_instance["Cargo Height"].values[0]),
+        "max_mass": float(filtered_instance["Vehicle Capacity"].values[0])
+    }
+
+
+class GrowthSampler(RouteSampler):
+
+    def __init__(self, instance:str, filtered_data:dict, numbers:list[int], distance_matrices:DistanceMatrixCache = None, pool_size:int = 10000, max_restarts:int = 10):
+        """ Grows routes customer by customer
+            A (k+1)-route can only be within capacity if its k-prefix is, so routes of length k + 1 extend routes of
+            length k sampled before, with a customer that still fits. Every pool keeps up to pool_size routes with their
+            running volume and mass sums (random replacement once full), the sums are updated instead of re-summed.
+            Routes already returned are not returned again.
+            generate_instances walks the route lengths upwards, so the pool of length k is filled before k + 1 is sampled.
+            Behind an EnumerationSampler the pools of enumerated lengths are filled with the enumerated routes (add_routes).
+        """
+        self.pool_size = pool_size
+        self.max_restarts = max_restarts
+        demands = get_demand_arrays(filtered_data)
+        self.volume, self.mass = demands["volume"], demands["mass"]
+        self.max_volume, self.max_mass = demands["max_volume"], demands["max_mass"]
+
+        # Routes of one customer within capacity
+        self.is_customer = np.zeros(len(self.volume), dtype=bool)
+        self.is_customer[np.asarray(numbers, dtype=int)] = True
+        fitting = np.flatnonzero(self.is_customer & (self.volume <= self.max_volume) & (self.mass <= self.max_mass))
+        self.pools = {1: [([int(customer)], self.volume[customer], self.mass[customer]) for customer in fitting]}
+        self.sampled = {}
+
+    def add_to_pool(self, route:list[int], volume:float, mass:float) -> None:
+        pool = self.pools.setdefault(len(route), [])
+        if len(pool) < self.pool_size:
+            pool.append((route, volume, mass))
+        else:
+            pool[random.randrange(self.pool_size)] = (route, volume, mass)
+
+    def add_routes(self, routes:list) -> None:
+        ''' Routes of one length within capacity (enumerated), they are the prefixes of the next length '''
+        routes = np.asarray(routes, dtype=int)
+        if routes.size == 0:
+            return
+        volumes = self.volume[routes].sum(axis=1)
+        masses = self.mass[routes].sum(axis=1)
+        for route, volume, mass in zip(routes.tolist(), volumes, masses):
+            self.add_to_pool(route, volume, mass)
+
+    def sample(self, num_customers:int) -> list[int]:
+        '''
+        Extend a route of num_customers - 1 customers by one customer that still fits
+        Args:
+            num_customers (int): Number of customers of the route
+        Returns:
+            list[int]: Customer sequence without depot, None if no route could be extended within max_restarts attempts
+        '''
+        pool = self.pools.get(num_customers - 1)
+        if not pool:
+            return None
+
+        for _ in range(self.max_restarts):
+            prefix, volume, mass = pool[random.randrange(len(pool))]
+            fitting = self.is_customer & (volume + self.volume <= self.max_volume) & (mass + self.mass <= self.max_mass)
+            fitting[prefix] = False
+            candidates = np.flatnonzero(fitting)
+            if len(candidates) == 0:
+                continue
+
+            customer = int(candidates[random.randrange(len(candidates))])
+            route = prefix + [customer]
+            sampled = self.sampled.setdefault(num_customers, set())
+            if tuple(route) in sampled:
+                continue
+            sampled.add(tuple(route))
+            self.add_to_pool(route, volume + self.volume[customer], mass + self.mass[customer])
+            # generate_instances inserts the depot into the returned list
+            return list(route)
+        return None
+
+
+class ClusteredSampler(RouteSampler):
+
+    def __init__(self, instance:str, filtered_data:dict, numbers:list[int], distance_matrices:DistanceMatrixCache = None, max_restarts:int = 10):
+        """ Grows spatially compact routes over a KD-tree of the customer coordinates
+            A route starts at a random seed customer that fits into the vehicle. The next customer is drawn among the
+            available customers within a radius of the last one (starting at twice the median nearest neighbor distance,
+            doubled while no customer within the radius still fits), so every step is one radius query.
+        """
+        self.max_restarts = max_restarts
+        demands = get_demand_arrays(filtered_data)
+        self.volume, self.mass = demands["volume"], demands["mass"]
+        self.max_volume, self.max_mass = demands["max_volume"], demands["max_mass"]
+
+        self.customers = np.asarray(numbers, dtype=int)
+        customers = filtered_data["customers"].set_index("Customer ID")
+        coordinates = customers.loc[self.customers, ["x", "y"]].to_numpy(dtype=float)
+        self.tree = KDTree(coordinates)
+        self.coordinates = coordinates
+
+        # Nearest other customer of every customer (the customer itself is the nearest point)
+        nearest_distances = [np.linalg.norm(coordinates[self.tree.query_nearest(point, 2)[-1]] - point) for point in coordinates] if len(coordinates) > 1 else [1.0]
+        self.base_radius = max(2 * float(np.median(nearest_distances)), 1e-9)
+        self.max_radius = max(float(np.linalg.norm(coordinates.max(axis=0) - coordinates.min(axis=0))), self.base_radius)
+
+    def construct(self, num_customers:int) -> list[int]:
+        ''' One construction attempt, None if the route cannot be extended within the vehicle capacity '''
+        fitting = np.flatnonzero((self.volume[self.customers] <= self.max_volume) & (self.mass[self.customers] <= self.max_mass))
+        if len(fitting) == 0:
+            return None
+
+        available = np.ones(len(self.customers), dtype=bool)
+        current = int(fitting[random.randrange(len(fitting))])
+        available[current] = False
+        route = [current]
+        volume = self.volume[self.customers[current]]
+        mass = self.mass[self.customers[current]]
+
+        radius = self.base_radius
+        while len(route) < num_customers:
+            candidates = self.tree.query_radius(self.coordinates[current], radius)
+            candidates = np.sort(candidates[available[candidates]])
+            candidate_ids = self.customers[candidates]
+            candidates = candidates[(volume + self.volume[candidate_ids] <= self.max_volume) & (mass + self.mass[candidate_ids] <= self.max_mass)]
+
+            if len(candidates) == 0:
+                if radius >= self.max_radius:
+                    return None
+                radius *= 2
+                continue
+
+            current = int(candidates[random.randrange(len(candidates))])
+            available[current] = False
+            route.append(current)
+            volume += self.volume[self.customers[current]]
+            mass += self.mass[self.customers[current]]
+            radius = self.base_radius
+
+        return [int(customer) for customer in self.customers[route]]
+
+    def sample(self, num_customers:int) -> list[int]:
+        '''
+        Sample a spatially clustered route within capacity
+        Args:
+            num_customers (int): Number of customers of the route
+        Returns:
+            list[int]: Customer sequence without depot, None if no route was found within max_restarts attempts
+        '''
+        for _ in range(self.max_restarts):
+            route = self.construct(num_customers)
+            if route is not None:
+                return route
+        return None
+
+
+# Default bins and quota of the StratifiedSampler (same edges for relative volume and relative mass), other bins and quotas
+# are passed as sampler_options of generate_instances, e.g. {"quotas": 50, "volume_edges": [0, 0.5, 0.8, 1]}
+STRATIFIED_BIN_EDGES = np.linspace(0, 1, 6)
+STRATIFIED_QUOTA = 20
+
+
+class StratifiedSampler(RouteSampler):
+
+    def __init__(self,
+                 instance:str,
+                 filtered_data:dict,
+                 numbers:list[int],
+                 distance_matrices:DistanceMatrixCache = None,
+                 volume_edges:np.ndarray = STRATIFIED_BIN_EDGES,
+                 mass_edges:np.ndarray = STRATIFIED_BIN_EDGES,
+                 quotas = STRATIFIED_QUOTA,
+                 max_restarts:int = 10,
+                 max_failures:int = 20):
+        """ Fills quotas of written routes per bin of relative volume x relative mass
+            Each route targets an underfilled bin (chosen with probability proportional to its deficit) that the route
+            length can reach, judged by the sums of the k smallest and k largest customer demands. Customers are added
+            one by one, only if the sorted partial sums can still end inside the target bin. Bins are closed on the left,
+            the last bin also on the right (a route filling the vehicle exactly belongs to it). A bin that failed
+            max_failures constructions is skipped for the route length. Once all reachable quotas are met no routes are
+            returned anymore.
+        """
+        self.max_restarts = max_restarts
+        self.max_failures = max_failures
+        demands = get_demand_arrays(filtered_data)
+        self.volume = demands["volume"] / demands["max_volume"]
+        self.mass = demands["mass"] / demands["max_mass"]
+        self.volume_edges = np.asarray(volume_edges, dtype=float)
+        self.mass_edges = np.asarray(mass_edges, dtype=float)
+
+        shape = (len(self.volume_edges) - 1, len(self.mass_edges) - 1)
+        self.quotas = np.broadcast_to(np.asarray(quotas), shape).astype(int)
+        self.counts = np.zeros(shape, dtype=int)
+        self.failures = {}
+
+        # Sums of the r smallest and r largest demands, r = 0 .. number of customers
+        self.customers = np.asarray(numbers, dtype=int)
+        self.volume_bounds = self.get_partial_sums(self.volume[self.customers])
+        self.mass_bounds = self.get_partial_sums(self.mass[self.customers])
+
+    @staticmethod
+    def get_partial_sums(values:np.ndarray) -> tuple:
+        ordered = np.sort(values)
+        return np.concatenate([[0.0], np.cumsum(ordered)]), np.concatenate([[0.0], np.cumsum(ordered[::-1])])
+
+    @staticmethod
+    def get_bin_index(edges:np.ndarray, value:float) -> int:
+        ''' Bin of a value, the last bin includes its right edge; -1 or len(edges) - 1 outside of the bins '''
+        if value == edges[-1]:
+            return len(edges) - 2
+        return int(np.searchsorted(edges, value, side="right")) - 1
+
+    @staticmethod
+    def is_below(values:np.ndarray, edges:np.ndarray, index:int) -> np.ndarray:
+        ''' Whether values are below the right edge of bin index (at most the edge for the last bin) '''
+        if index == len(edges) - 2:
+            return values <= edges[-1]
+        return values < edges[index + 1]
+
+    def get_bin(self, perm:list[int]) -> tuple:
+        ''' Bin of a route, None outside of the bins '''
+        volume_bin = self.get_bin_index(self.volume_edges, self.volume[perm].sum())
+        mass_bin = self.get_bin_index(self.mass_edges, self.mass[perm].sum())
+        if 0 <= volume_bin < self.counts.shape[0] and 0 <= mass_bin < self.counts.shape[1]:
+            return volume_bin, mass_bin
+        return None
+
+    def get_reachable_deficits(self, num_customers:int) -> np.ndarray:
+        ''' Missing routes per bin, 0 for bins the route length cannot reach '''
+        volume_reachable = (self.volume_edges[1:] >= self.volume_bounds[0][num_customers]) & (self.volume_edges[:-1] <= self.volume_bounds[1][num_customers])
+        mass_reachable = (self.mass_edges[1:] >= self.mass_bounds[0][num_customers]) & (self.mass_edges[:-1] <= self.mass_bounds[1][num_customers])
+        deficits = np.where(volume_reachable[:, None] & mass_reachable[None, :], np.maximum(self.quotas - self.counts, 0), 0)
+
+        failures = self.failures.get(num_customers)
+        if failures is not None:
+            deficits[failures >= self.max_failures] = 0
+        return deficits
+
+    def construct(self, num_customers:int, target:tuple) -> list[int]:
+        ''' One construction attempt towards the target bin, None if no customer keeps the partial sums inside '''
+        volume_low = self.volume_edges[target[0]]
+        mass_low = self.mass_edges[target[1]]
+        available = np.ones(len(self.customers), dtype=bool)
+        route = []
+        volume = 0.0
+        mass = 0.0
+
+        for position in range(num_customers):
+            remaining = num_customers - position - 1
+            next_volume = volume + self.volume[self.customers]
+            next_mass = mass + self.mass[self.customers]
+            feasible = (available
+                        & self.is_below(next_volume + self.volume_bounds[0][remaining], self.volume_edges, target[0]) & (next_volume + self.volume_bounds[1][remaining] >= volume_low)
+                        & self.is_below(next_mass + self.mass_bounds[0][remaining], self.mass_edges, target[1]) & (next_mass + self.mass_bounds[1][remaining] >= mass_low))
+
+            candidates = np.flatnonzero(feasible)
+            if len(candidates) == 0:
+                return None
+
+            choice = candidates[random.randrange(len(candidates))]
+            available[choice] = False
+            route.append(int(self.customers[choice]))
+            volume, mass = next_volume[choice], next_mass[choice]
+
+        return route
+
+    def sample(self, num_customers:int) -> list[int]:
+        '''
+        Sample a route for an underfilled bin
+        Args:
+            num_customers (int): Number of customers of the route
+        Returns:
+            list[int]: Customer sequence without depot, None if all reachable quotas are met or no route was found
+        '''
+        deficits = self.get_reachable_deficits(num_customers)
+        if deficits.sum() == 0:
+            return None
+
+        target = np.unravel_index(random.choices(range(deficits.size), weights=deficits.ravel().tolist())[0], deficits.shape)
+        for _ in range(self.max_restarts):
+            route = self.construct(num_customers, target)
+            if route is None:
+                continue
+            route_bin = self.get_bin(route)
+            if route_bin is not None and self.counts[route_bin] < self.quotas[route_bin]:
+                return route
+
+        failures = self.failures.setdefault(num_customers, np.zeros(self.counts.shape, dtype=int))
+        failures[target] += 1
+        return None
+
+    def register(self, perm:list[int]) -> None:
+        ''' Count a written route in its bin '''
+        route_bin = self.get_bin(perm)
+        if route_bin is not None:
+            self.counts[route_bin] += 1
+
+
+def enumerate_routes(demands:dict, numbers:list[int], num_customers:int) -> np.ndarray:
+    '''
+    All customer sequences of num_customers customers within the vehicle capacity, built position by position for all
+    partial routes at once; volume and mass sums are carried along and partial routes over capacity are dropped early
+    Args:
+        demands (dict): Output of get_demand_arrays
+        numbers (list[int]): Customer IDs
+        num_customers (int): Number of customers of the routes
+    Returns:
+        np.ndarray: Routes of shape (number of routes, num_customers), in lexicographic order
+    '''
+    customers = np.asarray(numbers, dtype=int)
+    routes = np.zeros((1, 0), dtype=int)
+    volume = np.zeros(1)
+    mass = np.zeros(1)
+
+    for _ in range(num_customers):
+        # Partial routes x customers
+        next_volume = volume[:, None] + demands["volume"][customers]
+        next_mass = mass[:, None] + demands["mass"][customers]
+        feasible = (next_volume <= demands["max_volume"]) & (next_mass <= demands["max_mass"])
+        feasible &= (routes[:, :, None] != customers[None, None, :]).all(axis=1)
+
+        rows, columns = np.nonzero(feasible)
+        routes = np.hstack([routes[rows], customers[columns][:, None]])
+        volume = next_volume[rows, columns]
+        mass = next_mass[rows, columns]
+
+    return routes
+
+
+# Default enumeration threshold of create_route_instances.main: lengths 2 and 3 of instances with up to 25 customers
+# (25 * 24 * 23 = 13800 permutations) and length 4 up to 16 customers (43680) are enumerated
+ENUMERATION_PERMUTATIONS = 50000
+
+
+class EnumerationSampler(RouteSampler):
+
+    def __init__(self, sampler, filtered_data:dict, numbers:list[int], threshold:int, max_routes:int = None):
+        """ Enumerates route lengths with few permutations instead of sampling them
+            If the number of k-permutations of the customers is at most threshold, all routes of length k within capacity
+            are enumerated once (enumerate_routes) and returned in a random order without repetitions, None once all are
+            returned. With max_routes only the first max_routes of that order are used, a deterministic subsample for a
+            fixed seed. Longer routes are sampled by the wrapped sampler, which receives the enumerated routes (add_routes).
+        """
+        self.sampler = sampler
+        self.numbers = numbers
+        self.threshold = threshold
+        self.max_routes = max_routes
+        self.demands = get_demand_arrays(filtered_data)
+        self.routes = {}
+
+    def is_enumerated(self, num_customers:int) -> bool:
+        return math.perm(len(self.numbers), num_customers) <= self.threshold
+
+    def sample(self, num_customers:int) -> list[int]:
+        '''
+        Next enumerated route, or a route of the wrapped sampler for route lengths with too many permutations
+        Args:
+            num_customers (int): Number of customers of the route
+        Returns:
+            list[int]: Customer sequence without depot, None if all enumerated routes were returned
+        '''
+        if not self.is_enumerated(num_customers):
+            return self.sampler.sample(num_customers)
+
+        if num_customers not in self.routes:
+            routes = enumerate_routes(self.demands, self.numbers, num_customers).tolist()
+            random.shuffle(routes)
+            self.routes[num_customers] = routes[:self.max_routes] if self.max_routes is not None else routes
+            # Samplers building on shorter routes (GrowthSampler) continue from the enumerated ones
+            self.sampler.add_routes(self.routes[num_customers])
+            self.routes[num_customers].reverse()
+
+        routes = self.routes[num_customers]
+        return routes.pop() if routes else None
+
+    def register(self, perm:list[int]) -> None:
+        self.sampler.register(perm)
+
+
+# Sampling modes of generate_instances
+SAMPLERS = {
+    "random": RandomSampler,
+    "time_windows": TimeWindowSampler,
+    "growth": GrowthSampler,
+    "stratified": StratifiedSampler,
+    "clustered": ClusteredSampler
+}
+
+def create_sampler(sampling:str,
+                   instance:str,
+                   filtered_data:dict,
+                   numbers:list[int],
+                   distance_matrices:DistanceMatrixCache = None,
+                   enumeration_threshold:int = None,
+                   enumeration_max_routes:int = None,
+                   sampler_options:dict = None) -> RouteSampler:
+    '''
+    Create the route sampler of an instance
+    Args:
+        sampling (str): Sampling mode, one of SAMPLERS
+        instance (str): Name of the instance
+        filtered_data (dict): Filtered datasets of the instance
+        numbers (list[int]): Customer IDs
+        distance_matrices (DistanceMatrixCache): Optional distance matrices
+        enumeration_threshold (int): Optional maximum number of permutations up to which route lengths are enumerated (EnumerationSampler)
+        enumeration_max_routes (int): Optional number of enumerated routes used per route length (EnumerationSampler max_routes)
+        sampler_options (dict): Optional keyword arguments of the sampler, e.g. {"quotas": 50} for "stratified"
+    Returns:
+        RouteSampler: Sampler of the instance
+    '''
+    if sampling not in SAMPLERS:
+        raise NameError(f"Sampling {sampling} not specified!")
+
+    # Time window sampling only applies to instances with time windows
+    if sampling == "time_windows" and int(filtered_data["instance"]["Time Windows"].values[0]) != 1:
+        sampling = "random"
+        sampler_options = None
+
+    sampler = SAMPLERS[sampling](instance, filtered_data, numbers, distance_matrices, **(sampler_options or {}))
+    if enumeration_threshold is not None:
+        sampler = EnumerationSampler(sampler, filtered_data, numbers, enumeration_threshold, enumeration_max_routes)
+    return sampler
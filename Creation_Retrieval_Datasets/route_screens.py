@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Route Screens - Common interface of the route screens of generate_instances #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+class RouteScreen:
+
+    # Name in printed statistics
+    name = "Route screen"
+
+    def __init__(self):
+        """ Base class of the screens passed to generate_instances (screens list)
+            A screen implements filter_routes for a batch of routes of one instance and reports every checked batch with
+            count, single routes and the statistics per instance are shared.
+        """
+        # Screening statistics per instance
+        self.checked = {}
+        self.rejected = {}
+
+    def filter_routes(self, instance:str, filtered_data:dict, routes) -> np.ndarray:
+        '''
+        Check a batch of routes of one instance
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            routes: Customer sequences without depot, all with the same number of customers
+        Returns:
+            np.ndarray: Boolean mask of routes which pass the screen
+        '''
+        raise NotImplementedError
+
+    def count(self, instance:str, feasible:np.ndarray) -> np.ndarray:
+        ''' Add a checked batch to the statistics of the instance, returns the mask '''
+        self.checked[instance] = self.checked.get(instance, 0) + len(feasible)
+        self.rejected[instance] = self.rejected.get(instance, 0) + int((~feasible).sum())
+        return feasible
+
+    def is_feasible(self, instance:str, filtered_data:dict, perm:list[int]) -> bool:
+        ''' Check a single route (customer sequence without depot) '''
+        return bool(self.filter_routes(instance, filtered_data, [perm])[0])
+
+    def statistics(self) -> pd.DataFrame:
+        ''' Checked and rejected routes per screened instance '''
+        return pd.DataFrame([
+            {
+                "Instance Name": instance,
+                "Checked Routes": self.checked[instance],
+                "Rejected Routes": self.rejected[instance],
+                "Rejection Rate": self.rejected[instance] / self.checked[instance] if self.checked[instance] else 0.0
+            } for instance in self.checked
+        ])
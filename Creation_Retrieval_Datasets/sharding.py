@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import argparse
+
+from fit_check import PRECHECK_FOLDER
+from route_features import FEATURES_FOLDER
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Sharding - Stable partition of generation tasks across nodes #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Folder below the base output folder with one manifest per shard
+MANIFEST_FOLDER = "manifests"
+
+MERGED_MANIFEST_FILE = "merged.json"
+
+
+def parse_shard(shard:str) -> tuple:
+    '''
+    Parse a shard specification "i/N" (0 <= i < N)
+    Args:
+        shard (str): Shard specification, None for a single node run
+    Returns:
+        tuple: Shard index and number of shards
+    '''
+    if shard is None:
+        return 0, 1
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", shard)
+    if match is None or not int(match.group(1)) < int(match.group(2)):
+        raise ValueError(f"Invalid shard {shard}, expected i/N with 0 <= i < N")
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_task_key(instance:str, configuration:str) -> str:
+    ''' Key of a task, e.g. instance and the RandomData_* configuration of generate_instances '''
+    return f"{instance}|{configuration}"
+
+
+def get_task_shard(task_key:str, number_of_shards:int) -> int:
+    '''
+    Shard of a task from a hash of its key only, so a task keeps its shard when instances or configurations are added
+    Args:
+        task_key (str): Key of the task (get_task_key)
+        number_of_shards (int): Number of shards
+    Returns:
+        int: Shard index
+    '''
+    digest = hashlib.blake2b(task_key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % number_of_shards
+
+
+def select_shard_tasks(instances:list, configuration:str, shard_index:int, number_of_shards:int) -> list:
+    ''' Instances whose task of a configuration belongs to the shard, in the given order '''
+    return [instance for instance in instances if get_task_shard(get_task_key(instance, configuration), number_of_shards) == shard_index]
+
+
+def hash_file(file_path:str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_file_instance(file_name:str, instances) -> str:
+    ''' Instance of an output file: <instance>_<customers>_<j>.json (routes and labels), <instance>_solution_<j>.json or <instance>.<format> (features) '''
+    stem = os.path.splitext(file_name)[0]
+    for candidate in [re.sub(r"_\d+_\d+$", "", stem), re.sub(r"_solution_\d+$", "", stem), stem]:
+        if candidate in instances:
+            return candidate
+    return None
+
+
+def iterate_output_files(save_file_path_base:str, folder_names:list):
+    ''' Files of the output folders with their precheck and features folders: path relative to the base folder ("/" separated), file name and path '''
+    for folder_name in folder_names:
+        parent = os.path.dirname(os.path.normpath(folder_name))
+        for sub_folder in [folder_name] + ([os.path.join(parent, PRECHECK_FOLDER), os.path.join(parent, FEATURES_FOLDER)] if parent else []):
+            folder_path = os.path.join(save_file_path_base, sub_folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for file_name in os.listdir(folder_path):
+                yield os.path.join(sub_folder, file_name).replace(os.sep, "/"), file_name, os.path.join(folder_path, file_name)
+
+
+def get_file_signatures(save_file_path_base:str, folder_names:list) -> dict:
+    ''' Modification time and size of every file in the output folders, taken before a task runs (see collect_task_files) '''
+    signatures = {}
+    for relative_path, _, file_path in iterate_output_files(save_file_path_base, folder_names):
+        file_stat = os.stat(file_path)
+        signatures[relative_path] = (file_stat.st_mtime_ns, file_stat.st_size)
+    return signatures
+
+
+def collect_task_files(save_file_path_base:str, folder_names:list, instances:list, previous_signatures:dict = None) -> dict:
+    '''
+    Files written for instances in output folders: route files of the input folders, labels of the precheck folders,
+    feature tables and solution files
+    Args:
+        save_file_path_base (str): Base folder of the generated data
+        folder_names (list): Output folders below the base folder (e.g. RandomData_*/input or Solutions)
+        instances (list): Instance names
+        previous_signatures (dict): File signatures before the task ran (get_file_signatures), files left unchanged
+            since then are leftovers of earlier runs and not part of the task
+    Returns:
+        dict: Per instance the written files (path relative to the base folder, "/" separated) and their SHA-256
+    '''
+    task_files = {instance: {} for instance in instances}
+    previous_signatures = previous_signatures or {}
+
+    for relative_path, file_name, file_path in iterate_output_files(save_file_path_base, folder_names):
+        instance = get_file_instance(file_name, task_files)
+        if instance is None:
+            continue
+        file_stat = os.stat(file_path)
+        if previous_signatures.get(relative_path) == (file_stat.st_mtime_ns, file_stat.st_size):
+            continue
+        task_files[instance][relative_path] = hash_file(file_path)
+    return task_files
+
+
+def get_manifest_path(save_file_path_base:str, shard_index:int, number_of_shards:int) -> str:
+    return os.path.join(save_file_path_base, MANIFEST_FOLDER, f"shard_{shard_index}_of_{number_of_shards}.json")
+
+
+def write_shard_manifest(save_file_path_base:str, shard_index:int, number_of_shards:int, tasks:dict, all_tasks:list) -> str:
+    '''
+    Write the manifest of a shard
+    Args:
+        save_file_path_base (str): Base folder of the generated data of the shard
+        shard_index (int): Shard index
+        number_of_shards (int): Number of shards
+        tasks (dict): Per task key of the shard its written files (collect_task_files)
+        all_tasks (list): Task keys of the whole sweep, to check at merge time that all shards ran the same sweep
+    Returns:
+        str: Path of the manifest
+    '''
+    manifest = {
+        "Shard": shard_index,
+        "Shards": number_of_shards,
+        "Sweep": hashlib.sha256("\n".join(sorted(all_tasks)).encode("utf-8")).hexdigest(),
+        "Sweep Tasks": len(all_tasks),
+        "Tasks": tasks
+    }
+    manifest_path = get_manifest_path(save_file_path_base, shard_index, number_of_shards)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest_path
+
+
+def read_manifest(manifest_path:str) -> dict:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_manifest_files(manifest:dict) -> dict:
+    ''' All files of a manifest (relative path and SHA-256) '''
+    return {relative_path: file_hash for task_files in manifest["Tasks"].values() for relative_path, file_hash in task_files.items()}
+
+
+def compare_manifests(manifest:dict, reference_manifest:dict) -> dict:
+    '''
+    Compare the files of two manifests, e.g. a merged sharded run against a single node run
+    Returns:
+        dict: Relative paths "Missing" (only in the reference), "Extra" (only in the manifest) and "Different" (other content)
+    '''
+    files = get_manifest_files(manifest)
+    reference_files = get_manifest_files(reference_manifest)
+    return {
+        "Missing": sorted(set(reference_files) - set(files)),
+        "Extra": sorted(set(files) - set(reference_files)),
+        "Different": sorted(path for path in set(files) & set(reference_files) if files[path] != reference_files[path])
+    }
+
+
+def merge_shards(shard_paths:list, merged_path:str = None, reference_manifest_path:str = None, number_of_shards:int = None) -> dict:
+    '''
+    Merge the outputs of all shards of a sweep and verify them
+    Args:
+        shard_paths (list): Base folders of the shards (the same folder if all shards wrote to shared storage)
+        merged_path (str): Optional folder the shard outputs are copied to (checked against the shard manifests)
+        reference_manifest_path (str): Optional manifest of a single node run (shard 0/1) the merged output must equal
+        number_of_shards (int): Shard layout to merge if the folders hold manifests of several layouts
+    Returns:
+        dict: Merged manifest, with "Comparison" (see compare_manifests) if a reference manifest is given
+    '''
+    manifests = {}
+    for shard_path in dict.fromkeys(shard_paths):
+        manifest_folder = os.path.join(shard_path, MANIFEST_FOLDER)
+        for file_name in sorted(os.listdir(manifest_folder)):
+            match = re.fullmatch(r"shard_\d+_of_(\d+)\.json", file_name)
+            if match is not None and (number_of_shards is None or int(match.group(1)) == number_of_shards):
+                manifest = read_manifest(os.path.join(manifest_folder, file_name))
+                if manifest["Shard"] in manifests:
+                    raise ValueError(f"Shard {manifest['Shard']} found twice")
+                manifests[manifest["Shard"]] = (shard_path, manifest)
+
+    layouts = {manifest["Shards"] for _, manifest in manifests.values()}
+    sweeps = {manifest["Sweep"] for _, manifest in manifests.values()}
+    if len(layouts) != 1 or len(sweeps) != 1:
+        raise ValueError("Manifests belong to different sweeps or shard layouts")
+    number_of_shards = layouts.pop()
+    if sorted(manifests) != list(range(number_of_shards)):
+        raise ValueError(f"Missing shards: {sorted(set(range(number_of_shards)) - set(manifests))}")
+
+    tasks = {}
+    for shard_index, (shard_path, manifest) in sorted(manifests.items()):
+        for task_key, task_files in manifest["Tasks"].items():
+            if task_key in tasks:
+                raise ValueError(f"Task {task_key} ran on several shards")
+            if get_task_shard(task_key, number_of_shards) != shard_index:
+                raise ValueError(f"Task {task_key} ran on shard {shard_index} instead of {get_task_shard(task_key, number_of_shards)}")
+            tasks[task_key] = task_files
+
+            if merged_path is not None:
+                for relative_path, file_hash in task_files.items():
+                    target_path = os.path.join(merged_path, relative_path)
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    shutil.copyfile(os.path.join(shard_path, relative_path), target_path)
+                    if hash_file(target_path) != file_hash:
+                        raise ValueError(f"{relative_path} of shard {shard_index} differs from its manifest")
+
+    sweep_tasks = manifests[0][1]["Sweep Tasks"]
+    if len(tasks) != sweep_tasks:
+        raise ValueError(f"Shards ran {len(tasks)} of {sweep_tasks} tasks")
+
+    merged_manifest = {"Shards": number_of_shards, "Sweep": sweeps.pop(), "Sweep Tasks": sweep_tasks, "Tasks": tasks}
+    if reference_manifest_path is not None:
+        merged_manifest["Comparison"] = compare_manifests(merged_manifest, read_manifest(reference_manifest_path))
+
+    if merged_path is not None:
+        os.makedirs(os.path.join(merged_path, MANIFEST_FOLDER), exist_ok=True)
+        with open(os.path.join(merged_path, MANIFEST_FOLDER, MERGED_MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(merged_manifest, f, indent=1, sort_keys=True)
+    return merged_manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge and verify the outputs of a sharded generation sweep.")
+    ap.add_argument("shards", nargs="+", help="Base folders of the shards")
+    ap.add_argument("--merged", default=None, help="Folder the shard outputs are copied to")
+    ap.add_argument("--reference", default=None, help="Manifest of a single node run (manifests/shard_0_of_1.json, create_route_instances.py --manifest)")
+    ap.add_argument("--shards-total", type=int, default=None, help="Number of shards N if the folders hold manifests of several layouts")
+    args = ap.parse_args()
+
+    merged_manifest = merge_shards(args.shards, args.merged, args.reference, args.shards_total)
+    print(f"Merged {merged_manifest['Shards']} shards - Tasks: {len(merged_manifest['Tasks'])} - Files: {len(get_manifest_files(merged_manifest))}")
+
+    if "Comparison" in merged_manifest:
+        comparison = merged_manifest["Comparison"]
+        if any(comparison.values()):
+            for key, paths in comparison.items():
+                print(f"{key}: {len(paths)} files {paths[:10]}")
+            raise SystemExit(1)
+        print("Merged output is identical to the reference run")
+
+if __name__ == "__main__":
+    main()
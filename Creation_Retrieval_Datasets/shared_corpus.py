@@ -0,0 +1,115 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Shared Corpus - Memory-mapped tables for worker processes #############################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Table names follow the keys returned by helper_functions.get_filtered_data
+CORPUS_TABLES = ["instance", "agg_demands", "single_demands", "items", "customers"]
+
+META_FILE = "corpus.json"
+
+
+def publish_corpus(corpus_path:str,
+                   df:pd.DataFrame,
+                   aggregate_demands:pd.DataFrame,
+                   single_demands:pd.DataFrame,
+                   items:pd.DataFrame,
+                   customers:pd.DataFrame) -> None:
+    '''
+    Write the corpus tables once as column files (.npy) sorted by instance, so workers can memory-map them read-only
+    String columns are stored as integer codes with their categories in the metadata file
+
+    Args:
+        corpus_path (str): Directory of the published corpus
+        df (pd.DataFrame): Instance dataset
+        aggregate_demands (pd.DataFrame): Aggregate demands dataset
+        single_demands (pd.DataFrame): Single demands dataset
+        items (pd.DataFrame): Items dataset
+        customers (pd.DataFrame): Customers dataset
+    '''
+    os.makedirs(corpus_path, exist_ok=True)
+    meta = {"tables": {}}
+
+    for table_name, table in zip(CORPUS_TABLES, [df, aggregate_demands, single_demands, items, customers]):
+        # Sort rows by instance so every instance is one contiguous slice
+        table = table.sort_values(by="Instance Name", kind="stable", ignore_index=True)
+        instance_names, starts = np.unique(table["Instance Name"].to_numpy(dtype=str), return_index=True)
+        stops = np.append(starts[1:], len(table))
+
+        columns = []
+        for i, column in enumerate(table.columns):
+            file_name = f"{table_name}_{i}.npy"
+            values = table[column]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                np.save(os.path.join(corpus_path, file_name), values.to_numpy())
+                columns.append({"name": column, "file": file_name})
+            else:
+                codes, categories = pd.factorize(values.astype(str))
+                np.save(os.path.join(corpus_path, file_name), codes.astype(np.int32))
+                columns.append({"name": column, "file": file_name, "categories": categories.tolist()})
+
+        meta["tables"][table_name] = {
+            "columns": columns,
+            "rows": {name: [int(start), int(stop)] for name, start, stop in zip(instance_names, starts, stops)}
+        }
+
+    with open(os.path.join(corpus_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+class SharedCorpus:
+
+    def __init__(self, corpus_path:str):
+        """ Attach to a published corpus, column files are memory-mapped read-only and shared through the page cache """
+        self.corpus_path = corpus_path
+        with open(os.path.join(corpus_path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.columns = {}
+        for table_name, table_meta in self.meta["tables"].items():
+            self.columns[table_name] = [
+                (column["name"],
+                 np.load(os.path.join(corpus_path, column["file"]), mmap_mode="r"),
+                 np.array(column["categories"], dtype=object) if "categories" in column else None)
+                for column in table_meta["columns"]
+            ]
+
+    def get_table(self, table_name:str, instance:str) -> pd.DataFrame:
+        '''
+        Rows of one table for one instance, numeric columns are views into the memory map
+        Args:
+            table_name (str): One of CORPUS_TABLES
+            instance (str): Name of the instance
+        Returns:
+            pd.DataFrame: Filtered table
+        '''
+        start, stop = self.meta["tables"][table_name]["rows"].get(instance, [0, 0])
+        data = {}
+        for name, values, categories in self.columns[table_name]:
+            data[name] = values[start:stop] if categories is None else categories[values[start:stop]]
+        return pd.DataFrame(data, copy=False)
+
+    def get_filtered_data(self, instance:str) -> dict:
+        ''' Same result as helper_functions.get_filtered_data, without passing the full frames '''
+        filtered_data = {table_name: self.get_table(table_name, instance) for table_name in CORPUS_TABLES}
+        filtered_data["customers"] = filtered_data["customers"].drop(columns=["Instance Name", "Folder Name"])
+        return filtered_data
+
+    def instances(self) -> list:
+        return list(self.meta["tables"]["instance"]["rows"].keys())
+
+
+# Corpus of the current worker process, set by init_worker
+worker_corpus = None
+
+def init_worker(corpus_path:str) -> None:
+    ''' Initializer for multiprocessing pools, attaches each worker once to the published corpus '''
+    global worker_corpus
+    worker_corpus = SharedCorpus(corpus_path)
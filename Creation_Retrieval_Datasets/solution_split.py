@@ -0,0 +1,179 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from helper_functions import get_filtered_data, get_vehicle_dataframe
+from route_costs import DistanceMatrixCache
+from route_samplers import get_demand_arrays
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Solution Split - Complete multi-vehicle solutions from giant tours #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+def get_max_route_customers(demands:dict, number_of_customers:int) -> int:
+    ''' Most customers any route can hold: the smallest volumes and masses summed up until the vehicle is full '''
+    volumes = np.cumsum(np.sort(demands["volume"][1:number_of_customers + 1]))
+    masses = np.cumsum(np.sort(demands["mass"][1:number_of_customers + 1]))
+    return max(1, min(int((volumes <= demands["max_volume"]).sum()), int((masses <= demands["max_mass"]).sum())))
+
+
+def split_giant_tours(tours:np.ndarray, distance_matrix:np.ndarray, demands:dict, fleet_size:int) -> tuple:
+    '''
+    Optimal split of many giant tours at once into consecutive routes within capacity, using at most fleet_size vehicles.
+    The split is a shortest path over the tour positions. Segment costs and capacities come from prefix sums, all
+    segments of all tours (up to the most customers a route can hold) are evaluated as one array and every vehicle count
+    adds one min-plus step.
+
+    Args:
+        tours (np.ndarray): Giant tours (customer sequences without depot), shape (number of tours, number of customers)
+        distance_matrix (np.ndarray): Distance matrix of the instance
+        demands (dict): Output of route_samplers.get_demand_arrays
+        fleet_size (int): Maximum number of vehicles
+    Returns:
+        tuple: Total cost per tour (inf if no split exists) and the split positions per tour (list of route end positions)
+    '''
+    number_of_tours, number_of_customers = tours.shape
+    rows = np.arange(number_of_tours)[:, None, None]
+
+    volume = np.hstack([np.zeros((number_of_tours, 1)), np.cumsum(demands["volume"][tours], axis=1)])
+    mass = np.hstack([np.zeros((number_of_tours, 1)), np.cumsum(demands["mass"][tours], axis=1)])
+    legs = np.hstack([np.zeros((number_of_tours, 1)), np.cumsum(distance_matrix[tours[:, :-1], tours[:, 1:]], axis=1)])
+
+    # Segment of tour positions start .. end (inclusive) with end - start = offset, tours x end x offset
+    max_offset = get_max_route_customers(demands, number_of_customers)
+    end = np.arange(number_of_customers)[:, None]
+    start = end - np.arange(max_offset)[None, :]
+    valid = start >= 0
+    start = np.maximum(start, 0)
+
+    costs = (distance_matrix[0, tours][rows, start] + legs[:, :, None] - legs[rows, start] + distance_matrix[tours, 0][:, :, None])
+    feasible = (valid[None, :, :]
+                & (volume[:, 1:, None] - volume[rows, start] <= demands["max_volume"])
+                & (mass[:, 1:, None] - mass[rows, start] <= demands["max_mass"]))
+    costs = np.where(feasible, costs, np.inf)
+
+    # labels[:, position]: cheapest cost of serving the first position customers with the vehicles used so far
+    labels = np.full((number_of_tours, number_of_customers + 1), np.inf)
+    labels[:, 0] = 0.0
+    best_cost = np.full(number_of_tours, np.inf)
+    best_vehicles = np.zeros(number_of_tours, dtype=int)
+    predecessors = []
+
+    for vehicles in range(1, min(fleet_size, number_of_customers) + 1):
+        candidates = labels[rows, start] + costs
+        offset = candidates.argmin(axis=2)
+        next_labels = np.full_like(labels, np.inf)
+        next_labels[:, 1:] = np.take_along_axis(candidates, offset[:, :, None], axis=2)[:, :, 0]
+        predecessors.append(end[:, 0][None, :] - offset)
+
+        improved = next_labels[:, -1] < best_cost
+        best_cost[improved] = next_labels[improved, -1]
+        best_vehicles[improved] = vehicles
+
+        labels = next_labels
+        if not np.isfinite(labels).any():
+            break
+
+    splits = []
+    for tour in range(number_of_tours):
+        if not np.isfinite(best_cost[tour]):
+            splits.append(None)
+            continue
+        ends = []
+        position = number_of_customers
+        for vehicles in range(best_vehicles[tour], 0, -1):
+            ends.append(position)
+            position = int(predecessors[vehicles - 1][tour, position - 1])
+        splits.append(ends[::-1])
+
+    return best_cost, splits
+
+
+def generate_solutions(instance:str,
+                       filtered_data:dict,
+                       number_of_tours:int = 1000,
+                       seed:int = 42,
+                       batch_size:int = 128,
+                       distance_matrices:DistanceMatrixCache = None) -> list:
+    '''
+    Sample giant tours and split them into complete solutions for the fleet of the instance
+    Args:
+        instance (str): Name of the instance
+        filtered_data (dict): Filtered datasets of the instance
+        number_of_tours (int): Number of sampled giant tours
+        seed (int): Seed of the giant tours
+        batch_size (int): Giant tours split at once (memory grows with batch_size x customers x customers per route)
+        distance_matrices (DistanceMatrixCache): Optional distance matrices
+    Returns:
+        list: Distinct solutions as dicts with "Routes" (customer sequences without depot), "Route Lengths" and "Cost", cheapest first
+    '''
+    filtered_instance = filtered_data["instance"]
+    number_of_customers = int(filtered_instance["Number of Customers"].values[0])
+    fleet_size = int(filtered_instance["Number of Vehicles"].values[0])
+    distance_matrix = (DistanceMatrixCache() if distance_matrices is None else distance_matrices).get(instance, filtered_data["customers"])
+    demands = get_demand_arrays(filtered_data)
+
+    rng = np.random.default_rng(seed)
+    tours = np.argsort(rng.random((number_of_tours, number_of_customers)), axis=1) + 1
+
+    solutions = {}
+    for batch_start in range(0, number_of_tours, batch_size):
+        batch = tours[batch_start:batch_start + batch_size]
+        costs, splits = split_giant_tours(batch, distance_matrix, demands, fleet_size)
+
+        for tour, cost, ends in zip(batch, costs, splits):
+            if ends is None:
+                continue
+            routes = [tour[route_start:route_end].tolist() for route_start, route_end in zip([0] + ends[:-1], ends)]
+            key = tuple(sorted(tuple(route) for route in routes))
+            if key not in solutions:
+                solutions[key] = {
+                    "Routes": routes,
+                    "Route Lengths": [float(distance_matrix[[0] + route, route + [0]].sum()) for route in routes],
+                    "Cost": float(cost)
+                }
+
+    return sorted(solutions.values(), key=lambda solution: solution["Cost"])
+
+
+def write_solution_file(instance:str, j:int, solution:dict, filtered_data:dict, file_path:str) -> None:
+    ''' Write one solution: vehicles of the instance and its routes with the depot at the beginning '''
+    name = f"{instance}_solution_{j}"
+    data = {
+        "Name": name,
+        "Instance": instance,
+        "Vehicles": get_vehicle_dataframe(filtered_data["instance"]),
+        "Routes": [[0] + route for route in solution["Routes"]],
+        "RouteLengths": solution["Route Lengths"],
+        "Cost": solution["Cost"]
+    }
+    with open(os.path.join(file_path, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+def generate_solution_instances(instance:str,
+                                df:pd.DataFrame,
+                                aggregate_demands:pd.DataFrame,
+                                single_demands:pd.DataFrame,
+                                items:pd.DataFrame,
+                                customers:pd.DataFrame,
+                                file_path:str,
+                                number_of_tours:int = 1000,
+                                filtered_data:dict = None,
+                                distance_matrices:DistanceMatrixCache = None) -> int:
+    '''
+    Write the distinct solutions of generate_solutions for an instance, the seed is fixed per instance
+    Returns:
+        int: Number of solutions written
+    '''
+    if filtered_data is None:
+        filtered_data = get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers)
+
+    solutions = generate_solutions(instance, filtered_data, number_of_tours, 42 + number_of_tours, distance_matrices=distance_matrices)
+    for j, solution in enumerate(solutions):
+        write_solution_file(instance, j, solution, filtered_data, file_path)
+    return len(solutions)
@@ -0,0 +1,113 @@
+import heapq
+import numpy as np
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Spatial Index - KD-tree over customer coordinates #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+class KDTree:
+
+    def __init__(self, points:np.ndarray, leaf_size:int = 16):
+        """ KD-tree over 2D (or higher dimensional) points for radius and nearest neighbor queries
+            Inner nodes split at the median of the axis with the largest spread, leaves hold up to leaf_size points
+            that are checked at once. Queries visit O(log n) nodes for well spread points.
+        """
+        self.points = np.asarray(points, dtype=float)
+        self.leaf_size = leaf_size
+        self.indices = np.arange(len(self.points))
+
+        # Per node: first and last position in indices, split axis and value (-1 for leaves), children
+        self.starts, self.ends, self.axes, self.splits, self.lefts, self.rights = [], [], [], [], [], []
+        self.build(0, len(self.points))
+
+    def build(self, start:int, end:int) -> int:
+        node = len(self.starts)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.axes.append(-1)
+        self.splits.append(0.0)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+
+        if end - start <= self.leaf_size:
+            return node
+
+        points = self.points[self.indices[start:end]]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        middle = (end - start) // 2
+        order = np.argpartition(points[:, axis], middle)
+        self.indices[start:end] = self.indices[start:end][order]
+
+        # Left child: coordinates <= split, right child: coordinates >= split
+        self.axes[node] = axis
+        self.splits[node] = float(self.points[self.indices[start + middle], axis])
+        self.lefts[node] = self.build(start, start + middle)
+        self.rights[node] = self.build(start + middle, end)
+        return node
+
+    def query_radius(self, point:np.ndarray, radius:float) -> np.ndarray:
+        '''
+        Points within a distance
+        Args:
+            point (np.ndarray): Query point
+            radius (float): Maximum Euclidean distance
+        Returns:
+            np.ndarray: Indices of the points within radius (unordered)
+        '''
+        point = np.asarray(point, dtype=float)
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self.axes[node] < 0:
+                candidates = self.indices[self.starts[node]:self.ends[node]]
+                distances = np.sqrt(((self.points[candidates] - point) ** 2).sum(axis=1))
+                found.append(candidates[distances <= radius])
+                continue
+
+            difference = point[self.axes[node]] - self.splits[node]
+            near, far = (self.lefts[node], self.rights[node]) if difference < 0 else (self.rights[node], self.lefts[node])
+            stack.append(near)
+            if abs(difference) <= radius:
+                stack.append(far)
+
+        return np.concatenate(found) if found else np.empty(0, dtype=int)
+
+    def query_nearest(self, point:np.ndarray, k:int = 1, mask:np.ndarray = None) -> np.ndarray:
+        '''
+        Nearest points
+        Args:
+            point (np.ndarray): Query point
+            k (int): Number of neighbors
+            mask (np.ndarray): Optional boolean mask of the points that may be returned
+        Returns:
+            np.ndarray: Indices of up to k nearest points, nearest first
+        '''
+        point = np.asarray(point, dtype=float)
+        # Max-heap of the best k as (-distance, index)
+        best = []
+
+        def visit(node:int) -> None:
+            if self.axes[node] < 0:
+                candidates = self.indices[self.starts[node]:self.ends[node]]
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                distances = np.sqrt(((self.points[candidates] - point) ** 2).sum(axis=1))
+                for distance, index in zip(distances.tolist(), candidates.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, index))
+                return
+
+            difference = point[self.axes[node]] - self.splits[node]
+            near, far = (self.lefts[node], self.rights[node]) if difference < 0 else (self.rights[node], self.lefts[node])
+            visit(near)
+            if len(best) < k or abs(difference) < -best[0][0]:
+                visit(far)
+
+        visit(0)
+        return np.array([index for _, index in sorted(best, key=lambda entry: -entry[0])], dtype=int)
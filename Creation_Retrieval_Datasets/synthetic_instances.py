@@ -0,0 +1,328 @@
+import os
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from helper_classes import Instance, VEHICLE_AXLE_PARAMETERS
+from helper_functions import get_filtered_data, calculate_box_statistics
+from packing_bounds import calculate_instance_lower_bounds
+from create_route_instances import generate_instances
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Synthetic Instances - Scaled-up instance files and scaling benchmark #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Pipeline stages timed by run_scaling_benchmark, each stage uses the result of the previous ones
+SCALING_STAGES = ["Parse", "Filter", "Lower Bounds", "Box Statistics", "Generate"]
+
+# Grouping of the item table in the box plots of the analysis notebooks
+BOX_STATISTICS_ORDER = ["Number of Item Types", "Number of Customers", "Number of Items"]
+
+# Relative noise of the resampled item dimensions / masses and of the customer coordinates (share of the coordinate spread)
+ITEM_JITTER = 0.1
+COORDINATE_JITTER = 0.05
+
+
+def fit_source_profiles(folder_path:str) -> list:
+    '''
+    Empirical distributions of every instance of a source folder, in the units after parsing (divider applied)
+    Args:
+        folder_path (str): Source folder, e.g. "Data/Krebs_Ehmke_Koch_2021"
+    Returns:
+        list: One profile per instance (header values, vehicle, depot, customer and item tables, demand entries per customer and quantities)
+    '''
+    profiles = []
+    for file_name in sorted(os.listdir(folder_path)):
+        if not file_name.endswith(".txt") or file_name == "Overview.txt":
+            continue
+        instance = Instance(os.path.join(folder_path, file_name), standardize = False, analyze_one_source=False)
+        customers = instance.customers.sort_values(by="Customer ID")
+        demands = instance.demands
+
+        profiles.append({
+            "Name": instance.name,
+            "Number of Customers": instance.num_customers,
+            "Number of Item Types": instance.num_item_types,
+            "Number of Vehicles": instance.num_vehicles,
+            "Time Windows": instance.time_windows,
+            "Vehicle": {"Mass_Capacity": instance.vehicle_capacity,
+                        "CargoSpace_Length": instance.cargoSpace_Length,
+                        "CargoSpace_Width": instance.cargoSpace_Width,
+                        "CargoSpace_Height": instance.cargoSpace_Height,
+                        **{key: value for key, value in instance.axle_parameters.items() if value}},
+            "Depot": customers[customers["Customer ID"] == 0].iloc[0],
+            "Customers": customers[customers["Customer ID"] != 0],
+            "Items": instance.items[["Length", "Width", "Height", "Mass", "Fragility"]],
+            "Entries": demands.groupby("Customer ID").size().to_numpy(),
+            "Quantities": demands["Quantity"].to_numpy()
+        })
+    return profiles
+
+
+def generate_synthetic_instance(profile:dict, multiplier:float, rng:np.random.Generator, name:str = None) -> dict:
+    '''
+    Scale an instance up by resampling its empirical distributions.
+    Customers, item types and vehicles are multiplied. Coordinates and time windows of the new customers are resampled
+    from the source customers (coordinates with a little noise), items from the source items with relative noise and
+    clipped to the cargo space, the number of demanded types and the quantities per customer from the source demands.
+
+    Args:
+        profile (dict): Output of fit_source_profiles for one instance
+        multiplier (float): Size multiplier
+        rng (np.random.Generator): Random generator
+        name (str): Name of the new instance, default <source name>_x<multiplier>
+    Returns:
+        dict: Contents of the instance file for write_instance_file
+    '''
+    number_of_customers = max(1, int(round(profile["Number of Customers"] * multiplier)))
+    number_of_types = max(1, int(round(profile["Number of Item Types"] * multiplier)))
+    vehicle = profile["Vehicle"]
+    cargo = np.array([vehicle["CargoSpace_Length"], vehicle["CargoSpace_Width"], vehicle["CargoSpace_Height"]], dtype=float)
+
+    # Item types
+    source_items = profile["Items"].to_numpy(dtype=float)
+    rows = source_items[rng.integers(len(source_items), size=number_of_types)]
+    dimensions = np.clip(np.round(rows[:, :3] * rng.lognormal(0, ITEM_JITTER, size=(number_of_types, 3)), 2), 0.01, cargo)
+    masses = np.maximum(np.round(rows[:, 3] * rng.lognormal(0, ITEM_JITTER, size=number_of_types), 2), 0.01)
+    items = pd.DataFrame({"Type": [f"Bt{i + 1}" for i in range(number_of_types)],
+                          "Length": dimensions[:, 0], "Width": dimensions[:, 1], "Height": dimensions[:, 2],
+                          "Mass": masses, "Fragility": rows[:, 4].astype(int)})
+
+    # Demands, each customer demands distinct types
+    entries = np.minimum(rng.choice(profile["Entries"], size=number_of_customers), number_of_types)
+    demands = []
+    for entry_count in entries:
+        types = np.sort(rng.choice(number_of_types, size=entry_count, replace=False))
+        demands.append(list(zip(types.tolist(), rng.choice(profile["Quantities"], size=entry_count).tolist())))
+
+    # Customers
+    source_customers = profile["Customers"]
+    rows = source_customers.iloc[rng.integers(len(source_customers), size=number_of_customers)]
+    spread = source_customers[["x", "y"]].to_numpy(dtype=float).std(axis=0)
+    coordinates = np.round(rows[["x", "y"]].to_numpy(dtype=float) + rng.normal(0, 1, size=(number_of_customers, 2)) * spread * COORDINATE_JITTER, 2)
+
+    volumes = items["Length"].to_numpy() * items["Width"].to_numpy() * items["Height"].to_numpy()
+    customers = pd.DataFrame({
+        "Customer ID": np.arange(1, number_of_customers + 1),
+        "x": coordinates[:, 0],
+        "y": coordinates[:, 1],
+        "Demand": [sum(quantity for _, quantity in demand) for demand in demands],
+        "Ready Time": rows["Ready Time"].to_numpy(dtype=int),
+        "Due Date": rows["Due Date"].to_numpy(dtype=int),
+        "Service Time": rows["Service Time"].to_numpy(dtype=int),
+        "Demanded Mass": [round(sum(masses[type] * quantity for type, quantity in demand), 2) for demand in demands],
+        "Demanded Volume": [int(round(sum(volumes[type] * quantity for type, quantity in demand))) for demand in demands]
+    })
+
+    return {
+        "Name": f"{profile['Name']}_x{multiplier:g}" if name is None else name,
+        "Number of Customers": number_of_customers,
+        "Number of Items": int(customers["Demand"].sum()),
+        "Number of Item Types": number_of_types,
+        "Number of Vehicles": max(1, int(round(profile["Number of Vehicles"] * multiplier))),
+        "Time Windows": profile["Time Windows"],
+        "Vehicle": vehicle,
+        "Depot": profile["Depot"],
+        "Customers": customers,
+        "Items": items,
+        "Demands": demands
+    }
+
+
+def format_number(value) -> str:
+    ''' Integers without decimals, other values with up to 2 decimals '''
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:.2f}".rstrip("0")
+
+
+def write_instance_file(file_path:str, synthetic_instance:dict) -> None:
+    '''
+    Write an instance in the text format read by helper_classes.Instance
+    (header, VEHICLE, CUSTOMERS, ITEMS and DEMANDS PER CUSTOMER)
+
+    Args:
+        file_path (str): Path of the instance file
+        synthetic_instance (dict): Output of generate_synthetic_instance
+    '''
+    vehicle = synthetic_instance["Vehicle"]
+    lines = [f"Name\t\t\t\t{synthetic_instance['Name']}",
+             f"Number_of_Customers\t\t{synthetic_instance['Number of Customers']}",
+             f"Number_of_Items\t\t\t{synthetic_instance['Number of Items']}",
+             f"Number_of_ItemTypes\t\t{synthetic_instance['Number of Item Types']}",
+             f"Number_of_Vehicles\t\t{synthetic_instance['Number of Vehicles']}",
+             f"TimeWindows\t\t\t{synthetic_instance['Time Windows']}",
+             "",
+             "VEHICLE"]
+    # The parser reads the capacity and the cargo space as integers
+    lines += [f"{key}\t\t{int(round(vehicle[key]))}" for key in ["Mass_Capacity", "CargoSpace_Length", "CargoSpace_Width", "CargoSpace_Height"]]
+    lines += [f"{key}\t\t{format_number(vehicle[key])}" for key in VEHICLE_AXLE_PARAMETERS if key in vehicle]
+
+    lines += ["", "CUSTOMERS", "i\t\tx\t\ty\t\tDemand\t\tReadyTime\tDueDate\t\tServiceTime\tDemandedMass\tDemandedVolume"]
+    depot = synthetic_instance["Depot"]
+    lines.append("\t\t".join(["0", format_number(depot["x"]), format_number(depot["y"]), "0",
+                              str(int(depot["Ready Time"])), str(int(depot["Due Date"])), str(int(depot["Service Time"])), "0", "0"]))
+    for customer in synthetic_instance["Customers"].itertuples(index=False):
+        lines.append("\t\t".join([str(customer[0]), format_number(customer.x), format_number(customer.y), str(customer.Demand),
+                                  str(customer[4]), str(customer[5]), str(customer[6]), format_number(customer[7]), str(customer[8])]))
+
+    # Load bearing strength is not read by the parser
+    lines += ["", "ITEMS", "Type\t\tLength\t\tWidth\t\tHeight\t\tMass\t\tFragility\tLoadBearingStrength"]
+    for item in synthetic_instance["Items"].itertuples(index=False):
+        lines.append("\t\t".join([item.Type, format_number(item.Length), format_number(item.Width), format_number(item.Height),
+                                  format_number(item.Mass), str(item.Fragility), "0"]))
+
+    lines += ["", "DEMANDS PER CUSTOMER", "i\tType Quantity"]
+    for customer_id, demand in enumerate(synthetic_instance["Demands"], start=1):
+        lines.append(f"{customer_id}\t" + "\t".join(f"Bt{type + 1} {quantity}" for type, quantity in demand) + "\t")
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def generate_synthetic_folder(source_folder:str, target_folder:str, multipliers:list, instances_per_multiplier:int = 1, seed:int = 42) -> dict:
+    '''
+    Write scaled-up instances of a source folder, one folder per multiplier (<target_folder>/<source folder>_x<multiplier>).
+    The instances are written in the parsed units, the folder names never match the folders with a divider.
+
+    Args:
+        source_folder (str): Source folder of the distributions
+        target_folder (str): Base folder of the synthetic instances
+        multipliers (list): Size multipliers
+        instances_per_multiplier (int): Instances per multiplier, the source instances are drawn at random
+        seed (int): Seed of the generator
+    Returns:
+        dict: File paths of the written instances per multiplier
+    '''
+    profiles = fit_source_profiles(source_folder)
+    rng = np.random.default_rng(seed)
+    file_paths = {}
+    for multiplier in multipliers:
+        folder_path = os.path.join(target_folder, f"{os.path.basename(os.path.normpath(source_folder))}_x{multiplier:g}")
+        os.makedirs(folder_path, exist_ok=True)
+        file_paths[multiplier] = []
+        for profile_index in rng.choice(len(profiles), size=instances_per_multiplier, replace=instances_per_multiplier > len(profiles)):
+            synthetic_instance = generate_synthetic_instance(profiles[profile_index], multiplier, rng)
+            file_path = os.path.join(folder_path, f"{synthetic_instance['Name']}.txt")
+            write_instance_file(file_path, synthetic_instance)
+            file_paths[multiplier].append(file_path)
+    return file_paths
+
+
+def run_stage(function, measure_memory:bool) -> tuple:
+    ''' Run a stage, returns its result, runtime in s and (if measured in a second run) peak traced memory in MB '''
+    start_time = time.perf_counter()
+    result = function()
+    runtime = time.perf_counter() - start_time
+
+    peak_memory = np.nan
+    if measure_memory:
+        # Tracing slows the stage down, so the memory is measured in a separate run
+        tracemalloc.start()
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, runtime, peak_memory
+
+
+def run_scaling_benchmark(file_paths:dict, stages:list = SCALING_STAGES, measure_memory:bool = True, generation_settings:dict = None) -> pd.DataFrame:
+    '''
+    Runtime and peak memory of the pipeline stages per instance size
+    Args:
+        file_paths (dict): Instance files per multiplier (output of generate_synthetic_folder)
+        stages (list): Stages of SCALING_STAGES to run
+        measure_memory (bool): Also measure the peak memory of every stage (runs every stage twice)
+        generation_settings (dict): Keyword arguments of generate_instances for the "Generate" stage
+    Returns:
+        pd.DataFrame: One row per instance and stage
+    '''
+    generation_settings = {"multiplierCustomerNumber": 1, "attemptLimit": 1, "succesfulInstancesThreshold": 1, "cap": 0.6,
+                           **(generation_settings or {})}
+    rows = []
+    for multiplier, paths in file_paths.items():
+        for file_path in paths:
+            measurements = {}
+            instance, *measurements["Parse"] = run_stage(lambda: Instance(file_path, standardize = False, analyze_one_source=False), measure_memory)
+            df = pd.DataFrame([instance.to_dict()])
+            corpus = (df, instance.aggregated_demands, instance.demands, instance.items, instance.customers)
+
+            filtered_data = None
+            if any(stage in stages for stage in ["Filter", "Lower Bounds", "Generate"]):
+                filtered_data, *measurements["Filter"] = run_stage(lambda: get_filtered_data(instance.name, *corpus), measure_memory)
+            if "Lower Bounds" in stages:
+                _, *measurements["Lower Bounds"] = run_stage(lambda: calculate_instance_lower_bounds(filtered_data), measure_memory)
+            if "Box Statistics" in stages:
+                # Item table as parsed with analyze_one_source=True
+                analyzed_items = instance.items.assign(**{"Number of Customers": instance.num_customers,
+                                                          "Number of Items": instance.num_items,
+                                                          "Number of Item Types": instance.num_item_types})
+                _, *measurements["Box Statistics"] = run_stage(lambda: calculate_box_statistics(analyzed_items, "Volume", BOX_STATISTICS_ORDER), measure_memory)
+            if "Generate" in stages:
+                with tempfile.TemporaryDirectory() as output_path:
+                    _, *measurements["Generate"] = run_stage(lambda: generate_instances(instance.name, *corpus, file_path=output_path,
+                                                                                         filtered_data=filtered_data, **generation_settings), measure_memory)
+
+            for stage in stages:
+                runtime, peak_memory = measurements[stage]
+                rows.append({"Multiplier": multiplier,
+                             "Instance Name": instance.name,
+                             "Number of Customers": instance.num_customers,
+                             "Number of Items": instance.num_items,
+                             "Stage": stage,
+                             "Time": runtime,
+                             "Peak Memory": peak_memory})
+    return pd.DataFrame(rows)
+
+
+def plot_scaling(results:pd.DataFrame, save_path:str = None) -> None:
+    '''
+    Runtime and peak memory per stage against the number of items (log-log)
+    Args:
+        results (pd.DataFrame): Output of run_scaling_benchmark
+        save_path (str): Optional path of the figure, shown otherwise
+    '''
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for ax, column, label in zip(axes, ["Time", "Peak Memory"], ["Runtime [s]", "Peak memory [MB]"]):
+        for stage, stage_results in results.groupby("Stage", sort=False):
+            points = stage_results.groupby("Number of Items")[column].mean()
+            ax.plot(points.index, points.values, marker="o", label=stage)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("Number of items")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+    axes[0].legend()
+    fig.tight_layout()
+
+    if save_path is None:
+        plt.show()
+    else:
+        fig.savefig(save_path, dpi=150)
+        plt.close(fig)
+
+
+def main():
+
+    SOURCE_FOLDER = "Data/Krebs_Ehmke_Koch_2021"
+    TARGET_FOLDER = "Data_Synthetic"
+    MULTIPLIERS = [1, 5, 10, 50, 100] # Krebs: up to 10,000 customers
+    INSTANCES_PER_MULTIPLIER = 1
+    MEASURE_MEMORY = True
+    RESULT_PATH = "scaling_results"
+
+    file_paths = generate_synthetic_folder(SOURCE_FOLDER, TARGET_FOLDER, MULTIPLIERS, INSTANCES_PER_MULTIPLIER)
+    results = run_scaling_benchmark(file_paths, measure_memory=MEASURE_MEMORY)
+
+    os.makedirs(RESULT_PATH, exist_ok=True)
+    results.to_csv(os.path.join(RESULT_PATH, "scaling.csv"), index=False)
+    plot_scaling(results, os.path.join(RESULT_PATH, "scaling.png"))
+    print(results.pivot_table(index=["Multiplier", "Number of Items"], columns="Stage", values="Time", sort=False).round(3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import importlib.util
+import pandas as pd
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Table IO - CSV and parquet tables of the exports #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Formats of write_table and read_table
+FILE_FORMATS = ["csv", "parquet"]
+
+
+def get_file_format(file_format:str) -> str:
+    ''' Parquet needs pyarrow or fastparquet, without them tables are written as CSV '''
+    if file_format not in FILE_FORMATS:
+        raise NameError(f"File format {file_format} not supported!")
+    if file_format == "parquet" and importlib.util.find_spec("pyarrow") is None and importlib.util.find_spec("fastparquet") is None:
+        print("Parquet needs pyarrow or fastparquet, writing CSV instead (pip install pyarrow)")
+        return "csv"
+    return file_format
+
+
+def write_table(table:pd.DataFrame, path:str, file_format:str) -> None:
+    if file_format == "parquet":
+        table.to_parquet(path, index=False)
+    elif file_format == "csv":
+        table.to_csv(path, index=False)
+    else:
+        raise NameError(f"File format {file_format} not supported!")
+
+
+def read_table(path:str, file_format:str, dtype:dict = None) -> pd.DataFrame:
+    if file_format == "parquet":
+        return pd.read_parquet(path)
+    elif file_format == "csv":
+        return pd.read_csv(path, dtype=dtype)
+    else:
+        raise NameError(f"File format {file_format} not supported!")
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from route_costs import COORDINATE_COLUMNS, DistanceMatrixCache, get_coordinates_key
+from route_screens import RouteScreen
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Time Windows - Feasibility of routes (3L-VRPTW) #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Customer columns of the time window simulation
+TIME_WINDOW_COLUMNS = ["Ready Time", "Due Date", "Service Time"]
+
+
+def get_time_window_arrays(filtered_customers:pd.DataFrame) -> dict:
+    '''
+    Ready times, due dates and service times of an instance as arrays indexed by Customer ID (depot 0 included)
+    Args:
+        filtered_customers (pd.DataFrame): Customers of one instance
+    Returns:
+        dict: "ready", "due" and "service" arrays
+    '''
+    customer_ids = filtered_customers["Customer ID"].to_numpy(dtype=int)
+    arrays = {}
+    for key, column in zip(["ready", "due", "service"], TIME_WINDOW_COLUMNS):
+        values = np.zeros(customer_ids.max() + 1)
+        values[customer_ids] = filtered_customers[column].to_numpy(dtype=float)
+        arrays[key] = values
+    return arrays
+
+
+def check_time_windows(travel_times:np.ndarray, time_windows:dict, routes:np.ndarray) -> np.ndarray:
+    '''
+    Simulate many routes at once: the vehicle leaves the depot at its ready time, waits for early arrivals,
+    must start service before each due date and return to the depot before its due date.
+    Batches come from TimeWindowScreen.filter_routes, generate_instances passes one candidate per call (is_feasible).
+    Args:
+        travel_times (np.ndarray): Travel time matrix (Euclidean distances)
+        time_windows (dict): Output of get_time_window_arrays
+        routes (np.ndarray): Customer sequences without depot, shape (number of routes, route length)
+    Returns:
+        np.ndarray: Boolean mask of time window feasible routes
+    '''
+    routes = np.atleast_2d(np.asarray(routes, dtype=int))
+    ready, due, service = time_windows["ready"], time_windows["due"], time_windows["service"]
+
+    feasible = np.ones(routes.shape[0], dtype=bool)
+    departure = np.full(routes.shape[0], ready[0] + service[0])
+    previous = np.zeros(routes.shape[0], dtype=int)
+
+    # Loop over the positions, vectorized over all routes
+    for position in range(routes.shape[1]):
+        current = routes[:, position]
+        start = np.maximum(departure + travel_times[previous, current], ready[current])
+        feasible &= start <= due[current]
+        departure = start + service[current]
+        previous = current
+
+    feasible &= departure + travel_times[previous, 0] <= due[0]
+    return feasible
+
+
+class TimeWindowScreen(RouteScreen):
+
+    name = "Time windows"
+
+    def __init__(self, distance_matrices:DistanceMatrixCache = None):
+        """ Rejects routes violating ReadyTime / DueDate / ServiceTime before they are written
+            Only instances with "Time Windows" == 1 are screened, travel times are the Euclidean distances.
+            generate_instances screens its candidates one by one (is_feasible), the generation path is not batched: every
+            result changes its counters and random draws, so the next candidate is not known before the current one is
+            screened. Travel times and time windows are therefore looked up once per instance, keyed like the DistanceMatrixCache
+            by name and a hash of the customer table (coordinates and time windows). filter_routes checks a batch of routes at once.
+        """
+        super().__init__()
+        self.distance_matrices = DistanceMatrixCache() if distance_matrices is None else distance_matrices
+        # Travel times and time windows per instance and customers hash, None for instances without time windows
+        self.arrays = {}
+        # Key of the last customer table, repeated checks of the same table are not hashed again
+        self.last_customers = None
+        self.last_key = None
+
+    def is_screened(self, instance:str, filtered_data:dict) -> bool:
+        ''' Whether the instance has time windows '''
+        return int(filtered_data["instance"]["Time Windows"].values[0]) == 1
+
+    def get_arrays(self, instance:str, filtered_data:dict) -> tuple:
+        ''' Travel times and time windows of an instance, None for instances without time windows '''
+        if filtered_data["customers"] is not self.last_customers:
+            self.last_customers = filtered_data["customers"]
+            self.last_key = get_coordinates_key(self.last_customers, COORDINATE_COLUMNS + TIME_WINDOW_COLUMNS)
+        key = (instance, self.last_key)
+        if key not in self.arrays:
+            if self.is_screened(instance, filtered_data):
+                self.arrays[key] = (self.distance_matrices.get(instance, filtered_data["customers"]), get_time_window_arrays(filtered_data["customers"]))
+            else:
+                self.arrays[key] = None
+        return self.arrays[key]
+
+    def filter_routes(self, instance:str, filtered_data:dict, routes) -> np.ndarray:
+        '''
+        Check a batch of routes of one instance
+        Args:
+            instance (str): Name of the instance
+            filtered_data (dict): Filtered datasets of the instance
+            routes: Customer sequences without depot, all with the same number of customers
+        Returns:
+            np.ndarray: Boolean mask of feasible routes (all True for instances without time windows)
+        '''
+        routes = np.atleast_2d(np.asarray(routes, dtype=int))
+        arrays = self.get_arrays(instance, filtered_data)
+        if arrays is None:
+            return np.ones(routes.shape[0], dtype=bool)
+
+        return self.count(instance, check_time_windows(arrays[0], arrays[1], routes))
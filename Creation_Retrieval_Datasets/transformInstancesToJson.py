@@ -86,7 +86,8 @@ def transform_instances(instance:str, df:pd.DataFrame,
                        single_demands:pd.DataFrame,
                        items:pd.DataFrame,
                        customers:pd.DataFrame,
-                       file_path) -> int:
+                       file_path,
+                       filtered_data:dict = None) -> int:
     '''
         Generate train instances with specific customer routes and demands
     Args:       
@@ -95,12 +96,14 @@ def transform_instances(instance:str, df:pd.DataFrame,
         aggregate_demands (pd.DataFrame): Aggregate demands dataset
         single_demands (pd.DataFrame): Single demands dataset
         items (pd.DataFrame): Items dataset
+        filtered_data (dict): Optional already filtered datasets (e.g. from a SharedCorpus), the full datasets may then be None
     Returns:
         int: Number of instances created
     '''
 
     # Create dict with filtered dataframes
-    filtered_data = get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers)
+    if filtered_data is None:
+        filtered_data = get_filtered_data(instance, df, aggregate_demands, single_demands, items, customers)
 
     # Calculate bounds for number of customers
     max_customers = filtered_data["instance"]["Number of Customers"].values[0]
@@ -0,0 +1,432 @@
+import os
+import math
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+
+from helper_functions import get_filtered_data
+from shared_corpus import CORPUS_TABLES, SharedCorpus, publish_corpus, init_worker
+from create_RouteCompletionCSVs_fromDatasets import TABLES, get_data_folders, export_partitions, read_partitions
+from create_route_instances import generate_instances, generate_instances_multi_cap, generate_instances_worker, load_corpus
+from packing_bounds import get_item_tables, get_cargo_dimensions, calculate_instance_lower_bounds
+from sharding import get_file_instance
+
+
+####################################################################################################################################################################
+####################################################################################################################################################################
+########################################## Verification Harness - Fast paths against the reference pipeline #############################################################################
+####################################################################################################################################################################
+####################################################################################################################################################################
+
+# Fast paths compared against the reference (Instance parsing, get_filtered_data on the full frames), the route files of the
+# multi cap pass checked per folder (timed against generate_instances per cap), the pool workers against the multi cap pass
+# in one process and growth sampling behind enumerated route lengths against growth sampling alone
+VERIFICATION_CHECKS = ["Partitions", "Shared Corpus", "Lower Bounds", "Multi Cap", "Workers", "Growth Enumeration"]
+
+# Rows of the corpus tables are matched on these columns (columns missing in a table are skipped)
+TABLE_KEYS = {
+    "instance": ["Instance Name"],
+    "agg_demands": ["Instance Name", "Customer ID"],
+    "single_demands": ["Instance Name", "Customer ID", "Type"],
+    "items": ["Instance Name", "Type"],
+    "customers": ["Instance Name", "Customer ID"]
+}
+
+# Instance LB columns are rounded to 2 decimals
+LB_ROUNDING = 0.005
+
+# Differences reported per compared object
+MAX_DIFFERENCES = 5
+
+# Enumeration threshold of the "Growth Enumeration" check
+ENUMERATION_THRESHOLD = 500
+
+# Generation settings of the generation checks: several attempts and routes per length, so candidates offered to several
+# caps, the counters per cap and the order of the workers take part in the comparison (one attempt cannot diverge)
+GENERATION_SETTINGS = {"multiplierCustomerNumber": 1, "attemptLimit": 5, "succesfulInstancesThreshold": 3}
+
+
+def compare_values(reference, candidate, rtol:float = 1e-9, atol:float = 1e-9, path:str = "") -> list:
+    '''
+    Structural difference of two JSON values, numbers are compared with a tolerance
+    Args:
+        reference: Reference value (dict, list, number, string, ...)
+        candidate: Value to check
+        rtol (float): Relative tolerance of numbers
+        atol (float): Absolute tolerance of numbers
+        path (str): Position in the enclosing value
+    Returns:
+        list: Differences (position and values), empty if the values match
+    '''
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        differences = [f"{path}/{key}: missing" for key in reference.keys() - candidate.keys()]
+        differences += [f"{path}/{key}: unexpected" for key in candidate.keys() - reference.keys()]
+        for key in reference.keys() & candidate.keys():
+            differences += compare_values(reference[key], candidate[key], rtol, atol, f"{path}/{key}")
+        return differences
+    if isinstance(reference, list) and isinstance(candidate, list):
+        if len(reference) != len(candidate):
+            return [f"{path}: length {len(reference)} != {len(candidate)}"]
+        return [difference for i, (value, other) in enumerate(zip(reference, candidate)) for difference in compare_values(value, other, rtol, atol, f"{path}[{i}]")]
+
+    numbers = (int, float, np.integer, np.floating)
+    if isinstance(reference, numbers) and isinstance(candidate, numbers) and not isinstance(reference, bool) and not isinstance(candidate, bool):
+        return [] if np.isclose(reference, candidate, rtol=rtol, atol=atol, equal_nan=True) else [f"{path}: {reference} != {candidate}"]
+    return [] if reference == candidate else [f"{path}: {reference!r} != {candidate!r}"]
+
+
+def compare_tables(reference:pd.DataFrame, candidate:pd.DataFrame, keys:list, rtol:float = 1e-9, atol:float = 1e-9) -> list:
+    '''
+    Difference of two tables independent of row order and dtypes, numeric columns with a tolerance
+    Args:
+        reference (pd.DataFrame): Reference table
+        candidate (pd.DataFrame): Table to check
+        keys (list): Columns identifying the rows
+        rtol (float): Relative tolerance of numbers
+        atol (float): Absolute tolerance of numbers
+    Returns:
+        list: Differences (columns, number of rows or values), empty if the tables match
+    '''
+    differences = [f"column {column}: missing" for column in reference.columns.difference(candidate.columns)]
+    differences += [f"column {column}: unexpected" for column in candidate.columns.difference(reference.columns)]
+    if len(reference) != len(candidate):
+        return differences + [f"rows: {len(reference)} != {len(candidate)}"]
+
+    keys = [key for key in keys if key in reference.columns and key in candidate.columns]
+    if keys:
+        reference = reference.sort_values(by=keys, kind="stable", key=lambda column: column.astype(str))
+        candidate = candidate.sort_values(by=keys, kind="stable", key=lambda column: column.astype(str))
+    reference = reference.reset_index(drop=True)
+    candidate = candidate.reset_index(drop=True)
+
+    for column in reference.columns.intersection(candidate.columns):
+        values, others = reference[column], candidate[column]
+        if pd.api.types.is_numeric_dtype(values) and pd.api.types.is_numeric_dtype(others) and not pd.api.types.is_bool_dtype(values):
+            equal = np.isclose(values.to_numpy(dtype=float), others.to_numpy(dtype=float), rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            equal = (values.astype(str) == others.astype(str)).to_numpy()
+        if not equal.all():
+            row = int(np.argmin(equal))
+            differences.append(f"column {column}: {int((~equal).sum())} rows differ, e.g. {values[row]} != {others[row]}")
+    return differences
+
+
+def compare_corpus_tables(reference_tables:dict, candidate_tables:dict, instances:list, rtol:float, atol:float) -> dict:
+    ''' Differences of the corpus tables (CORPUS_TABLES -> frame of many instances) per instance '''
+    groups = {table_name: (dict(tuple(reference_tables[table_name].groupby("Instance Name"))), dict(tuple(candidate_tables[table_name].groupby("Instance Name"))))
+              for table_name in CORPUS_TABLES}
+    mismatches = {}
+    for instance in instances:
+        differences = []
+        for table_name, (reference_groups, candidate_groups) in groups.items():
+            reference = reference_groups.get(instance, pd.DataFrame(columns=reference_tables[table_name].columns))
+            candidate = candidate_groups.get(instance, pd.DataFrame(columns=candidate_tables[table_name].columns))
+            differences += [f"{table_name} {difference}" for difference in compare_tables(reference, candidate, TABLE_KEYS[table_name], rtol, atol)]
+        if differences:
+            mismatches[instance] = differences
+    return mismatches
+
+
+def compare_route_folders(reference_path:str, candidate_path:str, instances:list, rtol:float, atol:float) -> dict:
+    ''' Differences of the route files of two output folders per instance (missing / unexpected files and JSON content) '''
+    reference_files = set(os.listdir(reference_path))
+    candidate_files = set(os.listdir(candidate_path))
+    mismatches = {}
+    for file_name in sorted(reference_files | candidate_files):
+        instance = get_file_instance(file_name, instances)
+        if file_name not in candidate_files:
+            differences = [f"{file_name}: missing"]
+        elif file_name not in reference_files:
+            differences = [f"{file_name}: unexpected"]
+        else:
+            with open(os.path.join(reference_path, file_name), "r", encoding="utf-8") as f:
+                reference = json.load(f)
+            with open(os.path.join(candidate_path, file_name), "r", encoding="utf-8") as f:
+                candidate = json.load(f)
+            differences = [f"{file_name} {difference}" for difference in compare_values(reference, candidate, rtol, atol)]
+        if differences:
+            mismatches.setdefault(instance, []).extend(differences)
+    return mismatches
+
+
+def verify_lower_bounds(filtered_data:dict) -> list:
+    '''
+    Check the vectorized bounds of packing_bounds against the volume and mass lower bounds of Instance
+    The continuous bounds must match the (rounded) Instance bounds and the integer bounds must be their ceiling.
+    '''
+    filtered_instance = filtered_data["instance"]
+    item_tables = get_item_tables(filtered_data)
+    quantities = item_tables["quantities"].sum(axis=0)
+    bounds = calculate_instance_lower_bounds(filtered_data)
+
+    differences = []
+    for name, total, capacity in [("Volume", quantities @ item_tables["volume"], get_cargo_dimensions(filtered_instance).prod()),
+                                  ("Mass", quantities @ item_tables["mass"], float(filtered_instance["Vehicle Capacity"].values[0]))]:
+        reference = float(filtered_instance[f"Vehicle LB {name}"].values[0])
+        fraction = total / capacity
+        if abs(fraction - reference) > LB_ROUNDING + 1e-9:
+            differences.append(f"LB {name}: {reference} != {fraction:.4f}")
+        elif not reference - LB_ROUNDING <= bounds[f"LB {name}"] < reference + LB_ROUNDING + 1:
+            differences.append(f"LB {name}: {bounds[f'LB {name}']} is not the ceiling of {reference}")
+    return differences
+
+
+def verify_cap_folder(file_path:str, filtered_data:dict, instance:str) -> list:
+    '''
+    Route files of an instance in an output folder of the multi cap pass: every route within the vehicle volume and
+    capacity (the sampled caps are at most 1), its number of customers as in the file name and no route written twice
+    Args:
+        file_path (str): Output folder of a cap
+        filtered_data (dict): Filtered datasets of the instance
+        instance (str): Name of the instance
+    Returns:
+        list: Differences, empty if the check passes
+    '''
+    max_volume = get_cargo_dimensions(filtered_data["instance"]).prod()
+    max_mass = float(filtered_data["instance"]["Vehicle Capacity"].values[0])
+    differences = []
+    routes = set()
+    for file_name in sorted(os.listdir(file_path)):
+        if get_file_instance(file_name, [instance]) != instance:
+            continue
+        with open(os.path.join(file_path, file_name), "r", encoding="utf-8") as f:
+            nodes = json.load(f)["Nodes"]
+        route = tuple(int(node["Customer ID"]) for node in nodes[1:])
+        volume = sum(item["Quantity"] * item["Volume"] for node in nodes for item in node["Items"])
+        mass = sum(item["Quantity"] * item["Weight"] for node in nodes for item in node["Items"])
+        if volume > max_volume * (1 + 1e-9) or mass > max_mass * (1 + 1e-9):
+            differences.append(f"{file_name}: over capacity")
+        if len(route) != int(file_name.split("_")[-2]):
+            differences.append(f"{file_name}: {len(route)} customers")
+        if route in routes:
+            differences.append(f"{file_name}: route written twice")
+        routes.add(route)
+    return differences
+
+
+def get_route_lengths(file_path:str, instance:str) -> set:
+    ''' Numbers of customers of the route files of an instance (<instance>_<customers>_<j>.json) '''
+    return {int(file_name.split("_")[-2]) for file_name in os.listdir(file_path) if get_file_instance(file_name, [instance]) == instance}
+
+
+def verify_growth_enumeration(growth_path:str, enumeration_path:str, instance:str, number_of_customers:int, enumeration_threshold:int) -> list:
+    '''
+    Enumerated short route lengths must not stop growth sampling: if growth sampling alone writes routes longer than the
+    last enumerated length, growth sampling behind the EnumerationSampler must write such routes as well
+    Args:
+        growth_path (str): Route files of growth sampling
+        enumeration_path (str): Route files of growth sampling with enumeration_threshold
+        instance (str): Name of the instance
+        number_of_customers (int): Number of customers of the instance
+        enumeration_threshold (int): Enumeration threshold of the second run
+    Returns:
+        list: Differences, empty if the check passes
+    '''
+    enumerated_lengths = [length for length in range(1, number_of_customers + 1) if math.perm(number_of_customers, length) <= enumeration_threshold]
+    last_enumerated = max(enumerated_lengths, default=0)
+    growth_lengths = get_route_lengths(growth_path, instance)
+    enumeration_lengths = get_route_lengths(enumeration_path, instance)
+    if max(growth_lengths, default=0) > last_enumerated and max(enumeration_lengths, default=0) <= last_enumerated:
+        return [f"routes up to {max(growth_lengths)} customers with growth sampling, none above the enumerated length {last_enumerated} with enumeration"]
+    return []
+
+
+def verify_folder(folder_path:str,
+                  work_path:str,
+                  checks:list = VERIFICATION_CHECKS,
+                  caps:list = [0.6, 0.8],
+                  generation_settings:dict = None,
+                  max_generated_instances:int = 5,
+                  workers:int = 2,
+                  file_format:str = "csv",
+                  rtol:float = 1e-9,
+                  atol:float = 1e-9) -> tuple:
+    '''
+    Run the reference pipeline and the fast paths of checks on one data folder
+    Args:
+        folder_path (str): Data folder
+        work_path (str): Scratch folder, cleared first
+        checks (list): Checks of VERIFICATION_CHECKS to run
+        caps (list): Caps of the generation checks
+        generation_settings (dict): Keyword arguments of the generators (seeds follow from them), updates GENERATION_SETTINGS
+        max_generated_instances (int): Route generation runs on the first instances of the folder (sorted by name)
+        workers (int): Pool size of the "Workers" check
+        file_format (str): Format of the "Partitions" check, "parquet" needs pyarrow or fastparquet
+        rtol (float): Relative tolerance of numbers
+        atol (float): Absolute tolerance of numbers
+    Returns:
+        tuple: Mismatches (one row per instance and check) and timings (one row per check)
+    '''
+    folder_name = os.path.basename(os.path.normpath(folder_path))
+    generation_settings = {**GENERATION_SETTINGS, **(generation_settings or {})}
+    shutil.rmtree(work_path, ignore_errors=True)
+    os.makedirs(work_path)
+
+    start_time = time.perf_counter()
+    reference_tables = dict(zip(CORPUS_TABLES, load_corpus([folder_path])))
+    reference_time = time.perf_counter() - start_time
+    instances = sorted(reference_tables["instance"]["Instance Name"])
+    corpus = [reference_tables[table_name] for table_name in CORPUS_TABLES]
+
+    mismatches = []
+    timings = []
+
+    def report(check:str, check_mismatches:dict, compared:int, reference_seconds:float, seconds:float) -> None:
+        for instance, differences in sorted(check_mismatches.items(), key=lambda entry: str(entry[0])):
+            mismatches.append({"Folder": folder_name, "Instance Name": instance, "Check": check,
+                               "Differences": len(differences), "Details": "; ".join(differences[:MAX_DIFFERENCES])})
+        timings.append({"Folder": folder_name, "Check": check, "Compared": compared, "Mismatches": len(check_mismatches),
+                        "Reference Time": reference_seconds, "Time": seconds, "Speedup": reference_seconds / seconds if seconds > 0 else np.nan})
+
+    if "Partitions" in checks:
+        partition_path = os.path.join(work_path, "partitions")
+        export_partitions([folder_path], partition_path, file_format)
+        start_time = time.perf_counter()
+        tables = read_partitions(partition_path, folders=[folder_name])
+        seconds = time.perf_counter() - start_time
+        candidate_tables = {table_name: tables[partition_table] for table_name, partition_table in zip(CORPUS_TABLES, TABLES)}
+        report("Partitions", compare_corpus_tables(reference_tables, candidate_tables, instances, rtol, atol), len(instances), reference_time, seconds)
+
+    reference_filtered = {}
+    if any(check in checks for check in ["Shared Corpus", "Lower Bounds"]):
+        start_time = time.perf_counter()
+        reference_filtered = {instance: get_filtered_data(instance, *corpus) for instance in instances}
+        filter_time = time.perf_counter() - start_time
+
+    if "Shared Corpus" in checks:
+        corpus_path = os.path.join(work_path, "corpus")
+        publish_corpus(corpus_path, *corpus)
+        shared_corpus = SharedCorpus(corpus_path)
+        start_time = time.perf_counter()
+        candidate_filtered = {instance: shared_corpus.get_filtered_data(instance) for instance in instances}
+        seconds = time.perf_counter() - start_time
+
+        check_mismatches = {}
+        for instance in instances:
+            differences = [f"{table_name} {difference}" for table_name in CORPUS_TABLES
+                           for difference in compare_tables(reference_filtered[instance][table_name], candidate_filtered[instance][table_name], TABLE_KEYS[table_name], rtol, atol)]
+            if differences:
+                check_mismatches[instance] = differences
+        report("Shared Corpus", check_mismatches, len(instances), filter_time, seconds)
+
+    if "Lower Bounds" in checks:
+        # The reference bounds are computed while parsing, there is no separate reference time
+        start_time = time.perf_counter()
+        check_mismatches = {instance: verify_lower_bounds(reference_filtered[instance]) for instance in instances}
+        seconds = time.perf_counter() - start_time
+        report("Lower Bounds", {instance: differences for instance, differences in check_mismatches.items() if differences}, len(instances), np.nan, seconds)
+
+    generation_checks = [check for check in ["Multi Cap", "Workers"] if check in checks]
+    if generation_checks:
+        generated_instances = instances[:max_generated_instances]
+
+        def get_file_paths(mode:str) -> dict:
+            file_paths = {cap: os.path.join(work_path, mode, str(cap)) for cap in caps}
+            for file_path in file_paths.values():
+                os.makedirs(file_path)
+            return file_paths
+
+        # Separate runs per cap, the time a multi cap pass saves
+        reference_paths = get_file_paths("reference")
+        start_time = time.perf_counter()
+        for instance in generated_instances:
+            for cap in caps:
+                generate_instances(instance, *corpus, file_path=reference_paths[cap], cap=cap, **generation_settings)
+        generation_time = time.perf_counter() - start_time
+
+        multi_cap_paths = get_file_paths("multi_cap")
+        start_time = time.perf_counter()
+        for instance in generated_instances:
+            generate_instances_multi_cap(instance, *corpus, file_paths=multi_cap_paths, **generation_settings)
+        multi_cap_time = time.perf_counter() - start_time
+
+        if "Multi Cap" in generation_checks:
+            check_mismatches = {}
+            for instance in generated_instances:
+                filtered_data = get_filtered_data(instance, *corpus)
+                for cap in caps:
+                    check_mismatches.setdefault(instance, []).extend(f"cap {cap} {difference}" for difference in verify_cap_folder(multi_cap_paths[cap], filtered_data, instance))
+            report("Multi Cap", {instance: differences for instance, differences in check_mismatches.items() if differences}, len(generated_instances), generation_time, multi_cap_time)
+
+        if "Workers" in generation_checks:
+            file_paths = get_file_paths("workers")
+            corpus_path = os.path.join(work_path, "corpus")
+            if not os.path.exists(corpus_path):
+                publish_corpus(corpus_path, *corpus)
+            # Pool start-up is not timed, a resident pool (generation_service) pays it once
+            with Pool(workers, initializer=init_worker, initargs=(corpus_path,)) as pool:
+                start_time = time.perf_counter()
+                pool.map(generate_instances_worker, [(generate_instances_multi_cap, instance, {"file_paths": file_paths, **generation_settings})
+                                                     for instance in generated_instances])
+                seconds = time.perf_counter() - start_time
+
+            check_mismatches = {}
+            for cap in caps:
+                for instance, differences in compare_route_folders(multi_cap_paths[cap], file_paths[cap], generated_instances, rtol, atol).items():
+                    check_mismatches.setdefault(instance, []).extend(f"cap {cap} {difference}" for difference in differences)
+            report("Workers", check_mismatches, len(generated_instances), multi_cap_time, seconds)
+
+    if "Growth Enumeration" in checks:
+        generated_instances = instances[:max_generated_instances]
+        timing = {}
+        check_paths = {}
+        for mode, enumeration_threshold in [("growth", None), ("growth_enumeration", ENUMERATION_THRESHOLD)]:
+            check_paths[mode] = os.path.join(work_path, mode)
+            os.makedirs(check_paths[mode])
+            start_time = time.perf_counter()
+            for instance in generated_instances:
+                generate_instances(instance, *corpus, file_path=check_paths[mode], cap=caps[0], sampling="growth", enumeration_threshold=enumeration_threshold, **generation_settings)
+            timing[mode] = time.perf_counter() - start_time
+
+        customer_numbers = dict(zip(reference_tables["instance"]["Instance Name"], reference_tables["instance"]["Number of Customers"]))
+        check_mismatches = {instance: verify_growth_enumeration(check_paths["growth"], check_paths["growth_enumeration"], instance, int(customer_numbers[instance]), ENUMERATION_THRESHOLD)
+                            for instance in generated_instances}
+        report("Growth Enumeration", {instance: differences for instance, differences in check_mismatches.items() if differences}, len(generated_instances), timing["growth"], timing["growth_enumeration"])
+
+    return pd.DataFrame(mismatches, columns=["Folder", "Instance Name", "Check", "Differences", "Details"]), pd.DataFrame(timings)
+
+
+def run_verification(data_path:str = "Data", work_path:str = "verification", folders:list = None, **kwargs) -> tuple:
+    '''
+    Verify the fast paths on all data folders (see verify_folder for the keyword arguments)
+    Args:
+        data_path (str): Folder of the datasets
+        work_path (str): Scratch folder
+        folders (list): Optional dataset folder names to verify, default all folders with instance files
+    Returns:
+        tuple: Mismatches and timings of all folders
+    '''
+    results = []
+    for folder_path in get_data_folders(data_path):
+        if folders is None or os.path.basename(folder_path) in folders:
+            results.append(verify_folder(folder_path, os.path.join(work_path, os.path.basename(folder_path)), **kwargs))
+    return pd.concat([mismatches for mismatches, _ in results], ignore_index=True), pd.concat([timings for _, timings in results], ignore_index=True)
+
+
+def main():
+
+    DATA_PATH = "Data"
+    WORK_PATH = r"H:\Data\Verification"
+    CHECKS = VERIFICATION_CHECKS
+    MAX_GENERATED_INSTANCES = 5 # route generation per folder is slow, it runs on the first instances only
+    FILE_FORMAT = "csv" # or "parquet" with pyarrow / fastparquet installed
+
+    mismatches, timings = run_verification(DATA_PATH, WORK_PATH, checks=CHECKS, max_generated_instances=MAX_GENERATED_INSTANCES, file_format=FILE_FORMAT)
+    mismatches.to_csv(os.path.join(WORK_PATH, "mismatches.csv"), index=False)
+    timings.to_csv(os.path.join(WORK_PATH, "timings.csv"), index=False)
+
+    print(timings.round(3).to_string(index=False))
+    summary = timings.groupby("Check", sort=False)[["Compared", "Mismatches", "Reference Time", "Time"]].sum(min_count=1)
+    summary["Speedup"] = summary["Reference Time"] / summary["Time"]
+    print(summary.round(3).to_string())
+
+    if not mismatches.empty:
+        print(mismatches.to_string(index=False, max_colwidth=120))
+        raise SystemExit(1)
+    print("All fast paths match the reference pipeline")
+
+if __name__ == "__main__":
+    main()